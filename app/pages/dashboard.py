@@ -1,22 +1,52 @@
 import streamlit as st
-from pages.ressources.components import Navbar , apply_border_glitch_effect, apply_custom_css, create_ip_map, extract_ips, create_ip_port_flow_diagram, footer
+from pages.ressources.components import Navbar , GEO_AGGREGATIONS, GEO_MARKER_LIMIT, aggregate_geo, apply_border_glitch_effect, apply_custom_css, create_ip_map, extract_ips, create_ip_port_flow_diagram, footer
+from pages.ressources.ip_utils import SUBNET_LEVELS, apply_subnet_level, convert_ip_columns, detect_ip_columns, ip_class_counts
+from pages.ressources.activity_cube import WEEK_RESOLUTIONS, WEEKDAYS, ActivityCube
+from pages.ressources.bitmap_cache import BitmapCache, bitmap_and, rows_to_bitmap
+from pages.ressources.bucket_series import DETECTION_MAX_POINTS, DETECTION_TARGET_POINTS, BucketSeries
+from pages.ressources.changepoints import CHANGEPOINT_METHODS, PELT_MAX_POINTS, change_points, cusum, segments_table
+from pages.ressources.crossfilter import CROSSFILTER_COLUMNS, build_crossfilter
+from pages.ressources.crosstab import CrosstabEngine
+from pages.ressources.entity_detector import ENTITY_COLUMNS, rank_entities, time_buckets
+from pages.ressources.field_summary import FieldSummaries
+from pages.ressources.flow_cube import FlowCube, column_codes, label_strings
+from pages.ressources.geo_enrichment import GeoEnrichment, enrichment_targets
+from pages.ressources.histogram_cube import HistogramCube
+from pages.ressources.holt_winters import HoltWinters, interval_channel, season_length
+from pages.ressources.query_language import QueryEngine, QueryError
+from pages.ressources.robust_detector import robust_channel
+from pages.ressources.root_cause import EXPLAIN_COLUMNS, ContributionCube
+from pages.ressources.row_pager import RowPager
+from pages.ressources.search_index import SEARCH_MODES, SearchIndex
+from pages.ressources.seasonal_baseline import SEASONS, SeasonalProfile, content_digest
+from pages.ressources.streaming_detector import EmaChannelDetector
+from pages.ressources.threat_intel import INTEL_DIR, intel_signature, load_intel_matchers, tag_intel_hits
 import pandas as pd
 import plotly.graph_objects as go
 import plotly.express as px
 import numpy as np
 import datetime
+import os
 from datetime import timedelta
 from sklearn.preprocessing import StandardScaler
 from sklearn.decomposition import PCA
 from sklearn.cluster import KMeans
 from sklearn.ensemble import IsolationForest
 import time
+from functools import partial
 
 
 st.set_page_config(page_title="Dashboard", page_icon="📊", layout="wide")
 
 @st.cache_data(ttl=3600) # Cache data for one hour
 def cached_load_data(uploaded_file):
+    """Load data from uploaded file and store IP columns in their compact form"""
+    df = load_data(uploaded_file)
+    if df is not None:
+        df = convert_ip_columns(df)
+    return df
+
+def load_data(uploaded_file):
     """Load data from uploaded file based on file extension with header detection"""
     file_extension = uploaded_file.name.split('.')[-1].lower()
     
@@ -79,7 +109,7 @@ def create_metric_card(title, value, delta=None):
     </div>
     """, unsafe_allow_html=True)
     
-def create_stacked_area_chart(df, timestamp_col, group_col):
+def create_stacked_area_chart(df, timestamp_col, group_col, subnet_level=None):
     """Create a cyberpunk-styled stacked area chart for temporal visualization"""
     if timestamp_col not in df.columns or group_col not in df.columns:
         st.error(f"Columns {timestamp_col} or {group_col} not found in dataframe")
@@ -120,6 +150,10 @@ def create_stacked_area_chart(df, timestamp_col, group_col):
     # Create a copy of the dataframe with just timestamp and group columns
     chart_df = df[[timestamp_col, group_col]].copy()
     
+    # Roll IP addresses up to their subnets if requested
+    if subnet_level:
+        chart_df[group_col] = apply_subnet_level(chart_df[group_col], subnet_level)
+    
     # Ensure group column is string type
     chart_df[group_col] = chart_df[group_col].astype(str)
     
@@ -742,9 +776,279 @@ def parse_timestamp(df, timestamp_col):
 
 
 @st.cache_data(ttl=3600)
-def cached_extract_ips(df):
+def cached_extract_ips(df, geo_table=None):
     """Version mise en cache de extract_ips pour améliorer les performances"""
-    return extract_ips(df)
+    return extract_ips(df, geo_table)
+
+def dataset_version(with_query=True, with_crossfilter=True):
+    """Identify the rows currently displayed: file, time filter, intel-only toggle, query and linked filters"""
+    time_key = st.session_state.get("cached_filtered_key") if st.session_state.get("time_filter_applied") else None
+    # The intel-only rows depend on the feeds loaded
+    intel_key = st.session_state.get("intel_signature") if st.session_state.get("intel_only", False) else None
+    version = (st.session_state.get("file_id"), time_key, intel_key)
+    if not with_query:
+        return version
+    version += (st.session_state.get("global_query", "").strip(),)
+    return version + (st.session_state.get("crossfilter_signature", ()),) if with_crossfilter else version
+
+def crossfilter_for(df, time_col, src_col, subnet_level):
+    """Crossfilter of the displayed rows with the stored brushes applied, rebuilt only when those rows change"""
+    key = dataset_version(with_crossfilter=False) + (time_col, src_col, subnet_level)
+    if st.session_state.get("crossfilter_key") != key or st.session_state.crossfilter.n_rows != len(df):
+        frame = df[[col for col in dict.fromkeys([time_col, src_col, *CROSSFILTER_COLUMNS]) if col in df.columns]]
+        if time_col in frame.columns and not pd.api.types.is_datetime64_any_dtype(frame[time_col]):
+            frame = parse_timestamp(frame, time_col)
+        st.session_state.crossfilter = build_crossfilter(frame, time_col, src_col, subnet_level)
+        st.session_state.crossfilter_key = key
+    cf = st.session_state.crossfilter
+    # Brushes are stored as labels so they survive rebuilds, only the toggled rows are revisited
+    brushes = st.session_state.get("crossfilter_brushes", {})
+    for name in cf.names:
+        brush = brushes.get(name)
+        if brush is None:
+            cf.filter(name, None)
+        elif name == 'time':
+            cf.filter_between(name, *brush)
+        else:
+            cf.filter_labels(name, brush)
+    st.session_state.crossfilter_signature = cf.signature
+    return cf
+
+def store_brush(name, key):
+    """Keep a chart selection as a crossfilter brush, an empty selection clears it"""
+    selection = st.session_state[key]["selection"]
+    brushes = st.session_state.setdefault("crossfilter_brushes", {})
+    if name == 'time':
+        xs = [x for box in selection.get("box", []) for x in box.get("x", [])] or [point["x"] for point in selection.get("points", [])]
+        xs = pd.to_datetime(pd.Series(xs), errors='coerce').dropna()
+        brushes[name] = (xs.min(), xs.max()) if len(xs) else None
+    else:
+        brushes[name] = [str(point["x"]) for point in selection.get("points", [])] or None
+
+EMA_DETECTOR_ENTRIES = 8
+
+def ema_channel(ts_data, time_col, freq, span, multiplier):
+    """EMA channel of a bucketed series, fed through a stored detector that only ingests buckets it has not seen
+
+    The newest bucket may still be filling, it is scored on a copy of the
+    detector and ingested for good once a later bucket exists.
+    """
+    key = dataset_version() + (time_col, freq, span, multiplier)
+    detectors = st.session_state.setdefault("ema_detectors", {})
+    if key not in detectors:
+        detectors[key] = (EmaChannelDetector(span, multiplier), pd.DataFrame())
+        while len(detectors) > EMA_DETECTOR_ENTRIES:
+            detectors.pop(next(iter(detectors)))
+    detector, channel = detectors[key]
+    times = ts_data[time_col]
+    settled = len(times) - 1
+    start = 0 if detector.last_timestamp is None else int(times.searchsorted(detector.last_timestamp, side='right'))
+    if start < settled:
+        channel = pd.concat([channel, detector.update_many(ts_data['count'].to_numpy()[start:settled], times.iloc[start:settled])],
+                            ignore_index=True)
+        detectors[key] = (detector, channel)
+    pending = EmaChannelDetector.from_dict(detector.to_dict()).update_many(ts_data['count'].to_numpy()[settled:], times.iloc[settled:])
+    return detector, pd.concat([channel, pending], ignore_index=True).rename(columns={'timestamp': time_col})
+
+def holt_winters_channel(ts_data, time_col, freq, multiplier, horizon):
+    """One-step Holt-Winters channel of a bucketed series and its forecast of the next buckets
+
+    The model is fitted once per dataset version and width, then only
+    ingests buckets after its last one; the newest, possibly still filling
+    bucket is ingested by a copy, which also makes the forecast.
+    """
+    key = dataset_version() + (time_col, freq)
+    models = st.session_state.setdefault("holt_winters_models", {})
+    times, counts = ts_data[time_col], ts_data['count'].to_numpy()
+    settled = len(times) - 1
+    if key not in models:
+        season = season_length(pd.Timedelta(freq).value, len(times))
+        models[key] = HoltWinters.fit(counts[:settled], season, times.iloc[:settled])
+        while len(models) > EMA_DETECTOR_ENTRIES:
+            models.pop(next(iter(models)))
+    model, expected, spread = models[key]
+    start = 0 if model.last_timestamp is None else int(times.searchsorted(model.last_timestamp, side='right'))
+    if start < settled:
+        new_expected, new_spread = model.ingest(counts[start:settled], times.iloc[start:settled])
+        expected, spread = np.concatenate([expected, new_expected[:, 0]]), np.concatenate([spread, new_spread[:, 0]])
+        models[key] = (model, expected, spread)
+    pending = HoltWinters.from_dict(model.to_dict())
+    last_expected, last_spread = pending.ingest(counts[settled:], times.iloc[settled:])
+    channel = interval_channel(counts, np.concatenate([expected, last_expected[:, 0]]),
+                               np.concatenate([spread, last_spread[:, 0]]), multiplier)
+    forecast = pending.forecast(horizon, multiplier)
+    forecast.insert(0, time_col, times.iloc[-1] + pd.Timedelta(freq) * np.arange(1, horizon + 1))
+    return pending, pd.concat([ts_data[[time_col, 'count']], channel], axis=1), forecast
+
+@st.cache_resource(max_entries=4)
+def cached_query_engine(file_id, timestamp_col, intel_key, _df, _bitmaps):
+    """One query engine per dataset, parsed timestamp column and intel feeds, its masks live in the dataset's bitmap cache"""
+    return QueryEngine(_df, _bitmaps, version=(timestamp_col, intel_key))
+
+@st.cache_resource(max_entries=8)
+def cached_flow_cube(version, src_ip_col, dst_ip_col, dst_port_col, _df):
+    """Build the (src, dst, dst_port, proto) flow cube once per dataset version"""
+    return FlowCube(_df, src_ip_col, dst_ip_col, dst_port_col,
+                    proto_col='proto' if 'proto' in _df.columns else None,
+                    bytes_col='len' if 'len' in _df.columns else None)
+
+@st.cache_resource(max_entries=4)
+def cached_row_pager(file_id, _df):
+    """One pager per dataset, its sort keys and argsorts are shared by every rerun and session"""
+    return RowPager(_df)
+
+@st.cache_resource(max_entries=4)
+def cached_field_summaries(file_id, _df):
+    """One summary cache per dataset, keyed by filter state and column"""
+    return FieldSummaries(_df)
+
+@st.cache_resource(max_entries=4)
+def start_histogram_cube(file_id, timestamp_col, _df, _time_order, _time_sorted):
+    """Start binning every numeric column of a dataset per time bucket, once per dataset and timestamp column"""
+    return HistogramCube(_df, _df.select_dtypes(include=['number']).columns, _time_order, _time_sorted).start()
+
+@st.cache_resource(max_entries=8)
+def cached_activity_cube(file_id, timestamp_col, group_col, _df, _time_order, _time_sorted):
+    """Weekly activity cube of a dataset's timestamp column, optionally split by a column"""
+    return ActivityCube(_time_order, _time_sorted, None if group_col == "None" else _df[group_col])
+
+@st.cache_resource(max_entries=4)
+def cached_crosstab_engine(file_id, _df):
+    """One crosstab engine per dataset, its column codes are shared by every rerun and session"""
+    return CrosstabEngine(_df)
+
+@st.cache_resource(max_entries=8)
+def start_geo_enrichment(file_id, _df):
+    """Start geolocating the public IPs of a dataset once, shared by every rerun and session"""
+    return GeoEnrichment(enrichment_targets(_df, detect_ip_columns(_df))).start()
+
+@st.cache_resource(max_entries=4)
+def start_search_index(file_id, _df):
+    """Start indexing the text and IP columns of a dataset once, shared by every rerun and session"""
+    return SearchIndex(_df).start()
+
+def search_mask(df, index, term, search_col, mode):
+    """Row mask of a case-insensitive term, from the index where the columns are already indexed"""
+    columns = index.columns if search_col == "All columns" else [search_col]
+    mask = np.zeros(len(df), dtype=bool)
+    indexed = [col for col in columns if col in index.column_indexes]
+    if indexed:
+        mask[index.search(term, indexed, mode)] = True
+
+    # Columns still being indexed (or not indexable) fall back to a row scan
+    term = term.lower()
+    for col in columns:
+        if col not in index.column_indexes:
+            values = df[col].astype(str).str.lower()
+            mask |= (values.str.startswith(term) if mode == 'prefix' else values.str.contains(term, regex=False)).to_numpy()
+    return mask
+
+def detection_times(df, time_col):
+    """A timestamp column of the detection tab, parsed without copying the other columns"""
+    if pd.api.types.is_datetime64_any_dtype(df[time_col]):
+        return df[time_col]
+    return parse_timestamp(df[[time_col]], time_col)[time_col]
+
+@st.cache_resource(max_entries=8)
+def cached_bucket_series(version, time_col, _df):
+    """Finest event counts of a timestamp column of the displayed rows, once per dataset version"""
+    return BucketSeries(detection_times(_df, time_col))
+
+@st.cache_resource(max_entries=8)
+def cached_contribution_cube(version, time_col, freq, _df):
+    """Per-dimension bucket counts of the displayed rows, explaining the flagged buckets of one width"""
+    dimensions = {}
+    src_col = find_src_ip_col(_df)
+    if src_col is not None:
+        dimensions['src subnet'] = apply_subnet_level(_df[src_col], '/24 · /64')
+    dimensions.update({col: _df[col] for col in EXPLAIN_COLUMNS if col in _df.columns})
+    return ContributionCube(detection_times(_df, time_col), dimensions, pd.Timedelta(freq).value)
+
+def top_contributor(explanation):
+    """One-line summary of the largest contributor of an explained bucket"""
+    if explanation.empty:
+        return ""
+    top = explanation.iloc[0]
+    return f"{top['dimension']} = {top['value']} ({top['excess']:+,.0f})"
+
+@st.cache_resource(max_entries=8)
+def cached_seasonal_profile(version, time_col, freq, season, digest, _ts_data):
+    """Seasonal profile of a bucketed series, read back from disk when this file was profiled before
+
+    Only the profile of the whole file is persisted, one per (file contents
+    digest, column, width, season); filtered views, passing no digest, are
+    profiled in memory.
+    """
+    path = SeasonalProfile.path((digest, time_col, freq, season)) if digest else None
+    if path and os.path.exists(path):
+        return SeasonalProfile.load(path)
+    profile = SeasonalProfile.fit(_ts_data[time_col], _ts_data['count'], season)
+    if path:
+        try:
+            profile.save(path)
+        except OSError:
+            pass
+    return profile
+
+@st.cache_resource(max_entries=8)
+def cached_entity_anomalies(version, time_col, entity_col, freq, span, multiplier, _df):
+    """Most anomalous entities of the displayed rows, scored once per dataset version and detector setting"""
+    times = detection_times(_df, time_col)
+    if not pd.api.types.is_datetime64_any_dtype(times):
+        return None
+    if times.dt.tz is not None:
+        times = times.dt.tz_localize(None)
+    buckets, bucket_times = time_buckets(times.to_numpy(dtype='datetime64[ns]').view(np.int64), pd.Timedelta(freq).value)
+    codes, labels = column_codes(_df[entity_col])
+    return rank_entities(codes, label_strings(labels), buckets, bucket_times, span, multiplier)
+
+@st.cache_resource(max_entries=4)
+def cached_bitmap_cache(file_id, n_rows):
+    """Predicate bitmaps of a dataset, shared by every filter"""
+    return BitmapCache(n_rows)
+
+@st.cache_resource(max_entries=8)
+def cached_time_index(file_id, timestamp_col, _df):
+    """Parse a timestamp column once per dataset and sort the row positions by time"""
+    parsed = parse_timestamp(_df[[timestamp_col]], timestamp_col)[timestamp_col]
+    if not pd.api.types.is_datetime64_any_dtype(parsed):
+        return parsed, None, None
+    if parsed.dt.tz is not None:
+        parsed = parsed.dt.tz_localize(None)
+    # NaT maps to the smallest int64 and stays out of every window
+    values = parsed.to_numpy(dtype='datetime64[ns]').view(np.int64)
+    order = np.argsort(values, kind='stable')
+    return parsed, order, values[order]
+
+def time_window_rows(order, sorted_values, start_time, end_time):
+    """Row positions with start_time <= timestamp <= end_time, by binary search"""
+    lo = np.searchsorted(sorted_values, pd.Timestamp(start_time).value, side='left')
+    hi = np.searchsorted(sorted_values, pd.Timestamp(end_time).value, side='right')
+    return order[lo:hi]
+
+def geo_enrichment_status(job, polling):
+    """Show how much of the dataset has been geolocated so far
+
+    A polling fragment keeps its timer until the next full run, so once the
+    job is done it reruns the app, which renders the final status without one.
+    """
+    if polling and job.complete:
+        st.rerun()
+    located = len(job.table())
+    st.progress(job.progress, text=f"GEO ENRICHMENT: {job.done:,}/{job.total:,} public IPs processed, {located:,} located")
+    if job.error:
+        st.warning(f"Geolocation stopped early: {job.error}")
+
+@st.cache_resource
+def cached_intel_matchers(signature):
+    """Build the threat-intel matchers once per set of feed files"""
+    return load_intel_matchers()
+
+def find_src_ip_col(df):
+    """Return the source IP column, or the first IP column"""
+    ip_cols = detect_ip_columns(df)
+    src_cols = [col for col in ip_cols if 'src' in col.lower() or 'source' in col.lower()]
+    return (src_cols or ip_cols or [None])[0]
 
 @st.cache_data
 def filter_df_by_time_cached(df, timestamp_col, start_time, end_time):
@@ -854,6 +1158,9 @@ def main():
             try:
                 # Stocker un ID unique basé sur le nom et la taille du fichier pour la mise en cache
                 file_id = f"{uploaded_file.name}_{uploaded_file.size}"
+                # Baselines persisted on disk are keyed by the contents, hashed once per upload
+                if st.session_state.get("file_digest", (None,))[0] != uploaded_file.file_id:
+                    st.session_state.file_digest = (uploaded_file.file_id, content_digest(uploaded_file.getvalue()))
                 
                 # Vérifier si le fichier est en cache
                 if "file_id" not in st.session_state or st.session_state.file_id != file_id:
@@ -863,11 +1170,27 @@ def main():
                         del st.session_state.filtered_df
                     if "time_filter_applied" in st.session_state:
                         st.session_state.time_filter_applied = False
+                    st.session_state.show_ip_map = False
                         
                 # Charger les données avec cache
                 df = cached_load_data(uploaded_file)
                 
                 if df is not None:
+                    # Tag rows whose source IP falls in a local threat-intel feed
+                    intel_key = st.session_state.intel_signature = intel_signature()
+                    df = tag_intel_hits(df, cached_intel_matchers(intel_key), ip_col=find_src_ip_col(df))
+                    
+                    # Geolocate the dataset's public IPs in the background while the user explores
+                    geo_job = start_geo_enrichment(file_id, df) if detect_ip_columns(df) else None
+                    # Build the search index of the Exploration tab in the background as well
+                    search_index = start_search_index(file_id, df)
+                    
+                    # Filters are cached bitmaps over the full dataset, views are gathers of its rows
+                    base_df = df
+                    bitmaps = cached_bitmap_cache(file_id, len(base_df))
+                    view_bits = []
+                    time_order = time_sorted = time_window = None
+                    
                     # Store the original dataframe in the session state when first uploading
                     if "original_df" not in st.session_state:
                         st.session_state.original_df = df
@@ -899,18 +1222,15 @@ def main():
                             on_change=lambda: setattr(st.session_state, 'timestamp_col', st.session_state.timestamp_col_select)
                         )
                         
+                        # Timestamps are parsed and sorted once per dataset
+                        parsed_ts, time_order, time_sorted = cached_time_index(file_id, timestamp_col, base_df)
+                        if time_order is not None:
+                            base_df[timestamp_col] = parsed_ts.to_numpy()
+                        
                         # Define refresh callback function
                         def refresh_data():
                             """Function to refresh data based on time filter"""
                             st.session_state.time_filter_applied = True
-                            
-                            # Get original dataframe and apply time filter
-                            original_df = st.session_state.original_df
-                            filtered_df = filter_df_by_time(original_df, st.session_state.timestamp_col, 
-                                                            st.session_state.start_time, st.session_state.end_time)
-                            
-                            # Store filtered dataframe in session state
-                            st.session_state.filtered_df = filtered_df
                         
                         # Add time range selector with refresh callback
                         start_time, end_time, time_unit, time_value, refresh_pressed = time_selector(on_refresh_callback=refresh_data)
@@ -921,19 +1241,18 @@ def main():
                         
                         # Use filtered_df if refresh was pressed or time filter was previously applied
                         # Otherwise use the original dataframe
-                        if refresh_pressed or st.session_state.time_filter_applied:
-                            if "cached_filtered_key" not in st.session_state:
-                                st.session_state.cached_filtered_key = f"{timestamp_col}_{start_time}_{end_time}"
-                            else:
-                                # Vérifier si les paramètres de filtre ont changé
-                                new_key = f"{timestamp_col}_{start_time}_{end_time}"
-                                if new_key != st.session_state.cached_filtered_key:
-                                    st.session_state.cached_filtered_key = new_key
-                                    # Appliquer le nouveau filtre
-                                    st.session_state.filtered_df = filter_df_by_time_cached(df, timestamp_col, start_time, end_time)
-                            
-                            display_df = st.session_state.filtered_df
+                        if (refresh_pressed or st.session_state.time_filter_applied) and time_order is not None:
+                            st.session_state.cached_filtered_key = f"{timestamp_col}_{start_time}_{end_time}"
+                            # The time window is a binary search over the sorted timestamps
+                            view_bits.append(bitmaps.get(
+                                ('time', timestamp_col, start_time, end_time),
+                                lambda: rows_to_bitmap(time_window_rows(time_order, time_sorted, start_time, end_time), len(base_df))
+                            ))
+                            display_df = bitmaps.view(base_df, view_bits[-1])
+                            time_window = (start_time, end_time)
                         else:
+                            if time_order is None and st.session_state.time_filter_applied:
+                                st.warning(f"Could not convert '{timestamp_col}' to a valid datetime format. Using original data.")
                             display_df = df
                         
                         # Create time histogram to show data distribution
@@ -992,6 +1311,38 @@ def main():
                     # Rest of your code continues unchanged, just make sure to use the df variable
                     # which now contains either filtered_df or the original based on refresh button
                     
+                    # The time window alone is already gathered in display_df
+                    time_bits = len(view_bits)
+                    
+                    # Numeric histograms per time bucket, any time window is then a sum of small arrays
+                    histogram_cube = start_histogram_cube(file_id, timestamp_col if time_order is not None else None,
+                                                          base_df, time_order, time_sorted)
+                    
+                    # Restrict every panel to threat-intel hits if requested
+                    if 'intel_hit' in df.columns:
+                        intel_only = st.checkbox("🚨 Show only threat-intel hits", value=False, key="intel_only",
+                                                 help="Keep only events whose source IP matches a local threat-intel feed")
+                        if intel_only:
+                            view_bits.append(bitmaps.get(('intel_hit', intel_key), lambda: base_df['intel_hit'].to_numpy()))
+                    
+                    # Kibana-style query narrowing every tab
+                    query = st.text_input("🔎 Filter query", key="global_query",
+                                          placeholder="proto:TCP AND dst_port:(22 OR 3389) AND NOT src_ip:10.0.0.0/8 AND len>1000",
+                                          help="Kibana-style query applied to every tab, see the README for the syntax")
+                    if query.strip():
+                        try:
+                            engine = cached_query_engine(file_id, timestamp_col if time_order is not None else None,
+                                                         intel_key, base_df, bitmaps)
+                            view_bits.append(engine.bitmap(query))
+                        except QueryError as e:
+                            st.error(f"Query error: {e}")
+                    
+                    # Every active filter is ANDed on the bitmaps, then the rows are gathered once
+                    if len(view_bits) > time_bits:
+                        df = bitmaps.view(base_df, bitmap_and(*view_bits))
+                    if query.strip():
+                        st.caption(f"Query matches {len(df):,} events")
+                    
                     # File details panel
                     st.markdown("<div class='grafana-panel'>", unsafe_allow_html=True)
                     st.markdown("<div class='panel-header'>FILE DETAILS</div>", unsafe_allow_html=True)
@@ -1043,12 +1394,28 @@ def main():
                     if ip_cols:
                         st.info("🌐 IP address columns detected: " + ", ".join(ip_cols))
                         
+                        # Address classes computed in a single vectorized pass per column
+                        class_cols = st.columns(len(ip_cols))
+                        for idx, col in enumerate(ip_cols):
+                            with class_cols[idx]:
+                                counts = ip_class_counts(df[col])
+                                create_metric_card(
+                                    f"{col.upper()} PUBLIC / PRIVATE",
+                                    f"{counts['public']:,} / {counts['private']:,}"
+                                )
                     
+                        if geo_job is not None:
+                            # Refresh the indicator on its own until the background lookup is done
+                            polling = not geo_job.complete
+                            st.fragment(geo_enrichment_status, run_every=2 if polling else None)(geo_job, polling)
+                        
                         geoip_process = st.button("🔍 ANALYZE IP LOCATIONS", key="process_ips")
+                        if geoip_process:
+                            st.session_state.show_ip_map = True
     
                     # Remplacez la section qui affiche la carte dans la fonction main()
 
-                    if geoip_process:
+                    if ip_cols and st.session_state.get("show_ip_map", False):
                         with st.spinner("Extracting IP addresses and looking up locations..."):
                             # Add a cool cyberpunk banner for the processing
                             st.markdown("""
@@ -1073,10 +1440,13 @@ def main():
                             """, unsafe_allow_html=True)
                             
                             # Extract IP data
-                            src_locations, dst_locations, flows = cached_extract_ips(df)
+                            # Partial results while the background lookup is still running
+                            src_geo, dst_geo, flows = cached_extract_ips(df, geo_job.table() if geo_job is not None else None)
+                            if geo_job is not None and not geo_job.complete:
+                                st.caption(f"Map built from {geo_job.progress:.0%} of the public IPs, rerun to include newly located ones.")
                             
-                            if src_locations or dst_locations:
-                                st.success(f"✅ Found {len(src_locations) if src_locations else 0} source IPs and {len(dst_locations) if dst_locations else 0} destination IPs with geolocation data.")
+                            if not src_geo.empty or not dst_geo.empty:
+                                st.success(f"✅ Found {len(src_geo)} source IPs and {len(dst_geo)} destination IPs with geolocation data.")
                                 
                                 # Create cyberpunk-styled threat map header
                                 st.markdown("""
@@ -1093,8 +1463,17 @@ def main():
                                 </div>
                                 """, unsafe_allow_html=True)
                                 
+                                # Past a few hundred IPs, draw one marker per city by default
+                                geo_aggregation = st.radio(
+                                    "Map density",
+                                    GEO_AGGREGATIONS,
+                                    index=1 if len(src_geo) + len(dst_geo) > GEO_MARKER_LIMIT else 0,
+                                    horizontal=True,
+                                    key="geo_aggregation"
+                                )
+                                
                                 # Create and display map with performance optimizations
-                                fig = create_ip_map(src_locations, dst_locations, flows)
+                                fig = create_ip_map(src_geo, dst_geo, flows, aggregation=geo_aggregation)
 
                                 # Display chart with specific configuration to optimize performance
                                 st.plotly_chart(fig, use_container_width=True, config={
@@ -1109,6 +1488,27 @@ def main():
                                     'staticPlot': False,  # Set to True for even better performance but loses interactivity
                                 })
 
+                                # Per-IP detail of one aggregated marker
+                                if geo_aggregation != 'IP':
+                                    with st.expander("🔎 Location drill-down"):
+                                        drill_side = st.radio("Side", ["Source", "Destination"], horizontal=True, key="geo_drill_side")
+                                        drill_geo = src_geo if drill_side == "Source" else dst_geo
+                                        if drill_geo.empty:
+                                            st.info(f"No geolocated {drill_side.lower()} IPs")
+                                        else:
+                                            bins, bin_ids = aggregate_geo(drill_geo, geo_aggregation)
+                                            drill_bin = st.selectbox(
+                                                "Location",
+                                                bins.index,
+                                                format_func=lambda b: f"{bins.at[b, 'label']} — {bins.at[b, 'ips']:,} IPs, {bins.at[b, 'events']:,} events",
+                                                key="geo_drill_bin"
+                                            )
+                                            st.dataframe(
+                                                drill_geo[bin_ids == drill_bin].sort_values('events', ascending=False)[
+                                                    ['ip', 'events', 'city', 'region', 'country', 'isp', 'org', 'latitude', 'longitude']],
+                                                use_container_width=True, hide_index=True
+                                            )
+
                                 # Add performance note
                                 st.markdown("""
                                 <div style="background-color: #181b24; padding: 10px; border-radius: 3px; margin-top: 5px;">
@@ -1119,7 +1519,7 @@ def main():
                                 """, unsafe_allow_html=True)
                                 
                                 # Show flow statistics with enhanced styling
-                                if flows:
+                                if not flows.empty:
                                     st.markdown("""
                                     <div style='margin-top: 25px; margin-bottom: 15px;'>
                                         <div style='font-family: "Orbitron", sans-serif; font-size: 20px; color: #00f2ff; 
@@ -1131,15 +1531,12 @@ def main():
                                     </div>
                                     """, unsafe_allow_html=True)
                                     
-                                    # Create DataFrame from flows
-                                    flow_df = pd.DataFrame(flows)
-                                    
-                                    # Group by country pairs
-                                    country_flows = flow_df.groupby(['src_country', 'dst_country'])['count'].sum().reset_index()
+                                    # Country and ISP matrices come straight from the geolocated flows table
+                                    country_flows = flows.groupby(['src_country', 'dst_country'])['count'].sum().reset_index()
                                     country_flows = country_flows.sort_values('count', ascending=False)
                                     
                                     # Group by ISP pairs for broader view
-                                    isp_flows = flow_df.groupby(['src_isp', 'dst_isp'])['count'].sum().reset_index()
+                                    isp_flows = flows.groupby(['src_isp', 'dst_isp'])['count'].sum().reset_index()
                                     isp_flows = isp_flows.sort_values('count', ascending=False)
                                     
                                     # Create metrics with enhanced styling
@@ -1149,9 +1546,9 @@ def main():
                                     with metric_cols[1]:
                                         create_metric_card("COUNTRIES", f"{country_flows['src_country'].nunique() + country_flows['dst_country'].nunique()}")
                                     with metric_cols[2]:
-                                        create_metric_card("SOURCE IPs", f"{len(src_locations) if src_locations else 0}")
+                                        create_metric_card("SOURCE IPs", f"{len(src_geo)}")
                                     with metric_cols[3]:
-                                        create_metric_card("DEST IPs", f"{len(dst_locations) if dst_locations else 0}")
+                                        create_metric_card("DEST IPs", f"{len(dst_geo)}")
                                     
                                     # Show top flows with enhanced styling
                                     col1, col2 = st.columns(2)
@@ -1248,15 +1645,82 @@ def main():
                         on_change=update_group_col
                     )
 
+            # IP columns can be grouped by subnet instead of single addresses
+            group_subnet_level = None
+            if st.session_state.selected_group_col in detect_ip_columns(df):
+                group_subnet_level = st.selectbox(
+                    "Subnet rollup",
+                    list(SUBNET_LEVELS.keys()),
+                    key="group_subnet_level",
+                    help="Group addresses by IPv4 / IPv6 prefix"
+                )
+
+            # Linked views: brushing a chart refilters the others, each one ignoring its own brush
+            crossfilter = crossfilter_for(df, st.session_state.selected_time_col, find_src_ip_col(df),
+                                          st.session_state.get("crossfilter_subnet_level"))
+            brush_generation = st.session_state.get("crossfilter_generation", 0)
+            stacked_df = df[crossfilter.mask(exclude='time')] if set(crossfilter.active) - {'time'} else df
+
             # Utiliser les variables stockées dans la session pour créer le graphique
-            stacked_fig = create_stacked_area_chart(df, st.session_state.selected_time_col, st.session_state.selected_group_col)
+            stacked_fig = create_stacked_area_chart(stacked_df, st.session_state.selected_time_col, st.session_state.selected_group_col,
+                                                    subnet_level=group_subnet_level)
                         
             if stacked_fig:
-                st.plotly_chart(stacked_fig, use_container_width=True)
+                stacked_key = f"stacked_area_select_{brush_generation}"
+                st.plotly_chart(stacked_fig, use_container_width=True, key=stacked_key,
+                                on_select=partial(store_brush, 'time', stacked_key), selection_mode="box")
+                st.caption("Box-select a time range to filter the linked views below")
             else:
                 st.warning("Could not create stacked area chart with the selected columns")
                 
             st.markdown("</div>", unsafe_allow_html=True)
+
+            st.markdown("<div class='grafana-panel'>", unsafe_allow_html=True)
+            st.markdown("<div class='panel-header'>LINKED VIEWS</div>", unsafe_allow_html=True)
+
+            linked_cols = st.columns([3, 1])
+            with linked_cols[1]:
+                if 'src' in crossfilter.names:
+                    st.selectbox("Source rollup", list(SUBNET_LEVELS.keys()), key="crossfilter_subnet_level")
+                if st.button("Clear linked filters", key="clear_crossfilter", disabled=not crossfilter.active):
+                    # New widget keys drop the charts' selections along with the brushes
+                    st.session_state.crossfilter_brushes = {}
+                    st.session_state.crossfilter_generation = brush_generation + 1
+                    st.rerun()
+            with linked_cols[0]:
+                if crossfilter.active:
+                    st.caption(f"Linked filters on {', '.join(crossfilter.active)} keep {crossfilter.passing:,} of {crossfilter.n_rows:,} events")
+                else:
+                    st.caption("Click bars (shift-click for several) to filter every other view")
+
+            linked_names = [name for name in crossfilter.names if name != 'time']
+            for row_start in range(0, len(linked_names), 2):
+                chart_cols = st.columns(2)
+                for chart_col, name in zip(chart_cols, linked_names[row_start:row_start + 2]):
+                    groups = crossfilter.group(name)
+                    selected = crossfilter.selected[name]
+                    shown = groups[groups > 0].nlargest(15)
+                    if selected is not None:
+                        # Selected values stay visible even once they fall out of the top 15
+                        picked = groups.index[np.flatnonzero(selected[:-1])]
+                        shown = pd.concat([shown, groups[picked.difference(shown.index)]])
+                    colors = ["#ff5900" if selected is not None and selected[groups.index.get_loc(label)] else "#00f2ff"
+                              for label in shown.index]
+                    bar_fig = go.Figure(go.Bar(x=shown.index, y=shown.values, marker_color=colors))
+                    bar_fig = cyberpunk_plot_layout(bar_fig, title=name, height=260)
+                    bar_fig.update_xaxes(type='category')
+                    with chart_col:
+                        bar_key = f"crossfilter_{name}_{brush_generation}"
+                        st.plotly_chart(bar_fig, use_container_width=True, key=bar_key,
+                                        on_select=partial(store_brush, name, bar_key), selection_mode="points")
+
+            st.markdown("</div>", unsafe_allow_html=True)
+
+            # The flow panel and the other tabs follow the linked filters
+            if crossfilter.active:
+                view_rows = bitmaps.rows(bitmap_and(*view_bits)) if view_bits else np.arange(len(base_df))
+                view_bits.append(rows_to_bitmap(view_rows[crossfilter.mask()], len(base_df)))
+                df = bitmaps.view(base_df, bitmap_and(*view_bits))
                     # IP port flow visualization
             st.markdown("<div class='grafana-panel'>", unsafe_allow_html=True)
             st.markdown("<div class='panel-header'>IP-PORT FLOW ANALYSIS</div>", unsafe_allow_html=True)
@@ -1291,9 +1755,12 @@ def main():
                         key="dst_port_col_flow"
                     )
                 
+                # Every flow selection below is a slice of this cube
+                flow_cube = cached_flow_cube(dataset_version(), src_ip_col, dst_ip_col, dst_port_col, df)
+                
                 with col4:
                     # Get top destination IPs by count for selection
-                    top_dst_ips = df[dst_ip_col].value_counts().nlargest(10).index.tolist()
+                    top_dst_ips = flow_cube.dst_totals.index[:10].tolist()
                     selected_dst_ip = st.selectbox(
                         "Filter Destination IP",
                         ["All"] + top_dst_ips,
@@ -1306,6 +1773,20 @@ def main():
                     show_top10_only = st.checkbox("Show only top 10 source IPs by traffic volume", 
                                                 value=False, 
                                                 key="show_top10")
+                with col_opts2:
+                    flow_subnet_level = st.selectbox(
+                        "Source subnet rollup",
+                        list(SUBNET_LEVELS.keys()),
+                        key="flow_subnet_level",
+                        help="Aggregate source IPs by IPv4 / IPv6 prefix"
+                    )
+                
+                # Top talkers at the selected rollup level
+                with st.expander("📡 Top Talkers", expanded=False):
+                    talkers = flow_cube.src_totals(flow_subnet_level).nlargest(15)
+                    talkers_df = talkers.rename_axis("Source").reset_index(name="Events")
+                    talkers_df["Share %"] = (talkers_df["Events"] / max(len(df), 1) * 100).round(2)
+                    st.dataframe(talkers_df, use_container_width=True)
                 
                 # Create visualization
                 if st.button("🔄 Generate Flow Diagram", key="gen_flow_diagram"):
@@ -1317,7 +1798,9 @@ def main():
                             dst_ip_col, 
                             dst_port_col,
                             filter_dst_ip=filter_ip,
-                            show_only_top10=show_top10_only
+                            show_only_top10=show_top10_only,
+                            subnet_level=flow_subnet_level,
+                            cube=flow_cube
                         )
                         
                         if flow_fig:
@@ -1360,19 +1843,35 @@ def main():
                 with search_cols:
                     search_term = st.text_input("Search in data", key="search_term", 
                                     placeholder="Search...",
-                                    help="Enter text to filter across all columns")
+                                    help="Enter text to filter across all text and IP columns, or pick a column")
                 with filter_cols:
-                    search_col = st.selectbox("in column", all_cols, key="search_col")
+                    search_col = st.selectbox("in column", ["All columns"] + all_cols, key="search_col")
+                search_mode = st.radio("Match", list(SEARCH_MODES.keys()), horizontal=True, key="search_mode")
+                if not search_index.ready:
+                    st.caption(f"Indexing fields in the background: {len(search_index.column_indexes)}/{len(search_index.columns)} done")
             
             # Filter data based on search
-            filtered_df = df.copy()
+            filtered_df = df
+            # The document table pages through row ids of base_df instead of the gathered rows
+            selection_key = dataset_version()
+            selection_bits = bitmap_and(*view_bits) if view_bits else None
             if search_term:
                 
                 try:
-                    filtered_df = df[df[search_col].astype(str).str.contains(search_term, case=False, na=False)]
+                    mode = SEARCH_MODES[search_mode]
+                    search_key = ('search', search_term.lower(), search_col, mode)
+                    search_bits = bitmaps.get(
+                        search_key,
+                        lambda: search_mask(base_df, search_index, search_term, search_col, mode)
+                    )
+                    filtered_df = bitmaps.view(base_df, bitmap_and(search_bits, *view_bits))
+                    selection_key += (search_key,)
+                    selection_bits = bitmap_and(search_bits, *view_bits)
                 except Exception as e:
                     st.error(f"Error searching in column '{search_col}': {str(e)}")
                     filtered_df = df
+            row_pager = cached_row_pager(file_id, base_df)
+            selection_rows = None if selection_bits is None else row_pager.rows(selection_key, lambda: bitmaps.rows(selection_bits))
         
             # Column selector
             st.markdown("<div class='panel-header' style='margin-top:15px;'>AVAILABLE FIELDS</div>", unsafe_allow_html=True)
@@ -1419,11 +1918,16 @@ def main():
                             unsafe_allow_html=True)
                 
                 # Pagination controls
-                row_count = len(filtered_df)
+                row_count = len(base_df) if selection_rows is None else len(selection_rows)
                 page_size = st.select_slider("Rows per page", 
                                         options=[10, 20, 50, 100], 
                                         value=20,
                                         key="page_size")
+                sort_cols = st.columns([3, 1])
+                with sort_cols[0]:
+                    sort_col = st.selectbox("Sort by", ["Row order"] + all_cols, key="sort_col")
+                with sort_cols[1]:
+                    sort_desc = st.checkbox("Descending", value=False, key="sort_desc")
                 
                 max_pages = (row_count // page_size) + (1 if row_count % page_size > 0 else 0)
                 max_pages = max(1, max_pages)  # Ensure at least one page
@@ -1437,7 +1941,11 @@ def main():
                 start_idx = (page_number - 1) * page_size
                 end_idx = min(start_idx + page_size, row_count)
                 
-                page_data = filtered_df.iloc[start_idx:end_idx]
+                # Only the rows of the current page are gathered
+                page_rows = row_pager.page(selection_key, selection_rows, start_idx, end_idx,
+                                           sort_col=None if sort_col == "Row order" else sort_col,
+                                           ascending=not sort_desc)
+                page_data = row_pager.take(page_rows)
                 
                 # Display data as interactive table with expandable rows
                 st.dataframe(page_data[selected_cols], use_container_width=True)
@@ -1484,8 +1992,10 @@ def main():
                 st.warning("Select fields to display insights")
             # Display statistics for selected columns
             if selected_cols:
-                # Focus on numeric columns for insights
-                num_insight_cols = [col for col in selected_cols if col in numeric_cols and df[col].isna().mean() < 0.5]
+                # Focus on numeric columns for insights, summarized in one pass and cached per filter state
+                summary_cols = [col for col in selected_cols if col in numeric_cols]
+                field_summary = cached_field_summaries(file_id, base_df).get(selection_key, summary_cols, selection_rows) if summary_cols else None
+                num_insight_cols = [col for col in summary_cols if field_summary.at[col, 'nulls'] < 0.5 * max(row_count, 1)]
                 if num_insight_cols:
                     # Create multiple rows of metrics for better organization
                     for i in range(0, len(num_insight_cols), 4):
@@ -1494,11 +2004,14 @@ def main():
                         
                         for idx, col in enumerate(cols_group):
                             with metric_cols[idx]:
-                                avg_val = filtered_df[col].mean()
+                                avg_val = field_summary.at[col, 'mean']
                                 create_metric_card(
                                     f"AVG {col.upper()}", 
                                     f"{avg_val:.2f}"
                                 )
+                    with st.expander("📐 Field summary", expanded=False):
+                        st.dataframe(field_summary.loc[num_insight_cols], use_container_width=True)
+                        st.caption("Quartiles are approximate, merged from per-block quantile sketches")
                 else:
                     st.info("No numeric columns selected for insights")
             
@@ -1602,13 +2115,28 @@ def main():
                         st.plotly_chart(fig, use_container_width=True)
                         
                     elif viz_col in numeric_cols:
+                        hist_scales = histogram_cube.scales(viz_col)
+                        hist_scale = st.radio("Bins", hist_scales, horizontal=True, key="viz_hist_scale",
+                                              format_func=str.capitalize) if len(hist_scales) > 1 else hist_scales[0] if hist_scales else None
+                        if hist_scale is None:
+                            edges, counts = np.array([0.0, 1.0]), np.zeros(1, dtype=np.int64)
+                        elif len(view_bits) == time_bits and selection_key == dataset_version():
+                            # Only the time filter applies: sum of precomputed bucket histograms
+                            edges, counts = histogram_cube.histogram(viz_col, hist_scale, *(time_window or (None, None)))
+                        else:
+                            # Other filters: bin the selected rows on the same precomputed edges
+                            values = base_df[viz_col].to_numpy()
+                            edges, counts = histogram_cube.histogram_of(viz_col, values if selection_rows is None else values[selection_rows], hist_scale)
+                        centers = (edges[:-1] + edges[1:]) / 2
+                        
                         # Create histogram for numeric fields with gradient color scheme
                         fig = go.Figure()
-                        fig.add_trace(go.Histogram(
-                            x=filtered_df[viz_col],
-                            nbinsx=20,
+                        fig.add_trace(go.Bar(
+                            x=centers if hist_scale == 'linear' else [f"{a:,.4g}–{b:,.4g}" for a, b in zip(edges[:-1], edges[1:])],
+                            y=counts,
+                            width=np.diff(edges) if hist_scale == 'linear' else None,
                             marker=dict(
-                                color=filtered_df[viz_col],
+                                color=centers,
                                 colorscale=[
                                     [0, '#00f2ff'],      # Start with cyan
                                     [0.33, '#00ff9d'],   # Move to green
@@ -1724,6 +2252,85 @@ def main():
                         st.plotly_chart(fig, use_container_width=True)
                     else:
                         st.info("No time fields available in the dataset")
+            
+            # Weekly activity heatmap, read from a (15-minute bucket, group) cube of the time filter's column
+            st.markdown("<div class='panel-header' style='margin-top:15px;'>WEEKLY ACTIVITY</div>", 
+                        unsafe_allow_html=True)
+            if time_order is None:
+                st.info("Select a timestamp column in the time filter to see weekly activity")
+            else:
+                week_cols = st.columns(3)
+                with week_cols[0]:
+                    week_resolution = st.radio("Resolution", list(WEEK_RESOLUTIONS.keys()), horizontal=True, key="week_resolution")
+                with week_cols[1]:
+                    week_group_col = st.selectbox("Split by", ["None"] + categorical_cols, key="week_group_col")
+                activity_cube = cached_activity_cube(file_id, timestamp_col, week_group_col, base_df, time_order, time_sorted)
+                with week_cols[2]:
+                    week_group = st.selectbox("Show", ["All"] + list(activity_cube.groups), key="week_group",
+                                              disabled=week_group_col == "None")
+                
+                if len(view_bits) == time_bits and selection_key == dataset_version():
+                    # Only the time filter applies: sum of the cube's buckets
+                    week_counts = activity_cube.window(*(time_window or (None, None)))
+                else:
+                    week_counts = activity_cube.selection(selection_rows)
+                week_counts = week_counts.sum(axis=0) if week_group == "All" or week_group not in activity_cube.groups else \
+                    week_counts[activity_cube.groups.get_loc(week_group)]
+                
+                slots_per_day = WEEK_RESOLUTIONS[week_resolution]
+                week_matrix = ActivityCube.heatmap(week_counts, slots_per_day)
+                slot_labels = [f"{m // 60:02d}:{m % 60:02d}" for m in range(0, 1440, 1440 // slots_per_day)]
+                fig = go.Figure(go.Heatmap(
+                    z=week_matrix, x=slot_labels, y=WEEKDAYS,
+                    colorscale=[[0, '#181b24'], [0.33, '#00f2ff'], [0.66, '#ff5900'], [1, '#ff3864']],
+                    hovertemplate='%{y} %{x}<br>Events: %{z}<extra></extra>'
+                ))
+                fig = cyberpunk_plot_layout(fig, height=300)
+                fig.update_yaxes(autorange='reversed')
+                st.plotly_chart(fig, use_container_width=True)
+                
+                # Off-hours: weekends and weekdays outside 08:00-18:00
+                hourly = ActivityCube.heatmap(week_counts, 24)
+                total_events = hourly.sum()
+                if total_events:
+                    off_hours = total_events - hourly[:5, 8:18].sum()
+                    st.caption(f"Off-hours activity (weekends, weekdays before 08:00 or after 18:00): {off_hours / total_events:.1%} of {int(total_events):,} events")
+            
+            # Crosstab of any two fields, one bincount over cached codes
+            st.markdown("<div class='panel-header' style='margin-top:15px;'>FIELD CORRELATION</div>", 
+                        unsafe_allow_html=True)
+            crosstab_fields = [col for col in all_cols if col not in datetime_cols]
+            if len(crosstab_fields) < 2:
+                st.info("At least two non-date fields are needed for a crosstab")
+            else:
+                xtab_cols = st.columns(4)
+                with xtab_cols[0]:
+                    xtab_row = st.selectbox("Rows", crosstab_fields, key="crosstab_row",
+                                            index=crosstab_fields.index('proto') if 'proto' in crosstab_fields else 0)
+                with xtab_cols[1]:
+                    xtab_col = st.selectbox("Columns", crosstab_fields, key="crosstab_col",
+                                            index=crosstab_fields.index('dst_port') if 'dst_port' in crosstab_fields else 1)
+                with xtab_cols[2]:
+                    xtab_value = st.selectbox("Cell value", ["Event count"] + [f"Sum of {col}" for col in numeric_cols], key="crosstab_value")
+                with xtab_cols[3]:
+                    xtab_top = st.slider("Top values per axis", 5, 30, 15, key="crosstab_top")
+                
+                value_col = None if xtab_value == "Event count" else xtab_value[len("Sum of "):]
+                xtab_counts, xtab_sums = cached_crosstab_engine(file_id, base_df).crosstab(
+                    xtab_row, xtab_col, selection_rows, top=(xtab_top, xtab_top), value_col=value_col)
+                xtab_matrix = xtab_counts if value_col is None else xtab_sums
+                if xtab_matrix.empty:
+                    st.info("No events in the current selection")
+                else:
+                    fig = go.Figure(go.Heatmap(
+                        z=xtab_matrix.values, x=xtab_matrix.columns, y=xtab_matrix.index,
+                        colorscale=[[0, '#181b24'], [0.33, '#00f2ff'], [0.66, '#ff5900'], [1, '#ff3864']],
+                        hovertemplate=f'{xtab_row}: %{{y}}<br>{xtab_col}: %{{x}}<br>{xtab_value}: %{{z:,}}<extra></extra>'
+                    ))
+                    fig = cyberpunk_plot_layout(fig, height=max(300, 24 * len(xtab_matrix.index) + 120))
+                    fig.update_xaxes(type='category', title=xtab_col)
+                    fig.update_yaxes(type='category', title=xtab_row, autorange='reversed')
+                    st.plotly_chart(fig, use_container_width=True)
         
             st.markdown("</div>", unsafe_allow_html=True)
             
@@ -1769,85 +2376,67 @@ def main():
                         key="std_dev_multiplier",
                         help="Width of the confidence channel in standard deviations"
                     )
+                
+                # Expected traffic: EMA of the recent buckets, median of the recent buckets,
+                # or median of the same slot across the history
+                mode_col, option_col, points_col = st.columns([2, 1, 1])
+                with mode_col:
+                    detection_mode = st.radio("Baseline", ["EMA channel", "Robust median/MAD", "Seasonal profile",
+                                                           "Holt-Winters forecast"],
+                                              horizontal=True, key="detection_mode")
+                with option_col:
+                    if detection_mode == "Holt-Winters forecast":
+                        forecast_horizon = st.slider("Forecast buckets", min_value=1, max_value=200, value=20, step=1,
+                                                     key="forecast_horizon",
+                                                     help="Buckets projected past the last one, with their prediction interval")
+                    elif detection_mode == "Robust median/MAD":
+                        robust_window = st.slider("Median window", min_value=3, max_value=240, value=30, step=1,
+                                                  key="robust_window",
+                                                  help="Previous buckets whose median and MAD form the expectation")
+                    else:
+                        season = st.selectbox("Season", list(SEASONS), key="detection_season",
+                                              disabled=detection_mode != "Seasonal profile",
+                                              help="Slots whose median and MAD form the seasonal expectation")
+                with points_col:
+                    target_points = st.slider("Target points", min_value=30, max_value=DETECTION_MAX_POINTS,
+                                              value=DETECTION_TARGET_POINTS, step=10, key="detection_points",
+                                              help="Most buckets in the series, the narrowest width staying under it is used")
                                 
                 # Create time series analysis
                 try:
-                    # Ensure timestamp column is properly formatted
-                    time_df = df.copy()
-                    if not pd.api.types.is_datetime64_any_dtype(time_df[selected_time_col]):
-                        time_df = parse_timestamp(time_df, selected_time_col)
-                    
-                    # Determine appropriate time resolution based on data range
-                    min_date = time_df[selected_time_col].min()
-                    max_date = time_df[selected_time_col].max()
-                    date_range = (max_date - min_date).total_seconds()
-                    
-                    # Dynamically adjust frequency based on data range and point count
-                    # Aim for at least 30-50 data points for good visualization
-                    if date_range < 3600:  # Less than 1 hour
-                        freq = '30S'  # 30 seconds
-                    elif date_range < 86400:  # Less than 1 day
-                        freq = '5min'
-                    elif date_range < 604800:  # Less than 1 week
-                        freq = '1H'
-                    elif date_range < 2592000:  # Less than 1 month
-                        freq = '6H'
-                    else:
-                        freq = '1D'
-                    
-                    # Log the frequency for debugging
-                    st.write(f"Time range: {min_date} to {max_date} ({date_range:.1f} seconds). Using frequency: {freq}")
-                    
-                    # Create time series with consistent frequency - improved method
-                    # First create a proper datetime index
-                    time_df = time_df.set_index(selected_time_col)
-                    
-                    # Group by time intervals and count occurrences
-                    ts_counts = time_df.groupby(pd.Grouper(freq=freq)).size()
-                    
-                    # Convert back to dataframe for plotting
-                    ts_data = ts_counts.reset_index()
-                    ts_data.columns = [selected_time_col, 'count']
-                    
-                    # Check if we have enough data points
-                    if len(ts_data) <= ema_window:
-                        # If not enough points with current frequency, use a coarser frequency
-                        st.warning(f"Only found {len(ts_data)} time points with {freq} frequency. Trying a coarser grouping.")
-                        
-                        # Try a coarser frequency to get more data points
-                        if freq == '30S':
-                            new_freq = '1min'
-                        elif freq == '5min':
-                            new_freq = '15min'
-                        elif freq == '1H':
-                            new_freq = '4H'
-                        elif freq == '6H':
-                            new_freq = '1D'
-                        else:
-                            new_freq = '1W'
-                            
-                        # Regroup with new frequency
-                        time_df = df.copy()
-                        if not pd.api.types.is_datetime64_any_dtype(time_df[selected_time_col]):
-                            time_df = parse_timestamp(time_df, selected_time_col)
-                        time_df = time_df.set_index(selected_time_col)
-                        
-                        ts_counts = time_df.groupby(pd.Grouper(freq=new_freq)).size()
-                        ts_data = ts_counts.reset_index()
-                        ts_data.columns = [selected_time_col, 'count']
-                        
-                        st.write(f"Adjusted to {new_freq} frequency, now have {len(ts_data)} time points.")
+                    # One pass over the timestamps, every width is a sum of the finest buckets
+                    bucket_series = cached_bucket_series(dataset_version(), selected_time_col, df)
+                    freq = bucket_series.auto_freq(target_points)
+                    ts_counts = bucket_series.at(freq)
+                    ts_data = ts_counts.rename_axis(selected_time_col).reset_index(name='count')
+                    if len(ts_data):
+                        st.caption(f"{len(ts_data):,} buckets of {freq} from {ts_data[selected_time_col].iloc[0]} "
+                                   f"to {ts_data[selected_time_col].iloc[-1]}")
                     
                     # Now check if we have valid data after grouping
                     if len(ts_data) > ema_window:
-                        # Calculate EMA and continue with the rest of your code
-                        ts_data['ema'] = ts_data['count'].ewm(span=ema_window, adjust=False).mean()
-                    
-                        # Calculate standard deviation for confidence channel
-                        rolling_std = ts_data['count'].rolling(window=ema_window).std()
-                        ts_data['upper_band'] = ts_data['ema'] + (rolling_std * std_multiplier)
-                        ts_data['lower_band'] = ts_data['ema'] - (rolling_std * std_multiplier)
-                        ts_data['lower_band'] = ts_data['lower_band'].clip(lower=0)  # Prevent negative values
+                        if detection_mode == "Seasonal profile":
+                            # Profiles are fitted once per dataset and persisted, scoring is a slot lookup
+                            profile = cached_seasonal_profile(dataset_version(), selected_time_col, freq, season,
+                                                              None if view_bits else st.session_state.file_digest[1], ts_data)
+                            ts_data = pd.concat([ts_data[[selected_time_col, 'count']],
+                                                 profile.score(ts_data[selected_time_col], ts_data['count'], std_multiplier)], axis=1)
+                            baseline_label = f"{season} median"
+                        elif detection_mode == "Robust median/MAD":
+                            # Spikes never enter the window scoring them and barely move its median and MAD
+                            ts_data = pd.concat([ts_data[[selected_time_col, 'count']],
+                                                 robust_channel(ts_data['count'], robust_window, std_multiplier)], axis=1)
+                            baseline_label = f"Median-{robust_window}"
+                        elif detection_mode == "Holt-Winters forecast":
+                            # Fitted once per dataset and width, each new bucket is one update of level, trend and season
+                            hw_model, ts_data, hw_forecast = holt_winters_channel(ts_data, selected_time_col, freq,
+                                                                                  std_multiplier, forecast_horizon)
+                            baseline_label = f"Holt-Winters (season {hw_model.season})"
+                        else:
+                            # EMA and confidence channel from the online detector, only new buckets are ingested
+                            detector, ts_data = ema_channel(ts_data, selected_time_col, freq, ema_window, std_multiplier)
+                            ts_data = ts_data.rename(columns={'ema': 'expected'})
+                            baseline_label = f'EMA-{ema_window}'
                         
                         # Create cyberpunk-styled visualization
                         fig = go.Figure()
@@ -1882,19 +2471,35 @@ def main():
                             hovertemplate='%{y} events<br>%{x}<extra></extra>'
                         ))
                         
-                        # Add the EMA line
+                        # Add the expected traffic line
                         fig.add_trace(go.Scatter(
                             x=ts_data[selected_time_col],
-                            y=ts_data['ema'],
+                            y=ts_data['expected'],
                             mode='lines',
                             line=dict(color='#ff5900', width=2.5),
-                            name=f'EMA-{ema_window}',
-                            hovertemplate='EMA: %{y:.1f}<br>%{x}<extra></extra>'
+                            name=baseline_label,
+                            hovertemplate='Expected: %{y:.1f}<br>%{x}<extra></extra>'
                         ))
                         
+                        # Projected traffic and prediction interval past the last bucket
+                        if detection_mode == "Holt-Winters forecast":
+                            fig.add_trace(go.Scatter(
+                                x=pd.concat([hw_forecast[selected_time_col], hw_forecast[selected_time_col][::-1]]),
+                                y=pd.concat([hw_forecast['upper_band'], hw_forecast['lower_band'][::-1]]),
+                                fill='toself', fillcolor='rgba(255, 89, 0, 0.12)', line=dict(width=0),
+                                name=f'{std_multiplier}σ Forecast interval', hoverinfo='skip'
+                            ))
+                            fig.add_trace(go.Scatter(
+                                x=hw_forecast[selected_time_col],
+                                y=hw_forecast['expected'],
+                                mode='lines',
+                                line=dict(color='#ff5900', width=2, dash='dash'),
+                                name='Forecast',
+                                hovertemplate='Forecast: %{y:.1f}<br>%{x}<extra></extra>'
+                            ))
+                        
                         # Identify potential anomalies (points outside the confidence channel)
-                        anomalies = ts_data[(ts_data['count'] > ts_data['upper_band']) | 
-                                        (ts_data['count'] < ts_data['lower_band'])]
+                        anomalies = ts_data[ts_data['anomaly']].copy()
                         
                         if not anomalies.empty:
                             fig.add_trace(go.Scatter(
@@ -1994,11 +2599,130 @@ def main():
                             
                             # Show anomaly details
                             with st.expander("🔍 View Anomaly Details", expanded=False):
-                                # Calculate percentage deviation from expected (EMA)
-                                anomalies['deviation'] = ((anomalies['count'] - anomalies['ema']) / anomalies['ema'] * 100).round(1)
-                                anomalies_display = anomalies[[selected_time_col, 'count', 'ema', 'deviation']].copy()
-                                anomalies_display.columns = ['Timestamp', 'Event Count', 'Expected (EMA)', 'Deviation %']
+                                # Calculate percentage deviation from expected
+                                anomalies['deviation'] = ((anomalies['count'] - anomalies['expected']) / anomalies['expected'] * 100).round(1)
+                                anomalies_display = anomalies[[selected_time_col, 'count', 'expected', 'deviation']].copy()
+                                anomalies_display.columns = ['Timestamp', 'Event Count', f'Expected ({baseline_label})', 'Deviation %']
+                                
+                                # Each flagged bucket against its previous buckets, per source subnet, port, protocol, rule and interface
+                                contributions = cached_contribution_cube(dataset_version(), selected_time_col, freq, df)
+                                explanations = {timestamp: contributions.explain(timestamp) for timestamp in anomalies[selected_time_col]}
+                                anomalies_display['Top contributor'] = [top_contributor(explanations[timestamp])
+                                                                        for timestamp in anomalies[selected_time_col]]
                                 st.dataframe(anomalies_display, use_container_width=True)
+                                
+                                explain_at = st.selectbox("Explain bucket", list(explanations), key="explain_bucket",
+                                                          format_func=lambda timestamp: str(timestamp))
+                                st.dataframe(explanations[explain_at].rename(columns={
+                                    'dimension': 'Dimension', 'value': 'Value', 'count': 'Count', 'expected': 'Baseline',
+                                    'excess': 'Excess events', 'share': 'Share of excess %'
+                                }).round({'Baseline': 1, 'Excess events': 1, 'Share of excess %': 1}),
+                                    use_container_width=True, hide_index=True)
+
+                        # Detector state, to resume the channel on a live feed without replaying history
+                        if detection_mode == "EMA channel":
+                            st.download_button(
+                                "💾 Export detector state",
+                                detector.to_json(),
+                                file_name=f"ema_detector_{ema_window}_{std_multiplier}.json",
+                                mime="application/json",
+                                key="ema_detector_state"
+                            )
+                        elif detection_mode == "Holt-Winters forecast":
+                            st.download_button(
+                                "💾 Export model state",
+                                hw_model.to_json(),
+                                file_name=f"holt_winters_{freq}.json",
+                                mime="application/json",
+                                key="holt_winters_state"
+                            )
+
+                        # Sustained level shifts, which the channel absorbs after a few buckets
+                        st.markdown("<div class='panel-header' style='margin-top:15px;'>CHANGE POINTS</div>",
+                                    unsafe_allow_html=True)
+                        cp_cols = st.columns([2, 1])
+                        with cp_cols[0]:
+                            cp_method = st.radio("Segmentation", CHANGEPOINT_METHODS, horizontal=True, key="changepoint_method")
+                        with cp_cols[1]:
+                            cp_penalty = st.slider("Penalty", min_value=0.5, max_value=5.0, value=1.0, step=0.5,
+                                                   key="changepoint_penalty",
+                                                   help="Multiple of the 2·log(n) cost a new regime must save to be kept")
+                        counts = ts_data['count'].to_numpy(dtype=np.float64)
+                        points = change_points(counts, cp_method, cp_penalty * 2 * np.log(max(len(counts), 2)))
+                        alarms = cusum(counts)
+                        segments = segments_table(ts_data[selected_time_col], counts, points)
+                        if cp_method == 'PELT' and len(counts) > PELT_MAX_POINTS:
+                            st.caption(f"{len(counts):,} buckets: segmented by binary segmentation instead of PELT")
+                        
+                        cp_fig = go.Figure()
+                        cp_fig.add_trace(go.Scatter(
+                            x=ts_data[selected_time_col], y=counts, mode='lines',
+                            line=dict(color='#00f2ff', width=1.2), name='Event Count',
+                            hovertemplate='%{y} events<br>%{x}<extra></extra>'
+                        ))
+                        cp_fig.add_trace(go.Scatter(
+                            x=ts_data[selected_time_col], y=np.repeat(segments['mean'].to_numpy(), segments['buckets'].to_numpy()),
+                            mode='lines', line=dict(color='#ff5900', width=2.5, shape='hv'), name='Regime level',
+                            hovertemplate='Level: %{y:.1f}<br>%{x}<extra></extra>'
+                        ))
+                        for boundary in segments['start'].iloc[1:]:
+                            cp_fig.add_vline(x=boundary, line=dict(color='rgba(255, 56, 100, 0.8)', width=1.5, dash='dash'))
+                        if alarms:
+                            alarm_at = np.array([alarm for alarm, _, _ in alarms])
+                            cp_fig.add_trace(go.Scatter(
+                                x=ts_data[selected_time_col].iloc[alarm_at], y=counts[alarm_at], mode='markers',
+                                marker=dict(symbol=['triangle-up' if sign > 0 else 'triangle-down' for _, _, sign in alarms],
+                                            size=11, color='#ffd400', line=dict(color='#ffffff', width=1)),
+                                name='CUSUM alarm', hovertemplate='CUSUM alarm: %{y} events<br>%{x}<extra></extra>'
+                            ))
+                        cp_fig.update_layout(
+                            template="plotly_dark",
+                            plot_bgcolor='rgba(23, 28, 38, 0.8)',
+                            paper_bgcolor='rgba(0, 0, 0, 0)',
+                            margin=dict(l=10, r=10, t=30, b=10),
+                            height=320,
+                            legend=dict(orientation="h", y=1.02, x=0.5, xanchor="center", font=dict(color='#d8d9da', size=10)),
+                            xaxis=dict(title=None, gridcolor='rgba(26, 32, 44, 0.8)', tickfont=dict(color='#d8d9da')),
+                            yaxis=dict(title='Event Count', gridcolor='rgba(26, 32, 44, 0.8)', tickfont=dict(color='#d8d9da'),
+                                       title_font=dict(color='#00f2ff')),
+                            hovermode='closest'
+                        )
+                        st.plotly_chart(cp_fig, use_container_width=True)
+                        
+                        cp_metrics = st.columns(3)
+                        with cp_metrics[0]:
+                            create_metric_card("REGIMES", f"{len(segments)}")
+                        with cp_metrics[1]:
+                            create_metric_card("CUSUM ALARMS", f"{len(alarms)}")
+                        with cp_metrics[2]:
+                            largest = segments['change'].abs().max() if len(segments) > 1 else 0.0
+                            create_metric_card("LARGEST SHIFT", f"{largest:.0f}%")
+                        with st.expander("📏 Regime Details", expanded=False):
+                            st.dataframe(segments.rename(columns={
+                                'start': 'Start', 'end': 'End', 'buckets': 'Buckets', 'mean': 'Mean count', 'change': 'Change %'
+                            }).round({'Mean count': 1, 'Change %': 1}), use_container_width=True, hide_index=True)
+
+                        # Same channel run per entity, every series of an entity × bucket matrix at once
+                        st.markdown("<div class='panel-header' style='margin-top:15px;'>ENTITY ANOMALIES</div>",
+                                    unsafe_allow_html=True)
+                        entity_cols = [col for col in dict.fromkeys([find_src_ip_col(df), *ENTITY_COLUMNS]) if col in df.columns]
+                        if not entity_cols:
+                            st.info("No source IP, port or rule column to split the detection by")
+                        else:
+                            entity_col = st.selectbox("Detect per", entity_cols, key="entity_detection_col")
+                            ranked = cached_entity_anomalies(dataset_version(), selected_time_col, entity_col, freq,
+                                                             ema_window, std_multiplier, df)
+                            if ranked is None or ranked.empty:
+                                st.info(f"No {entity_col} leaves its own {std_multiplier}σ channel")
+                            else:
+                                st.caption(f"Each {entity_col} is scored against the EMA channel of its previous {freq} buckets, "
+                                           "ranked by events above the channel")
+                                st.dataframe(ranked.rename(columns={
+                                    'entity': entity_col, 'events': 'Events', 'anomalies': 'Anomalous buckets',
+                                    'excess': 'Excess events', 'peak_time': 'Peak bucket', 'peak_count': 'Peak count',
+                                    'expected': 'Expected (EMA)', 'peak_score': 'Peak σ'
+                                }).round({'Excess events': 1, 'Expected (EMA)': 1, 'Peak σ': 1}),
+                                    use_container_width=True, hide_index=True)
                     else:
                         st.warning(f"⚠️ Not enough data points for analysis. Need at least {ema_window+1} time points, but only have {len(ts_data)}.")
                 
@@ -2008,6 +2732,44 @@ def main():
             
             st.markdown("</div>", unsafe_allow_html=True)
             
+            # Threat intelligence panel
+            st.markdown("<div class='grafana-panel'>", unsafe_allow_html=True)
+            st.markdown("<div class='panel-header'>THREAT INTEL MATCHING</div>", unsafe_allow_html=True)
+            
+            intel_matchers = cached_intel_matchers(intel_key)
+            if not intel_matchers:
+                st.info(f"No threat-intel feeds found. Drop CIDR lists (.txt, .netset, .csv...) into {os.path.abspath(INTEL_DIR)}")
+            elif 'intel_hit' not in df.columns:
+                st.info("No source IP column to match against the threat-intel feeds.")
+            else:
+                hit_count = int(df['intel_hit'].sum())
+                metric_cols = st.columns(4)
+                with metric_cols[0]:
+                    create_metric_card("FEEDS", f"{len(intel_matchers)}")
+                with metric_cols[1]:
+                    create_metric_card("RANGES", f"{sum(m.ranges for m in intel_matchers):,}")
+                with metric_cols[2]:
+                    create_metric_card("INTEL HITS", f"{hit_count:,}")
+                with metric_cols[3]:
+                    create_metric_card("HIT RATE", f"{hit_count / max(len(df), 1) * 100:.2f}%")
+                
+                feed_stats = pd.DataFrame({
+                    'Feed': [m.name for m in intel_matchers],
+                    'Entries': [m.entries for m in intel_matchers],
+                    'Merged Ranges': [m.ranges for m in intel_matchers],
+                })
+                feed_stats['Hits'] = feed_stats['Feed'].map(df['intel_feed'].value_counts()).fillna(0).astype(int)
+                st.dataframe(feed_stats, use_container_width=True)
+                
+                if hit_count:
+                    src_col = find_src_ip_col(df)
+                    top_hits = df.loc[df['intel_hit'], src_col].value_counts().nlargest(15)
+                    top_hits = top_hits[top_hits > 0].rename_axis("Source IP").reset_index(name="Events")
+                    st.markdown("<div class='panel-header' style='margin-top:15px;'>TOP MATCHED SOURCES</div>", unsafe_allow_html=True)
+                    st.dataframe(top_hits, use_container_width=True)
+            
+            st.markdown("</div>", unsafe_allow_html=True)
+            
             # Additional analysis panel
             st.markdown("<div class='grafana-panel'>", unsafe_allow_html=True)
             st.markdown("<div class='panel-header'>PATTERN DETECTION</div>", unsafe_allow_html=True)
@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+
+from pages.ressources.flow_cube import top_group_codes
+
+
+# Slots per day of the weekly heatmap, the cube itself is kept at the finest one
+WEEK_RESOLUTIONS = {'Hourly (7×24)': 24, '15 min (7×96)': 96}
+WEEKDAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+ACTIVITY_GROUPS = 8
+
+_DAY_NS = 86_400 * 10**9
+_SLOTS_PER_DAY = max(WEEK_RESOLUTIONS.values())
+_SLOT_NS = _DAY_NS // _SLOTS_PER_DAY
+
+
+def week_slots(values):
+    """Slot of the week (Monday 00:00 first) of int64 nanosecond timestamps"""
+    days = values // _DAY_NS
+    # 1970-01-01 was a Thursday
+    return ((days + 3) % 7) * _SLOTS_PER_DAY + (values % _DAY_NS) // _SLOT_NS
+
+
+class ActivityCube:
+    """Event counts per (15-minute bucket, group), each bucket falling in one slot of the week
+
+    A time window is the sum of its whole buckets plus its edge rows, folded
+    into week slots by one weighted bincount; other selections are binned from
+    the per-row slot ids.
+    """
+
+    def __init__(self, time_order, time_sorted, groups=None):
+        n_rows = len(time_order)
+        self.time_order = time_order
+        self.time_sorted = time_sorted
+        if groups is None:
+            group_codes, self.groups = np.zeros(n_rows, dtype=np.int64), pd.Index(['All'])
+        else:
+            group_codes, self.groups = top_group_codes(groups, ACTIVITY_GROUPS)
+        n_groups = len(self.groups)
+
+        # NaT sorts first and gets no slot
+        self.first = np.searchsorted(time_sorted, np.iinfo(np.int64).min, side='right')
+        timed = time_sorted[self.first:]
+        # Slots and groups fit in int16, they are widened only inside each bincount
+        group_codes = group_codes.astype(np.int16)
+        self.slot_sorted = np.full(n_rows, -1, dtype=np.int16)
+        self.slot_sorted[self.first:] = week_slots(timed)
+        self.group_sorted = group_codes[time_order]
+        self.row_slots = np.empty(n_rows, dtype=np.int16)
+        self.row_slots[time_order] = self.slot_sorted
+        self.row_groups = group_codes
+
+        if len(timed):
+            origin = timed[0] - timed[0] % _SLOT_NS
+            boundaries = origin + _SLOT_NS * np.arange((timed[-1] - origin) // _SLOT_NS + 2)
+            self.bucket_starts = np.searchsorted(time_sorted, boundaries, side='left')
+            n_buckets = len(boundaries) - 1
+            self.bucket_slots = week_slots(boundaries[:-1])
+            bucket = np.repeat(np.arange(n_buckets), np.diff(self.bucket_starts))
+            self.counts = np.bincount(bucket * n_groups + self.group_sorted[self.first:],
+                                      minlength=n_buckets * n_groups).reshape(n_buckets, n_groups)
+        else:
+            self.bucket_starts = np.array([self.first])
+            self.bucket_slots = np.empty(0, dtype=np.int64)
+            self.counts = np.zeros((0, n_groups), dtype=np.int64)
+
+    def _fold(self, slots, groups, weights=None):
+        """(group, week slot) matrix of slot ids, group ids and optional weights"""
+        n_groups = len(self.groups)
+        keep = slots >= 0
+        flat = np.bincount(groups[keep].astype(np.int64) * (7 * _SLOTS_PER_DAY) + slots[keep],
+                           weights=None if weights is None else weights[keep],
+                           minlength=n_groups * 7 * _SLOTS_PER_DAY)
+        return flat.reshape(n_groups, 7 * _SLOTS_PER_DAY)
+
+    def _rows(self, lo, hi):
+        return self._fold(self.slot_sorted[lo:hi], self.group_sorted[lo:hi])
+
+    def window(self, start=None, end=None):
+        """(group, week slot) counts of start <= timestamp <= end, or of every timed row"""
+        lo = self.first if start is None else max(self.first, np.searchsorted(self.time_sorted, pd.Timestamp(start).value, side='left'))
+        hi = len(self.time_sorted) if end is None else np.searchsorted(self.time_sorted, pd.Timestamp(end).value, side='right')
+        first = np.searchsorted(self.bucket_starts, lo, side='left')
+        last = np.searchsorted(self.bucket_starts, hi, side='right') - 1
+        if first >= last:
+            return self._rows(lo, hi)
+        n_groups = len(self.groups)
+        whole = self.counts[first:last]
+        slots = np.repeat(self.bucket_slots[first:last], n_groups)
+        groups = np.tile(np.arange(n_groups), last - first)
+        result = self._fold(slots, groups, whole.ravel().astype(np.float64))
+        return result + self._rows(lo, self.bucket_starts[first]) + self._rows(self.bucket_starts[last], hi)
+
+    def selection(self, rows):
+        """(group, week slot) counts of arbitrary row positions"""
+        return self._fold(self.row_slots[rows], self.row_groups[rows])
+
+    @staticmethod
+    def heatmap(counts, slots_per_day):
+        """7 × slots_per_day matrix of one group's week-slot counts"""
+        matrix = np.asarray(counts).reshape(7, _SLOTS_PER_DAY)
+        return matrix.reshape(7, slots_per_day, _SLOTS_PER_DAY // slots_per_day).sum(axis=2)
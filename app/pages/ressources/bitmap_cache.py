@@ -0,0 +1,90 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+# Packed bitmaps use one bit per row; the cache is bounded by their total size
+BITMAP_CACHE_BYTES = 256 * 1024 * 1024
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def pack(mask):
+    """Compress a boolean row mask to one bit per row"""
+    return np.packbits(np.asarray(mask, dtype=bool))
+
+
+def rows_to_bitmap(rows, n_rows):
+    """Bitmap of a set of row positions"""
+    mask = np.zeros(n_rows, dtype=bool)
+    mask[rows] = True
+    return pack(mask)
+
+
+def unpack(bits, n_rows):
+    """Boolean row mask of a bitmap"""
+    return np.unpackbits(bits, count=n_rows).view(bool)
+
+
+def bitmap_rows(bits, n_rows):
+    """Sorted row positions set in a bitmap"""
+    return np.flatnonzero(unpack(bits, n_rows))
+
+
+def bitmap_count(bits):
+    """Number of rows set in a bitmap"""
+    return int(_POPCOUNT[bits].sum(dtype=np.int64))
+
+
+def bitmap_and(*bitmaps):
+    return np.bitwise_and.reduce(bitmaps) if len(bitmaps) > 1 else bitmaps[0]
+
+
+def bitmap_or(*bitmaps):
+    return np.bitwise_or.reduce(bitmaps) if len(bitmaps) > 1 else bitmaps[0]
+
+
+def bitmap_not(bits, n_rows):
+    """Complement of a bitmap, keeping the padding bits of the last byte clear"""
+    result = ~bits
+    if n_rows % 8:
+        result[-1] &= (0xFF << (8 - n_rows % 8)) & 0xFF
+    return result
+
+
+class BitmapCache:
+    """Packed predicate bitmaps over the rows of one dataset, least recently used evicted first"""
+
+    def __init__(self, n_rows, max_bytes=BITMAP_CACHE_BYTES):
+        self.n_rows = n_rows
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._bitmaps = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, compute):
+        """Return the bitmap of a predicate, calling compute() for its mask or bitmap on a miss"""
+        with self._lock:
+            if key in self._bitmaps:
+                self._bitmaps.move_to_end(key)
+                self.hits += 1
+                return self._bitmaps[key]
+        result = np.asarray(compute())
+        bits = pack(result) if result.dtype == bool else result
+        with self._lock:
+            self.misses += 1
+            if key not in self._bitmaps:
+                self._bitmaps[key] = bits
+                self.nbytes += bits.nbytes
+            while self.nbytes > self.max_bytes and len(self._bitmaps) > 1:
+                self.nbytes -= self._bitmaps.popitem(last=False)[1].nbytes
+        return bits
+
+    def rows(self, bits):
+        return bitmap_rows(bits, self.n_rows)
+
+    def view(self, df, bits):
+        """Gather the rows of a bitmap from the frame it indexes"""
+        return df.take(self.rows(bits))
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+
+from pages.ressources.crossfilter import TIME_BUCKET_FREQS
+
+
+# Most buckets a detection series can be asked for, which fixes the finest width counted
+DETECTION_MAX_POINTS = 2_000
+DETECTION_TARGET_POINTS = 200
+
+
+class BucketSeries:
+    """Event counts of a timestamp column at the finest bucket width ever needed
+
+    The timestamps are scanned once. Every coarser width of TIME_BUCKET_FREQS
+    that is a multiple of the finest is then the sum of runs of adjacent fine
+    buckets, so changing the resolution never touches the rows again.
+    """
+
+    def __init__(self, times, max_points=DETECTION_MAX_POINTS):
+        times = pd.Series(times)
+        if times.dt.tz is not None:
+            times = times.dt.tz_localize(None)
+        values = times.to_numpy(dtype='datetime64[ns]').view(np.int64)
+        values = values[~pd.isna(times).to_numpy()]
+        self.low, self.high = (int(values.min()), int(values.max())) if len(values) else (0, 0)
+
+        self.freqs = []
+        for freq in TIME_BUCKET_FREQS:
+            step = pd.Timedelta(freq).value
+            # The finest width keeps at most max_points buckets, coarser ones must be multiples of it
+            if self.freqs or self.n_buckets(freq) <= max_points or freq == TIME_BUCKET_FREQS[-1]:
+                if not self.freqs or step % pd.Timedelta(self.freqs[0]).value == 0:
+                    self.freqs.append(freq)
+        self.step = pd.Timedelta(self.freqs[0]).value
+        if len(values):
+            low = values.min()
+            self.origin = low - low % self.step
+            self.counts = np.bincount((values - self.origin) // self.step)
+        else:
+            self.origin = 0
+            self.counts = np.zeros(0, dtype=np.int64)
+
+    def n_buckets(self, freq):
+        """Epoch-aligned buckets of a width from the first to the last timestamp"""
+        step = pd.Timedelta(freq).value
+        return self.high // step - self.low // step + 1
+
+    def auto_freq(self, target=DETECTION_TARGET_POINTS):
+        """Narrowest available width giving at most target buckets"""
+        for freq in self.freqs:
+            if self.n_buckets(freq) <= target:
+                return freq
+        return self.freqs[-1]
+
+    def at(self, freq):
+        """Counts per bucket of a width of self.freqs, every bucket of the span included"""
+        step = pd.Timedelta(freq).value
+        factor = step // self.step
+        origin = self.origin - self.origin % step
+        # Fine buckets before the first one in the coarse bucket, then padded to whole coarse buckets
+        lead = (self.origin - origin) // self.step
+        n_buckets = -(-(lead + len(self.counts)) // factor)
+        fine = np.zeros(n_buckets * factor, dtype=np.int64)
+        fine[lead:lead + len(self.counts)] = self.counts
+        counts = fine.reshape(n_buckets, factor).sum(axis=1)
+        return pd.Series(counts, index=pd.to_datetime(origin + step * np.arange(n_buckets)))
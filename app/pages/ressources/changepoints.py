@@ -0,0 +1,172 @@
+import numpy as np
+import pandas as pd
+
+
+CHANGEPOINT_METHODS = ('PELT', 'Binary segmentation')
+# PELT keeps every candidate of a long stable segment, longer series are split by binary segmentation
+PELT_MAX_POINTS = 20_000
+# Shortest regime, shorter excursions are left to the spike detectors
+CHANGEPOINT_MIN_SIZE = 5
+# CUSUM allowance and decision threshold, in noise standard deviations
+CUSUM_DRIFT = 0.5
+CUSUM_THRESHOLD = 8.0
+# Buckets setting the level of a new regime, and first horizon scanned for the next alarm
+CUSUM_WARMUP = 64
+CUSUM_HORIZON = 4096
+MAD_SCALE = 1.4826
+
+
+def noise_scale(values):
+    """Standard deviation of the noise around the level, from the MAD of successive differences
+
+    Differencing removes the level, so sustained shifts do not inflate it.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) < 3:
+        return 1.0
+    diffs = np.diff(values)
+    sigma = np.median(np.abs(diffs - np.median(diffs))) * MAD_SCALE / np.sqrt(2)
+    return sigma if sigma > 0 else max(np.std(diffs) / np.sqrt(2), 1.0)
+
+
+def cusum(values, drift=CUSUM_DRIFT, threshold=CUSUM_THRESHOLD):
+    """Two-sided CUSUM alarms as (alarm index, change start index, +1 up / -1 down)
+
+    The resetting sum S_t = max(0, S_t-1 + z_t) equals C_t - min(0, min C_s)
+    of the cumulative sum C, so each run up to the next alarm is a cumsum and
+    a running minimum over a horizon doubled until it holds the alarm. After
+    an alarm the statistic restarts on the level of the new regime.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    sigma = noise_scale(values)
+    alarms = []
+    start = 0
+    reference = np.median(values[:CUSUM_WARMUP]) if n else 0.0
+    horizon = CUSUM_HORIZON
+    while start < n:
+        window = values[start:start + horizon]
+        # Counts are at least Poisson-noisy at their level
+        z = (window - reference) / max(sigma, np.sqrt(abs(reference)))
+        found = []
+        for sign in (1, -1):
+            c = np.cumsum(sign * z - drift)
+            s = c - np.minimum(np.minimum.accumulate(c), 0)
+            hits = np.flatnonzero(s > threshold)
+            if len(hits):
+                alarm = hits[0]
+                # The change starts where the sum last left zero before the alarm
+                zeros = np.flatnonzero(s[:alarm] <= 0)
+                found.append((alarm, zeros[-1] + 1 if len(zeros) else 0, sign))
+        if not found:
+            if start + horizon >= n:
+                break
+            horizon *= 2
+            continue
+        alarm, begin, sign = min(found)
+        alarms.append((start + alarm, start + begin, sign))
+        begin += start
+        reference = np.median(values[begin:max(begin + CUSUM_WARMUP, start + alarm + 1)])
+        start += alarm + 1
+        horizon = CUSUM_HORIZON
+    return alarms
+
+
+def _segment_costs(sums, squares, starts, end):
+    """Gaussian mean-shift cost of the segments starts:end from cumulative sums"""
+    length = end - starts
+    total = sums[end] - sums[starts]
+    return squares[end] - squares[starts] - total * total / length
+
+
+def pelt(values, penalty=None, min_size=CHANGEPOINT_MIN_SIZE):
+    """Exact optimal mean-shift change points (PELT), as segment start indices after the first
+
+    Segment costs are O(1) lookups into cumulative sum arrays and each step
+    evaluates every surviving candidate in one vectorized expression; pruned
+    candidates can never start an optimal last segment again.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    if n < 2 * min_size:
+        return []
+    z = values / noise_scale(values)
+    penalty = 2 * np.log(n) if penalty is None else penalty
+    sums = np.concatenate([[0.0], np.cumsum(z)])
+    squares = np.concatenate([[0.0], np.cumsum(z * z)])
+
+    best = np.empty(n + 1)
+    best[0] = -penalty
+    last = np.zeros(n + 1, dtype=np.int64)
+    candidates = np.array([0], dtype=np.int64)
+    for t in range(min_size, n + 1):
+        costs = best[candidates] + _segment_costs(sums, squares, candidates, t)
+        i = np.argmin(costs)
+        best[t] = costs[i] + penalty
+        last[t] = candidates[i]
+        candidates = candidates[costs <= best[t]]
+        if t + 1 - min_size >= min_size:
+            candidates = np.append(candidates, t + 1 - min_size)
+
+    points = []
+    t = n
+    while t > 0:
+        t = last[t]
+        if t > 0:
+            points.append(int(t))
+    return points[::-1]
+
+
+def binary_segmentation(values, penalty=None, min_size=CHANGEPOINT_MIN_SIZE):
+    """Approximate mean-shift change points by recursive best splits
+
+    Each segment's best split is found for every position at once from
+    cumulative sums, so the cost is O(n) numpy work per change point found.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    z = values / noise_scale(values)
+    penalty = 2 * np.log(max(n, 2)) if penalty is None else penalty
+    sums = np.concatenate([[0.0], np.cumsum(z)])
+    squares = np.concatenate([[0.0], np.cumsum(z * z)])
+
+    points = []
+    segments = [(0, n)]
+    while segments:
+        lo, hi = segments.pop()
+        if hi - lo < 2 * min_size:
+            continue
+        splits = np.arange(lo + min_size, hi - min_size + 1)
+        whole = _segment_costs(sums, squares, np.array([lo]), hi)[0]
+        gains = whole - _segment_costs(sums, squares, np.full(len(splits), lo), splits) \
+            - _segment_costs(sums, squares, splits, hi)
+        i = np.argmax(gains)
+        if gains[i] > penalty:
+            split = int(splits[i])
+            points.append(split)
+            segments += [(lo, split), (split, hi)]
+    return sorted(points)
+
+
+def change_points(values, method='PELT', penalty=None):
+    """Change points of a series by the chosen method, PELT falling back to binary segmentation on long series"""
+    if method == 'PELT' and len(values) <= PELT_MAX_POINTS:
+        return pelt(values, penalty)
+    return binary_segmentation(values, penalty)
+
+
+def segments_table(times, values, points):
+    """Start, end, length and mean level of the segments between change points"""
+    values = np.asarray(values, dtype=np.float64)
+    bounds = np.array([0, *points, len(values)])
+    sums = np.concatenate([[0.0], np.cumsum(values)])
+    means = (sums[bounds[1:]] - sums[bounds[:-1]]) / np.diff(bounds)
+    times = pd.Series(times).reset_index(drop=True)
+    table = pd.DataFrame({
+        'start': times.iloc[bounds[:-1]].to_numpy(),
+        'end': times.iloc[bounds[1:] - 1].to_numpy(),
+        'buckets': np.diff(bounds),
+        'mean': means,
+    })
+    table['change'] = table['mean'].pct_change() * 100
+    return table
@@ -1,11 +1,14 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 import requests
 import ipaddress
 import socket
 import datetime
+from pages.ressources.flow_cube import FlowCube
+from pages.ressources.ip_utils import classify_ip, lookup_ip
 
 
 def footer():
@@ -327,41 +330,45 @@ def create_stacked_area_chart(df, timestamp_col, group_col):
     )
     
     return fig
-def create_ip_port_flow_diagram(df, src_ip_col, dst_ip_col, dst_port_col, filter_dst_ip=None, show_only_top10=False):
-    """Create a cyberpunk-styled network flow diagram showing source IPs to destination ports"""
+def create_ip_port_flow_diagram(df, src_ip_col, dst_ip_col, dst_port_col, filter_dst_ip=None, show_only_top10=False,
+                                subnet_level=None, cube=None):
+    """Create a cyberpunk-styled network flow diagram showing source IPs to destination ports
+
+    Counts are sliced from a FlowCube of the dataset; pass a cached one as
+    `cube` to avoid rebuilding it on every call.
+    """
     
     # Validate columns exist in dataframe
     if not all(col in df.columns for col in [src_ip_col, dst_ip_col, dst_port_col]):
         st.error(f"Required columns not found in dataframe")
         return None
+    
+    if cube is None:
+        cube = FlowCube(df, src_ip_col, dst_ip_col, dst_port_col)
         
     # Filter by destination IP if specified
     if filter_dst_ip:
-        flow_df = df[df[dst_ip_col] == filter_dst_ip].copy()
         title = f"Network Flows to {filter_dst_ip}"
     else:
         # Take a sample to avoid overcrowding (if no specific dst IP)
         # Get top destination IPs by count
-        top_dst_ips = df[dst_ip_col].value_counts().nlargest(1).index.tolist()
+        top_dst_ips = cube.dst_totals.index[:1].tolist()
         if top_dst_ips:
-            flow_df = df[df[dst_ip_col] == top_dst_ips[0]].copy()
+            filter_dst_ip = top_dst_ips[0]
             title = f"Network Flows to {top_dst_ips[0]}"
         else:
-            flow_df = df.copy()
             title = "Network Flows"
 
-    
-    # Prepare data - group by source IP and destination port
-    flow_counts = flow_df.groupby([src_ip_col, dst_port_col]).size().reset_index()
+    # Group by source IP (rolled up to its subnet if requested) and destination port
+    flow_counts = cube.src_port_counts(filter_dst_ip, subnet_level)[['src', 'port', 'count']]
     flow_counts.columns = [src_ip_col, dst_port_col, 'count']
     
     # Convert port numbers to strings
     flow_counts[dst_port_col] = flow_counts[dst_port_col].astype(str)
     
     # Calculate total count per source IP for sorting
-    src_ip_totals = flow_counts.groupby(src_ip_col)['count'].sum().reset_index()
+    src_ip_totals = flow_counts.groupby(src_ip_col, observed=True)['count'].sum().reset_index()
     src_ip_totals = src_ip_totals.sort_values('count', ascending=False)
-    print(src_ip_totals)
     
     # Filter to top 10 source IPs by count if requested
     if show_only_top10:
@@ -379,7 +386,7 @@ def create_ip_port_flow_diagram(df, src_ip_col, dst_ip_col, dst_port_col, filter
         flow_counts = flow_counts[flow_counts[src_ip_col].isin(unique_srcs)]
         
     if len(unique_ports) > 20:
-        top_ports = flow_counts.groupby(dst_port_col)['count'].sum().nlargest(20).index.tolist()
+        top_ports = flow_counts.groupby(dst_port_col, observed=True)['count'].sum().nlargest(20).index.tolist()
         flow_counts = flow_counts[flow_counts[dst_port_col].isin(top_ports)]
         unique_ports = top_ports
     
@@ -457,6 +464,7 @@ def create_ip_port_flow_diagram(df, src_ip_col, dst_ip_col, dst_port_col, filter
         ))
     
     # Add sankey-like flow lines for each connection
+    max_count = flow_counts['count'].max()
     for _, row in flow_counts.iterrows():
         src_ip = row[src_ip_col]
         dst_port = row[dst_port_col]
@@ -471,7 +479,6 @@ def create_ip_port_flow_diagram(df, src_ip_col, dst_ip_col, dst_port_col, filter
         dst_pos = port_positions[dst_port]
         
         # Calculate line width based on count (minimum 1, maximum 10)
-        max_count = flow_counts['count'].max()
         line_width = 1 + 9 * (count / max_count) if max_count > 0 else 1
         
         # Get color for this port
@@ -492,9 +499,10 @@ def create_ip_port_flow_diagram(df, src_ip_col, dst_ip_col, dst_port_col, filter
         ))
     
     # Add source IP labels on left side with count info
+    src_total_map = dict(zip(src_ip_totals[src_ip_col], src_ip_totals['count']))
     for ip, (x, y) in src_positions.items():
         # Get total count for this IP
-        total_count = src_ip_totals[src_ip_totals[src_ip_col] == ip]['count'].values[0]
+        total_count = src_total_map[ip]
         
         fig.add_annotation(
             x=x - 0.05,
@@ -506,9 +514,10 @@ def create_ip_port_flow_diagram(df, src_ip_col, dst_ip_col, dst_port_col, filter
         )
     
     # Add port labels on right side
+    port_total_map = flow_counts.groupby(dst_port_col)['count'].sum()
     for port, (x, y) in port_positions.items():
         # Get total count for this port
-        port_total = flow_counts[flow_counts[dst_port_col] == port]['count'].sum()
+        port_total = port_total_map.get(port, 0)
         
         fig.add_annotation(
             x=x + 0.05,
@@ -608,14 +617,41 @@ def create_ip_port_flow_diagram(df, src_ip_col, dst_ip_col, dst_port_col, filter
     return fig
 
 
-                                                                                
+def public_unique_ips(series):
+    """Return the distinct public IPs of a column, classified in one vectorized pass"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        uniques = series.cat.remove_unused_categories().cat.categories.astype(str)
+    else:
+        uniques = pd.Index(series.dropna().astype(str).str.strip().unique())
+    uniques = uniques[uniques != '']
+    hi, lo, valid = lookup_ip(uniques)
+    public = classify_ip(hi, lo)['public']
+    # Keep non-IP values (hostnames) so get_ip_location can still resolve them
+    return uniques[(valid & public) | ~valid].tolist()
+
+
+def location_record(ip, location_info):
+    """Format an ip-api.com answer as a geolocation record"""
+    return {
+        'ip': ip,
+        'city': location_info.get('city', 'Unknown'),
+        'country': location_info.get('country', 'Unknown'),
+        'latitude': location_info.get('lat', 0),
+        'longitude': location_info.get('lon', 0),
+        'region': location_info.get('regionName', 'Unknown'),
+        'continent': 'Unknown',  # ip-api doesn't provide continent directly
+        'country_code': location_info.get('countryCode', 'Unknown'),
+        'continent_code': 'Unknown',  # ip-api doesn't provide continent code directly
+        'zip': location_info.get('zip', 'Unknown'),
+        'isp': location_info.get('isp', 'Unknown'),
+        'org': location_info.get('org', 'Unknown')
+    }
+
+
 def get_ip_location(ip):
     """Get location info for an IP address using ip-api.com"""
     try:
-        # Check if the IP is valid
-        ipaddress.ip_address(ip)
-        
-        # Skip private IPs
+        # Check if the IP is valid and skip private IPs
         if ipaddress.ip_address(ip).is_private:
             return None
             
@@ -643,25 +679,68 @@ def get_ip_location(ip):
             return None
         
         # Return formatted location data
-        return {
-            'ip': ip,
-            'city': location_info.get('city', 'Unknown'),
-            'country': location_info.get('country', 'Unknown'),
-            'latitude': location_info.get('lat', 0),
-            'longitude': location_info.get('lon', 0),
-            'region': location_info.get('regionName', 'Unknown'),
-            'continent': 'Unknown',  # ip-api doesn't provide continent directly
-            'country_code': location_info.get('countryCode', 'Unknown'),
-            'continent_code': 'Unknown',  # ip-api doesn't provide continent code directly
-            'zip': location_info.get('zip', 'Unknown'),
-            'isp': location_info.get('isp', 'Unknown'),
-            'org': location_info.get('org', 'Unknown')
-        }
+        return location_record(ip, location_info)
     except Exception as e:
         st.warning(f"Error processing IP {ip}: {str(e)}")
         return None
-def extract_ips(df):
-    """Extract IP addresses from dataframe and get their locations with improved error handling"""
+# Columns of the geolocation lookup table, one row per IP
+GEO_COLUMNS = ['ip', 'city', 'country', 'latitude', 'longitude', 'region', 'continent',
+               'country_code', 'continent_code', 'zip', 'isp', 'org']
+
+
+def build_geo_table(locations):
+    """Turn location records into a columnar lookup table keyed by IP"""
+    geo = pd.DataFrame(locations, columns=GEO_COLUMNS)
+    geo = geo.dropna(subset=['latitude', 'longitude']).drop_duplicates('ip')
+    geo['ip'] = geo['ip'].astype(str)
+    geo[['latitude', 'longitude']] = geo[['latitude', 'longitude']].astype(float)
+    return geo.reset_index(drop=True)
+
+
+def join_flow_geo(pair_counts, src_geo, dst_geo):
+    """Join (src_ip, dst_ip, count) pairs with the geolocation tables of both ends"""
+    src_side = src_geo.rename(columns={col: f'src_{col}' for col in GEO_COLUMNS if col != 'ip'})
+    dst_side = dst_geo.rename(columns={col: f'dst_{col}' for col in GEO_COLUMNS if col != 'ip'})
+    flows = pair_counts.merge(src_side.rename(columns={'ip': 'src_ip'}), on='src_ip', how='inner')
+    flows = flows.merge(dst_side.rename(columns={'ip': 'dst_ip'}), on='dst_ip', how='inner')
+    flows = flows.rename(columns={'src_latitude': 'src_lat', 'src_longitude': 'src_lon',
+                                  'dst_latitude': 'dst_lat', 'dst_longitude': 'dst_lon'})
+    return flows.sort_values('count', ascending=False, ignore_index=True)
+
+
+def locate_ips(unique_ips, label):
+    """Look up the location of each IP with a progress bar"""
+    locations = []
+    try:
+        progress_bar = st.progress(0, text=f"Processing {len(unique_ips)} {label} IPs...")
+        
+        for i, ip in enumerate(unique_ips):
+            try:
+                location = get_ip_location(ip)
+                if location:
+                    locations.append(location)
+            except Exception as e:
+                st.warning(f"Error processing {label} IP {ip}: {str(e)}")
+            
+            # Update progress
+            progress_bar.progress((i + 1) / len(unique_ips), 
+                                text=f"Processing {label} IPs: {i+1}/{len(unique_ips)}")
+            
+        # Clear the progress bar when done
+        progress_bar.empty()
+    except Exception as e:
+        st.error(f"Error in progress tracking: {str(e)}")
+    return locations
+
+
+def extract_ips(df, geo_table=None):
+    """Extract IP addresses from dataframe and get their locations with improved error handling
+
+    Returns the source and destination geolocation tables (one row per IP) and
+    the flows table (one row per geolocated src/dst pair with its event count).
+    When geo_table is given (background enrichment), locations are read from it
+    instead of being looked up one by one.
+    """
     ip_src_col = None
     ip_dst_col = None
     
@@ -687,74 +766,38 @@ def extract_ips(df):
     st.info(f"Using {ip_src_col} as source IP and {ip_dst_col if ip_dst_col else 'no destination column'}")
     
     # Process IP source addresses
-    src_locations = []
+    src_geo = build_geo_table([])
     if ip_src_col:
-        # Limit the number of IPs to process to avoid API rate limiting
-        unique_ips = df[ip_src_col].astype(str).dropna().unique()
-        unique_ips = [ip for ip in unique_ips[:50] if str(ip).strip() != '' and str(ip).lower() != 'nan']
+        unique_ips = public_unique_ips(df[ip_src_col])
         
         if len(unique_ips) == 0:
             st.warning(f"No valid source IPs found in column {ip_src_col}")
+        elif geo_table is not None:
+            src_geo = geo_table[geo_table['ip'].isin(unique_ips)].reset_index(drop=True)
         else:
-            # Create a progress bar
-            try:
-                progress_text = f"Processing {len(unique_ips)} source IPs..."
-                progress_bar = st.progress(0, text=progress_text)
-                
-                for i, ip in enumerate(unique_ips):
-                    try:
-                        location = get_ip_location(ip)
-                        if location:
-                            src_locations.append(location)
-                    except Exception as e:
-                        st.warning(f"Error processing source IP {ip}: {str(e)}")
-                    
-                    # Update progress
-                    progress_bar.progress((i + 1) / len(unique_ips), 
-                                        text=f"Processing source IPs: {i+1}/{len(unique_ips)}")
-                    
-                # Clear the progress bar when done
-                progress_bar.empty()
-            except Exception as e:
-                st.error(f"Error in progress tracking: {str(e)}")
+            # Limit the number of IPs to process to avoid API rate limiting
+            src_geo = build_geo_table(locate_ips(unique_ips[:50], "source"))
+        src_geo = geo_event_counts(src_geo, df[ip_src_col])
     
     # Process IP destination addresses or add demo destination
-    dst_locations = []
+    dst_geo = build_geo_table([])
     if ip_dst_col:
-        # Limit the number of IPs to process to avoid API rate limiting
-        unique_ips = df[ip_dst_col].astype(str).dropna().unique()
-        unique_ips = [ip for ip in unique_ips[:50] if str(ip).strip() != '' and str(ip).lower() != 'nan']
+        unique_ips = public_unique_ips(df[ip_dst_col])
         
         if len(unique_ips) == 0:
             st.warning(f"No valid destination IPs found in column {ip_dst_col}")
+        elif geo_table is not None:
+            dst_geo = geo_table[geo_table['ip'].isin(unique_ips)].reset_index(drop=True)
         else:
-            # Create a progress bar
-            try:
-                progress_text = f"Processing {len(unique_ips)} destination IPs..."
-                progress_bar = st.progress(0, text=progress_text)
-                
-                for i, ip in enumerate(unique_ips):
-                    try:
-                        location = get_ip_location(ip)
-                        if location:
-                            dst_locations.append(location)
-                    except Exception as e:
-                        st.warning(f"Error processing destination IP {ip}: {str(e)}")
-                    
-                    # Update progress
-                    progress_bar.progress((i + 1) / len(unique_ips), 
-                                        text=f"Processing destination IPs: {i+1}/{len(unique_ips)}")
-                    
-                # Clear the progress bar when done
-                progress_bar.empty()
-            except Exception as e:
-                st.error(f"Error in progress tracking: {str(e)}")
+            # Limit the number of IPs to process to avoid API rate limiting
+            dst_geo = build_geo_table(locate_ips(unique_ips[:50], "destination"))
+        dst_geo = geo_event_counts(dst_geo, df[ip_dst_col])
     
     # SOLUTION: Generate demo destination location for Lyon, France if we don't have destinations
-    if not dst_locations or len(dst_locations) == 0:
+    if dst_geo.empty:
         st.info("Adding demo destination location in Lyon, France for visualization")
         # Add a destination in Lyon, France
-        demo_destination = {
+        dst_geo = build_geo_table([{
             'ip': '169.254.1.1',  # Placeholder IP
             'city': 'Lyon',
             'country': 'France',
@@ -767,95 +810,35 @@ def extract_ips(df):
             'zip': '69000',
             'isp': 'Demo ISP',
             'org': 'Demo Organization'
-        }
-        dst_locations = [demo_destination]
+        }]).assign(events=0)
     
     # Generate flows between source and destination
-    flows = []
-    if src_locations and dst_locations:
+    flows = join_flow_geo(pd.DataFrame(columns=['src_ip', 'dst_ip', 'count']), src_geo, dst_geo)
+    if not src_geo.empty and not dst_geo.empty:
         try:
             # Determine if we should use actual flows from data or just create demo flows
             if ip_src_col and ip_dst_col:
-                # Créer des dictionnaires pour recherche rapide
-                src_ip_map = {loc['ip']: loc for loc in src_locations}
-                dst_ip_map = {loc['ip']: loc for loc in dst_locations}
-                
-                # Group by src-dst pair and count occurrences
+                # Count events per src-dst pair, then join both geolocation tables
                 try:
-                    flow_counts = df.groupby([ip_src_col, ip_dst_col]).size().reset_index()
-                    flow_counts.columns = [ip_src_col, ip_dst_col, 'count']
-                    
-                    # Limiter à 100 flux maximum pour de meilleures performances
-                    if len(flow_counts) > 100:
-                        flow_counts = flow_counts.nlargest(100, 'count')
-                    
-                    # Get locations for each flow
-                    for _, row in flow_counts.iterrows():
-                        src_ip = str(row[ip_src_col])
-                        dst_ip = str(row[ip_dst_col])
-                        
-                        if src_ip.lower() == 'nan' or dst_ip.lower() == 'nan':
-                            continue
-                        
-                        if src_ip in src_ip_map and dst_ip in dst_ip_map:
-                            src_loc = src_ip_map[src_ip]
-                            dst_loc = dst_ip_map[dst_ip]
-                            
-                            # S'assurer que toutes les données sont valides
-                            if (src_loc.get('latitude') is not None and 
-                                src_loc.get('longitude') is not None and 
-                                dst_loc.get('latitude') is not None and 
-                                dst_loc.get('longitude') is not None):
-                                
-                                flow = {
-                                    'src_ip': src_ip,
-                                    'dst_ip': dst_ip,
-                                    'src_lat': float(src_loc['latitude']),
-                                    'src_lon': float(src_loc['longitude']),
-                                    'dst_lat': float(dst_loc['latitude']),
-                                    'dst_lon': float(dst_loc['longitude']),
-                                    'count': int(row['count']),
-                                    'src_country': src_loc.get('country', 'Unknown'),
-                                    'dst_country': dst_loc.get('country', 'Unknown'),
-                                    'src_city': src_loc.get('city', 'Unknown'),
-                                    'dst_city': dst_loc.get('city', 'Unknown'),
-                                    'src_isp': src_loc.get('isp', 'Unknown'),
-                                    'dst_isp': dst_loc.get('isp', 'Unknown'),
-                                    'src_org': src_loc.get('org', 'Unknown'),
-                                    'dst_org': dst_loc.get('org', 'Unknown'),
-                                }
-                                flows.append(flow)
+                    pair_counts = df.groupby([ip_src_col, ip_dst_col], observed=True).size().reset_index()
+                    pair_counts.columns = ['src_ip', 'dst_ip', 'count']
+                    pair_counts['src_ip'] = pair_counts['src_ip'].astype(str)
+                    pair_counts['dst_ip'] = pair_counts['dst_ip'].astype(str)
+                    flows = join_flow_geo(pair_counts, src_geo, dst_geo)
                 except Exception as e:
                     st.warning(f"Could not generate flows from data: {str(e)}")
             
-            # Si nous n'avons pas assez de flux, créer des flux de démonstration
+            # Si nous n'avons pas de flux, créer des flux de démonstration
             # entre toutes nos sources et notre destination Lyon
-            if len(flows) == 0 and len(src_locations) > 0:
+            if flows.empty:
                 st.info("Creating demonstration flows to Lyon, France")
                 
-                # Get our Lyon destination
-                lyon_dest = dst_locations[0]
-                
-                # Create a demo flow from each source to Lyon
-                for src_loc in src_locations:
-                    flow = {
-                        'src_ip': src_loc['ip'],
-                        'dst_ip': lyon_dest['ip'],
-                        'src_lat': float(src_loc['latitude']),
-                        'src_lon': float(src_loc['longitude']),
-                        'dst_lat': float(lyon_dest['latitude']),
-                        'dst_lon': float(lyon_dest['longitude']),
-                        'count': 1,  # Example count
-                        'src_country': src_loc.get('country', 'Unknown'),
-                        'dst_country': lyon_dest.get('country', 'France'),
-                        'src_city': src_loc.get('city', 'Unknown'),
-                        'dst_city': lyon_dest.get('city', 'Lyon'),
-                        'src_isp': src_loc.get('isp', 'Unknown'),
-                        'dst_isp': lyon_dest.get('isp', 'Demo ISP'),
-                        'src_org': src_loc.get('org', 'Unknown'),
-                        'dst_org': lyon_dest.get('org', 'Demo Organization'),
-                    }
-                    flows.append(flow)
+                demo_pairs = pd.DataFrame({
+                    'src_ip': src_geo['ip'],
+                    'dst_ip': dst_geo['ip'].iloc[0],
+                    'count': 1,  # Example count
+                })
+                flows = join_flow_geo(demo_pairs, src_geo, dst_geo.head(1))
             
             # Additional logging
             st.success(f"Generated {len(flows)} attack flow paths")
@@ -867,70 +850,144 @@ def extract_ips(df):
     else:
         st.warning("Need both source and destination locations to create flow lines")
     
-    return src_locations, dst_locations, flows
-def create_ip_map(src_locations, dst_locations, flows):
-    """Create an interactive map showing IP locations and flows with optimized performance"""
+    return src_geo, dst_geo, flows
+def geo_event_counts(geo, series):
+    """Attach the number of events of each geolocated IP"""
+    counts = series.value_counts()
+    counts.index = counts.index.astype(str)
+    return geo.assign(events=geo['ip'].map(counts).fillna(0).astype('int64'))
+
+
+# Map rendering modes: one marker per IP, or one per city / hex cell
+GEO_AGGREGATIONS = ['IP', 'City', 'Hex grid']
+GEO_MARKER_LIMIT = 500
+GEO_HEX_SIZE = 2.0
+
+
+def hex_bin(lon, lat, size=GEO_HEX_SIZE):
+    """Snap coordinates to the axial (q, r) cells of a pointy-top hex grid of `size` degrees"""
+    q = (np.sqrt(3) / 3 * lon - lat / 3) / size
+    r = (2 / 3 * lat) / size
+    s = -q - r
+    rq, rr, rs = np.round(q), np.round(r), np.round(s)
+    dq, dr, ds = np.abs(rq - q), np.abs(rr - r), np.abs(rs - s)
+    # Cube rounding: recompute the coordinate with the largest rounding error
+    fix_q = (dq > dr) & (dq > ds)
+    fix_r = ~fix_q & (dr > ds)
+    rq = np.where(fix_q, -rr - rs, rq)
+    rr = np.where(fix_r, -rq - rs, rr)
+    return rq.astype(np.int64), rr.astype(np.int64)
+
+
+def aggregate_geo(geo, mode):
+    """Bin a geolocation table by city or hex cell, returns (bins, bin id of each row)"""
+    if mode == 'City':
+        keys = [geo['country'].fillna('Unknown'), geo['city'].fillna('Unknown')]
+    else:
+        keys = list(hex_bin(geo['longitude'].to_numpy(), geo['latitude'].to_numpy()))
+    bin_ids = pd.DataFrame(dict(enumerate(keys)), index=geo.index).groupby(list(range(len(keys))), sort=False).ngroup().to_numpy()
+
+    frame = geo.assign(bin=bin_ids, city=geo['city'].fillna('Unknown'), country=geo['country'].fillna('Unknown'))
+    if 'events' not in frame:
+        frame['events'] = 1
+    bins = frame.groupby('bin').agg(latitude=('latitude', 'mean'), longitude=('longitude', 'mean'),
+                                    ips=('ip', 'size'), events=('events', 'sum'))
+    # The busiest IP of each bin names it
+    top = frame.sort_values('events', ascending=False, kind='stable').groupby('bin')[['city', 'country']].first()
+    bins = bins.join(top)
+    bins['label'] = bins['city'].astype(str) + ', ' + bins['country'].astype(str)
+    if mode != 'City':
+        bins['label'] = bins['label'] + ' area'
+    return bins.sort_values('events', ascending=False), bin_ids
+
+
+def aggregate_flows(flows, src_geo, src_ids, src_bins, dst_geo, dst_ids, dst_bins):
+    """Sum flow counts between bins, keeping the column layout of the per-IP flows table"""
+    src_bin = flows['src_ip'].map(pd.Series(src_ids, index=src_geo['ip'].to_numpy()))
+    dst_bin = flows['dst_ip'].map(pd.Series(dst_ids, index=dst_geo['ip'].to_numpy()))
+    pairs = flows.assign(src_bin=src_bin, dst_bin=dst_bin).groupby(['src_bin', 'dst_bin'])['count'].sum().reset_index()
+    for side, bins in (('src', src_bins), ('dst', dst_bins)):
+        ends = bins[['latitude', 'longitude', 'city', 'country', 'label']].rename(columns={
+            'latitude': f'{side}_lat', 'longitude': f'{side}_lon', 'city': f'{side}_city',
+            'country': f'{side}_country', 'label': f'{side}_ip'})
+        pairs = pairs.merge(ends, left_on=f'{side}_bin', right_index=True)
+    return pairs.sort_values('count', ascending=False, ignore_index=True)
+
+
+def _marker_sizes(events, smallest=6, largest=30):
+    """Scale marker areas with event counts"""
+    events = np.asarray(events, dtype=float)
+    return smallest + (largest - smallest) * np.sqrt(events / max(events.max(initial=0), 1))
+
+
+def _ip_hover(geo, kind):
+    """Build the per-IP hover strings column-wise"""
+    return (f"{kind} IP: " + geo['ip'].astype(str) +
+            "<br>Location: " + geo['city'].astype(str) + ", " + geo['region'].astype(str) + ", " + geo['country'].astype(str) +
+            "<br>ISP: " + geo['isp'].astype(str) +
+            "<br>Organization: " + geo['org'].astype(str) +
+            "<br>Coordinates: " + geo['latitude'].map('{:.4f}'.format) + ", " + geo['longitude'].map('{:.4f}'.format))
+
+
+def _bin_hover(bins, kind):
+    """Build the hover strings of aggregated markers"""
+    return (bins['label'] + f"<br>{kind} IPs: " + bins['ips'].map('{:,}'.format) +
+            "<br>Events: " + bins['events'].map('{:,}'.format))
+
+
+def create_ip_map(src_geo, dst_geo, flows, aggregation='IP'):
+    """Create an interactive map showing IP locations and flows with optimized performance
+
+    With aggregation set to 'City' or 'Hex grid', markers are one per bin sized
+    by event count, so the point count follows geographic spread, not IP count.
+    """
     
     # Create base map with cyberpunk styling but less demanding effects
     fig = go.Figure()
     
-    # Add source markers with simplified styling
-    if src_locations:
-        # Convert to pandas DataFrame instead of polars
-        src_df = pd.DataFrame(src_locations)
-        fig.add_trace(go.Scattergeo(
-            lon=src_df['longitude'],
-            lat=src_df['latitude'],
-            text=src_df.apply(lambda row: (
-                f"Source IP: {row['ip']}<br>" +
-                f"Location: {row['city']}, {row['region']}, {row['country']}<br>" +
-                f"ISP: {row.get('isp', 'Unknown')}<br>" +
-                f"Organization: {row.get('org', 'Unknown')}<br>" +
-                f"Coordinates: {row['latitude']:.4f}, {row['longitude']:.4f}"
-            ), axis=1),
-            mode='markers',
-            marker=dict(
-                size=10,
-                color='rgba(0, 255, 157, 1.0)',
-                line=dict(width=1, color='rgba(0, 255, 157, 0.5)'),
-                symbol='circle',
-                opacity=0.9,
-            ),
-            name='Source IPs',
-            hoverinfo='text'
-        ))
-    
-    # Add destination markers with simplified styling
-    if dst_locations:
-        # Convert to pandas DataFrame instead of polars
-        dst_df = pd.DataFrame(dst_locations)
+    sides = [
+        (src_geo, 'Source', 'rgba(0, 255, 157, 1.0)', 'rgba(0, 255, 157, 0.5)', 'circle'),
+        (dst_geo, 'Destination', 'rgba(255, 91, 121, 1.0)', 'rgba(255, 91, 121, 0.5)', 'diamond'),
+    ]
+    aggregated = aggregation != 'IP'
+    binned = []
+    for geo, kind, color, edge, symbol in sides:
+        if geo.empty:
+            binned.append(None)
+            continue
+        if aggregated:
+            bins, bin_ids = aggregate_geo(geo, aggregation)
+            binned.append((bins, bin_ids))
+            points, text = bins, _bin_hover(bins, kind)
+            size, name = _marker_sizes(bins['events']), f'{kind} {aggregation.lower()}'
+        else:
+            binned.append(None)
+            points, text = geo, _ip_hover(geo, kind)
+            size, name = 10, f'{kind} IPs'
         fig.add_trace(go.Scattergeo(
-            lon=dst_df['longitude'],
-            lat=dst_df['latitude'],
-            text=dst_df.apply(lambda row: (
-                f"Destination IP: {row['ip']}<br>" +
-                f"Location: {row['city']}, {row['region']}, {row['country']}<br>" +
-                f"ISP: {row.get('isp', 'Unknown')}<br>" +
-                f"Organization: {row.get('org', 'Unknown')}<br>" +
-                f"Coordinates: {row['latitude']:.4f}, {row['longitude']:.4f}"
-            ), axis=1),
+            lon=points['longitude'],
+            lat=points['latitude'],
+            text=text,
             mode='markers',
             marker=dict(
-                size=10,
-                color='rgba(255, 91, 121, 1.0)',
-                line=dict(width=1, color='rgba(255, 91, 121, 0.5)'),
-                symbol='diamond',
+                size=size,
+                color=color,
+                line=dict(width=1, color=edge),
+                symbol=symbol,
                 opacity=0.9,
             ),
-            name='Destination IPs',
+            name=name,
             hoverinfo='text'
         ))
 
+    # Aggregated maps draw one line per pair of bins
+    if aggregated and not flows.empty and binned[0] is not None and binned[1] is not None:
+        flows = aggregate_flows(flows, src_geo, binned[0][1], binned[0][0], dst_geo, binned[1][1], binned[1][0])
+
     # IMPORTANT FIX: Use a different approach for drawing lines to prevent ricochets
-    if flows:
-        # Limit number of flows to improve performance
-        max_flows = min(50, len(flows))
-        flows_to_display = flows[:max_flows]
+    if not flows.empty:
+        # Limit number of flows to improve performance (flows are sorted by count)
+        flows_to_display = flows.head(50).to_dict('records')
         
         # For each flow, draw a direct line (not curved)
         for flow in flows_to_display:
@@ -0,0 +1,164 @@
+import numpy as np
+import pandas as pd
+
+from pages.ressources.flow_cube import column_codes, label_strings
+from pages.ressources.ip_utils import apply_subnet_level
+from pages.ressources.search_index import _ranges
+
+
+# Candidate bucket widths for the time dimension, the first giving at most the target count wins
+TIME_BUCKET_FREQS = ['1s', '5s', '15s', '30s', '1min', '5min', '15min', '30min',
+                     '1h', '3h', '6h', '12h', '1D', '7D', '30D']
+# Categorical columns offered as linked views when present
+CROSSFILTER_COLUMNS = ('proto', 'dst_port', 'rule')
+
+
+def bucket_width(span, target):
+    """Narrowest of TIME_BUCKET_FREQS cutting a span of nanoseconds into at most target buckets"""
+    for freq in TIME_BUCKET_FREQS:
+        step = pd.Timedelta(freq)
+        if span // step.value + 1 <= target:
+            break
+    return step
+
+
+def time_bucket_codes(series, target=200):
+    """Bucket a datetime column into at most `target` fixed-width buckets
+
+    Returns (codes, bucket start labels, bucket width).
+    """
+    values = series.to_numpy(dtype='datetime64[ns]').view(np.int64)
+    valid = ~pd.isna(series).to_numpy()
+    if not valid.any():
+        return np.full(len(values), -1, dtype=np.int64), pd.DatetimeIndex([]), pd.Timedelta(TIME_BUCKET_FREQS[0])
+    first, last = values[valid].min(), values[valid].max()
+    step = bucket_width(last - first, target)
+    origin = first - first % step.value
+    codes = np.where(valid, (values - origin) // step.value, -1)
+    labels = pd.date_range(pd.Timestamp(origin), periods=int(codes.max()) + 1, freq=step)
+    return codes, labels, step
+
+
+class Crossfilter:
+    """Coded dimensions whose group counts follow the filters of the other dimensions
+
+    Each row carries one fail bit per dimension. A dimension's group counts
+    the rows passing every filter but its own; changing a filter only visits
+    the rows of the values that entered or left the selection.
+    """
+
+    def __init__(self, dimensions):
+        self.names = list(dimensions)
+        if len(self.names) > 32:
+            raise ValueError("At most 32 dimensions")
+        self.bits = {name: np.uint32(1 << i) for i, name in enumerate(self.names)}
+        self.codes, self.labels, self.groups, self.selected = {}, {}, {}, {}
+        self._order, self._offsets = {}, {}
+        n_rows = None
+        for name, (codes, labels) in dimensions.items():
+            # Missing values get an extra slot after the labels, it never matches a filter
+            labels = pd.Index(labels)
+            codes = np.where(codes < 0, len(labels), codes).astype(np.int64)
+            n_rows = len(codes)
+            counts = np.bincount(codes, minlength=len(labels) + 1)
+            self.codes[name], self.labels[name], self.groups[name] = codes, labels, counts
+            self.selected[name] = None
+            self._order[name] = np.argsort(codes, kind='stable')
+            self._offsets[name] = np.concatenate([[0], np.cumsum(counts)])
+        self.n_rows = n_rows or 0
+        self.fail = np.zeros(self.n_rows, dtype=np.uint32)
+        self.passing = self.n_rows
+
+    def filter(self, name, values=None):
+        """Keep the rows whose `name` code is in values (None clears the filter)"""
+        k = len(self.labels[name]) + 1
+        old = self.selected[name] if self.selected[name] is not None else np.ones(k, dtype=bool)
+        new = np.ones(k, dtype=bool)
+        if values is not None:
+            new[:] = False
+            new[np.asarray(values, dtype=np.int64)] = True
+        toggled = np.flatnonzero(old != new)
+        self.selected[name] = None if new.all() else new
+        if len(toggled) == 0:
+            return
+
+        # Only the rows of toggled values change state
+        offsets = self._offsets[name]
+        rows = self._order[name][_ranges(offsets[toggled], offsets[toggled + 1])]
+        before = self.fail[rows]
+        after = before ^ self.bits[name]
+        self.fail[rows] = after
+
+        for other in self.names:
+            if other == name:
+                continue
+            others = ~self.bits[other]
+            was, now = (before & others) == 0, (after & others) == 0
+            minlength = len(self.labels[other]) + 1
+            codes = self.codes[other][rows]
+            self.groups[other] += (np.bincount(codes[now & ~was], minlength=minlength)
+                                   - np.bincount(codes[was & ~now], minlength=minlength))
+        self.passing += int(np.count_nonzero(after == 0)) - int(np.count_nonzero(before == 0))
+
+    def filter_range(self, name, low, high):
+        """Keep the codes low..high (inclusive) of an ordered dimension"""
+        low, high = max(int(low), 0), min(int(high), len(self.labels[name]) - 1)
+        self.filter(name, np.arange(low, high + 1) if low <= high else [])
+
+    def filter_labels(self, name, labels):
+        """Keep the rows of some labels of a dimension, unknown labels are ignored"""
+        codes = self.labels[name].get_indexer(pd.Index(labels))
+        codes = codes[codes >= 0]
+        # A brush made on another rollup of the dimension no longer applies
+        self.filter(name, codes if len(codes) else None)
+
+    def filter_between(self, name, start, end):
+        """Keep the buckets of an ordered dimension overlapping [start, end]"""
+        labels = self.labels[name]
+        if isinstance(labels, pd.DatetimeIndex):
+            start, end = pd.Timestamp(start), pd.Timestamp(end)
+            if labels.tz is not None:
+                start, end = (t.tz_localize(labels.tz) if t.tzinfo is None else t for t in (start, end))
+        low = labels.searchsorted(start, side='right') - 1
+        high = labels.searchsorted(end, side='right') - 1
+        self.filter_range(name, low, high)
+
+    def clear(self):
+        for name in self.names:
+            self.filter(name, None)
+
+    def mask(self, exclude=None):
+        """Rows passing every filter, optionally ignoring one dimension's"""
+        if exclude is None:
+            return self.fail == 0
+        return (self.fail & ~self.bits[exclude]) == 0
+
+    def group(self, name):
+        """Counts per value of a dimension under the other dimensions' filters"""
+        return pd.Series(self.groups[name][:-1], index=self.labels[name])
+
+    @property
+    def active(self):
+        return [name for name in self.names if self.selected[name] is not None]
+
+    @property
+    def signature(self):
+        """Hashable description of the current filters"""
+        return tuple((name, tuple(np.flatnonzero(self.selected[name]).tolist())) for name in self.active)
+
+
+def build_crossfilter(df, time_col=None, src_col=None, subnet_level=None, columns=CROSSFILTER_COLUMNS):
+    """Crossfilter over the time bucket, source subnet and a few categorical columns of df"""
+    dimensions = {}
+    if time_col in df.columns and pd.api.types.is_datetime64_any_dtype(df[time_col]):
+        codes, labels, _ = time_bucket_codes(df[time_col])
+        dimensions['time'] = (codes, labels)
+    if src_col in df.columns:
+        src = apply_subnet_level(df[src_col], subnet_level) if subnet_level else df[src_col]
+        codes, labels = column_codes(src)
+        dimensions['src'] = (codes, label_strings(labels))
+    for col in columns:
+        if col in df.columns:
+            codes, labels = column_codes(df[col])
+            dimensions[col] = (codes, label_strings(labels))
+    return Crossfilter(dimensions)
@@ -0,0 +1,79 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from pages.ressources.flow_cube import column_codes, fold_top, top_remap
+
+
+CROSSTAB_TOP = 15
+# Label pairs counted directly before folding; wider pairs are folded to their top values first
+CROSSTAB_DENSE_CELLS = 1 << 22
+
+
+class CrosstabEngine:
+    """Count and sum matrices of any two columns of one dataframe
+
+    Columns are factorized once and kept as codes. A crosstab of a selection is
+    one bincount of the combined codes, each axis then folded to its top values
+    over that selection.
+    """
+
+    def __init__(self, df):
+        self.df = df
+        self._codes = {}
+        self._lock = threading.Lock()
+
+    def codes(self, col):
+        """(codes, labels) of a column, computed once"""
+        with self._lock:
+            if col not in self._codes:
+                codes, labels = column_codes(self.df[col])
+                dtype = np.int32 if len(labels) < np.iinfo(np.int32).max else np.int64
+                self._codes[col] = (codes.astype(dtype), labels)
+            return self._codes[col]
+
+    def _values(self, value_col, rows):
+        values = pd.to_numeric(self.df[value_col], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+        values = values if rows is None else values[rows]
+        return np.where(np.isfinite(values), values, 0.0)
+
+    def crosstab(self, row_col, col_col, rows=None, top=(CROSSTAB_TOP, CROSSTAB_TOP), value_col=None):
+        """(counts, sums) frames of row_col × col_col over some row positions (None meaning every row)
+
+        Each axis keeps its `top` most frequent values of the selection, the
+        others and missing values are folded into 'Other'. sums is None
+        without a value column.
+        """
+        (row_codes, row_labels), (col_codes, col_labels) = self.codes(row_col), self.codes(col_col)
+        if rows is not None:
+            row_codes, col_codes = row_codes[rows], col_codes[rows]
+        values = None if value_col is None else self._values(value_col, rows)
+
+        n_rows, n_cols = len(row_labels) + 1, len(col_labels) + 1
+        if len(row_codes) == 0:
+            empty = pd.DataFrame(index=pd.Index([], name=row_col), columns=pd.Index([], name=col_col), dtype=np.int64)
+            return empty, None if values is None else empty.astype(float)
+        if n_rows * n_cols <= CROSSTAB_DENSE_CELLS:
+            # One pass over every label pair (missing first on each axis), folded afterwards
+            flat = row_codes.astype(np.int64) * n_cols + col_codes + (n_cols + 1)
+            dense = np.bincount(flat, minlength=n_rows * n_cols).reshape(n_rows, n_cols)
+            row_remap, row_kept = top_remap(dense[1:].sum(axis=1), row_labels, top[0], missing=dense[0].sum())
+            col_remap, col_kept = top_remap(dense[:, 1:].sum(axis=0), col_labels, top[1], missing=dense[:, 0].sum())
+            cells = (np.roll(row_remap, 1)[:, None] * len(col_kept) + np.roll(col_remap, 1)[None, :]).ravel()
+            shape = (len(row_kept), len(col_kept))
+            counts = np.bincount(cells, weights=dense.ravel(), minlength=shape[0] * shape[1]).astype(np.int64)
+            sums = None
+            if values is not None:
+                dense_sums = np.bincount(flat, weights=values, minlength=n_rows * n_cols)
+                sums = np.bincount(cells, weights=dense_sums, minlength=shape[0] * shape[1])
+        else:
+            (row_folded, row_kept), (col_folded, col_kept) = fold_top(row_codes, row_labels, top[0]), fold_top(col_codes, col_labels, top[1])
+            shape = (len(row_kept), len(col_kept))
+            flat = row_folded * shape[1] + col_folded
+            counts = np.bincount(flat, minlength=shape[0] * shape[1])
+            sums = None if values is None else np.bincount(flat, weights=values, minlength=shape[0] * shape[1])
+
+        index, columns = pd.Index(row_kept, name=row_col), pd.Index(col_kept, name=col_col)
+        counts = pd.DataFrame(counts.reshape(shape), index=index, columns=columns)
+        return counts, None if sums is None else pd.DataFrame(sums.reshape(shape), index=index, columns=columns)
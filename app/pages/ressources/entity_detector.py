@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+
+
+ENTITY_COLUMNS = ('dst_port', 'rule', 'proto')
+ENTITY_TOP = 50
+# Cells of the entity × bucket matrices scored together, the block of entities shrinks as buckets grow
+ENTITY_BLOCK_CELLS = 1 << 21
+
+
+def time_buckets(values, step):
+    """Bucket ids of int64 nanosecond timestamps (NaT as -1) and the start of every bucket"""
+    timed = values != np.iinfo(np.int64).min
+    if not timed.any():
+        return np.full(len(values), -1, dtype=np.int64), pd.DatetimeIndex([])
+    low = values[timed].min()
+    origin = low - low % step
+    buckets = np.where(timed, (values - origin) // step, -1)
+    n_buckets = int(buckets.max()) + 1
+    return buckets, pd.to_datetime(origin + step * np.arange(n_buckets))
+
+
+def ema_std(counts, span):
+    """EMA and rolling sample std of every row of an entity × bucket matrix
+
+    Same statistics as the single-series detector, ewm(span, adjust=False) and
+    rolling(span).std(), computed along the time axis for all rows at once.
+    """
+    alpha = 2.0 / (span + 1)
+    ema = np.empty_like(counts)
+    ema[:, 0] = counts[:, 0]
+    for t in range(1, counts.shape[1]):
+        ema[:, t] = alpha * counts[:, t] + (1 - alpha) * ema[:, t - 1]
+
+    std = np.full_like(counts, np.nan)
+    if span >= 2 and counts.shape[1] >= span:
+        # Window sums from cumulative sums, each row centred on its mean to keep the squares small
+        centred = counts - counts.mean(axis=1, keepdims=True)
+        sums = np.cumsum(np.pad(centred, ((0, 0), (1, 0))), axis=1)
+        squares = np.cumsum(np.pad(centred ** 2, ((0, 0), (1, 0))), axis=1)
+        s1 = sums[:, span:] - sums[:, :-span]
+        s2 = squares[:, span:] - squares[:, :-span]
+        std[:, span - 1:] = np.sqrt(np.maximum(s2 - s1 * s1 / span, 0) / (span - 1))
+    return ema, std
+
+
+def rank_entities(codes, labels, buckets, bucket_times, span, multiplier, top=ENTITY_TOP, block_cells=ENTITY_BLOCK_CELLS):
+    """Entities whose own bucketed count leaves its EMA channel, most excess events first
+
+    codes are per-row entity codes (-1 missing) and buckets per-row bucket ids
+    (-1 untimed). Rows are grouped by entity once, then each block of entities
+    becomes one count matrix scored in a single vectorized pass. Blocks hold
+    about block_cells cells, which bounds the matrix and its temporaries.
+    """
+    n_buckets = len(bucket_times)
+    block = max(1, block_cells // max(n_buckets, 1))
+    keep = (codes >= 0) & (buckets >= 0)
+    codes, buckets = codes[keep], buckets[keep]
+    order = np.argsort(codes, kind='stable')
+    offsets = np.searchsorted(codes[order], np.arange(0, len(labels) + block, block))
+
+    frames = []
+    for i, lo in enumerate(range(0, len(labels), block)):
+        hi = min(lo + block, len(labels))
+        rows = order[offsets[i]:offsets[i + 1]]
+        if len(rows) == 0:
+            continue
+        flat = (codes[rows] - lo) * n_buckets + buckets[rows]
+        counts = np.bincount(flat, minlength=(hi - lo) * n_buckets).reshape(hi - lo, n_buckets).astype(np.float64)
+        ema, std = ema_std(counts, span)
+        events = counts.sum(axis=1).astype(np.int64)
+
+        # Each bucket is scored against the channel of the buckets before it, so a lone burst
+        # cannot widen its own band; a flat history still has Poisson noise
+        counts, expected = counts[:, 1:], ema[:, :-1]
+        spread = np.maximum(std[:, :-1], np.sqrt(np.maximum(expected, 1.0)))
+        with np.errstate(invalid='ignore'):
+            score = (counts - expected) / spread
+            flagged = np.abs(score) > multiplier
+        entities = np.flatnonzero(flagged.any(axis=1))
+        if len(entities) == 0:
+            continue
+        counts, expected, spread, score, flagged = (a[entities] for a in (counts, expected, spread, score, flagged))
+        peak = np.argmax(np.where(flagged, np.abs(score), -1.0), axis=1)
+        take = np.arange(len(entities))
+        frames.append(pd.DataFrame({
+            'entity': np.asarray(labels)[lo + entities],
+            'events': events[entities],
+            'anomalies': flagged.sum(axis=1),
+            'excess': np.where(flagged & (score > 0), counts - expected - multiplier * spread, 0.0).sum(axis=1),
+            'peak_time': bucket_times[peak + 1],
+            'peak_count': counts[take, peak].astype(np.int64),
+            'expected': expected[take, peak],
+            'peak_score': score[take, peak],
+        }))
+
+    columns = ['entity', 'events', 'anomalies', 'excess', 'peak_time', 'peak_count', 'expected', 'peak_score']
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    ranked = pd.concat(frames, ignore_index=True)
+    return ranked.sort_values(['excess', 'peak_score', 'anomalies'], ascending=False, kind='stable').head(top).reset_index(drop=True)
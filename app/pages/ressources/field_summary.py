@@ -0,0 +1,130 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+# Rows per block of the summary pass, and points kept per block for the quantile sketch
+SUMMARY_BLOCK_ROWS = 65_536
+SKETCH_POINTS = 101
+SUMMARY_CACHE_ENTRIES = 64
+SUMMARY_QUANTILES = (0.25, 0.5, 0.75)
+SUMMARY_FIELDS = ['count', 'nulls', 'min', 'p25', 'median', 'p75', 'max', 'mean', 'std']
+
+
+def _float_column(series):
+    """Float view of a numeric column, missing values as NaN"""
+    if series.dtype.kind in 'fiub':
+        return series.to_numpy()
+    return series.to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def _sketch_quantiles(points, weights, quantiles):
+    """Quantiles of a column from its per-block sketch points and their weights"""
+    if len(points) == 0:
+        return np.full(len(quantiles), np.nan)
+    order = np.argsort(points, kind='stable')
+    points, weights = points[order], weights[order]
+    ranks = np.cumsum(weights) - weights / 2
+    return np.interp(np.asarray(quantiles) * weights.sum(), ranks, points)
+
+
+def summarize_columns(df, columns, rows=None, block_rows=SUMMARY_BLOCK_ROWS):
+    """count, nulls, min, max, mean, std and approximate quartiles of numeric columns in one blocked pass
+
+    Each block is gathered into one float matrix. Moments are merged across
+    blocks with Chan's parallel update, and each block keeps SKETCH_POINTS
+    evenly spaced quantiles, weighted by its count, for the final quartiles.
+    """
+    columns = list(columns)
+    arrays = [_float_column(df[col]) for col in columns]
+    n_rows = len(df) if rows is None else len(rows)
+    k = len(columns)
+    count = np.zeros(k)
+    mean = np.zeros(k)
+    m2 = np.zeros(k)
+    low = np.full(k, np.inf)
+    high = np.full(k, -np.inf)
+    sketch_points, sketch_weights = [[] for _ in columns], [[] for _ in columns]
+    levels = np.linspace(0, 1, SKETCH_POINTS)
+
+    for start in range(0, n_rows, block_rows):
+        stop = min(start + block_rows, n_rows)
+        index = slice(start, stop) if rows is None else rows[start:stop]
+        block = np.empty((stop - start, k))
+        for j, values in enumerate(arrays):
+            block[:, j] = values[index]
+
+        valid = np.isfinite(block)
+        block_count = valid.sum(axis=0)
+        present = block_count > 0
+        if not present.any():
+            continue
+        filled = np.where(valid, block, 0.0)
+        block_mean = np.divide(filled.sum(axis=0), block_count, out=np.zeros(k), where=present)
+        block_m2 = (np.where(valid, block - block_mean, 0.0) ** 2).sum(axis=0)
+        low = np.minimum(low, np.where(valid, block, np.inf).min(axis=0))
+        high = np.maximum(high, np.where(valid, block, -np.inf).max(axis=0))
+
+        # Chan et al. pairwise merge of the running moments with the block's
+        total = count + block_count
+        delta = block_mean - mean
+        ratio = np.divide(block_count, total, out=np.zeros(k), where=total > 0)
+        mean = mean + delta * ratio
+        m2 = m2 + block_m2 + delta ** 2 * count * ratio
+        count = total
+
+        present_cols = np.flatnonzero(present)
+        block_points = np.nanquantile(np.where(valid, block, np.nan)[:, present_cols], levels, axis=0)
+        for i, j in enumerate(present_cols):
+            sketch_points[j].append(block_points[:, i])
+            sketch_weights[j].append(np.full(SKETCH_POINTS, block_count[j] / SKETCH_POINTS))
+
+    summary = pd.DataFrame(index=pd.Index(columns, name='field'), columns=SUMMARY_FIELDS, dtype=float)
+    summary['count'] = count
+    summary['nulls'] = n_rows - count
+    has_values = count > 0
+    summary['min'] = np.where(has_values, low, np.nan)
+    summary['max'] = np.where(has_values, high, np.nan)
+    summary['mean'] = np.where(has_values, mean, np.nan)
+    summary['std'] = np.sqrt(np.divide(m2, count - 1, out=np.full(k, np.nan), where=count > 1))
+    for j, col in enumerate(columns):
+        points = np.concatenate(sketch_points[j]) if sketch_points[j] else np.empty(0)
+        weights = np.concatenate(sketch_weights[j]) if sketch_weights[j] else np.empty(0)
+        summary.loc[col, ['p25', 'median', 'p75']] = _sketch_quantiles(points, weights, SUMMARY_QUANTILES)
+    return summary.astype({'count': np.int64, 'nulls': np.int64})
+
+
+class FieldSummaries:
+    """Numeric summaries of row selections of one dataframe, cached per (selection, column)
+
+    Columns already summarized for a selection are reused; the missing ones
+    are computed together in a single pass.
+    """
+
+    def __init__(self, df, max_entries=SUMMARY_CACHE_ENTRIES):
+        self.df = df
+        self.max_entries = max_entries
+        self._summaries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, selection, columns, rows=None):
+        """Summary table of some columns over a selection's rows (None meaning every row)"""
+        with self._lock:
+            found = {}
+            for col in columns:
+                if (selection, col) in self._summaries:
+                    self._summaries.move_to_end((selection, col))
+                    found[col] = self._summaries[selection, col]
+        missing = [col for col in columns if col not in found]
+        if missing:
+            computed = dict(summarize_columns(self.df, missing, rows).iterrows())
+            found.update(computed)
+            with self._lock:
+                for col, values in computed.items():
+                    self._summaries[selection, col] = values
+                while len(self._summaries) > self.max_entries:
+                    self._summaries.popitem(last=False)
+        summary = pd.DataFrame([found[col] for col in columns], index=pd.Index(columns, name='field'))
+        return summary.astype({'count': np.int64, 'nulls': np.int64})
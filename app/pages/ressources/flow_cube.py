@@ -0,0 +1,119 @@
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+from pages.ressources.ip_utils import apply_subnet_level
+
+
+def column_codes(series):
+    """Return (codes, categories) of a column, -1 marking missing values"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy().astype(np.int64), series.cat.categories
+    try:
+        codes, categories = pd.factorize(series, sort=True)
+    except TypeError:
+        # Mixed types cannot be ordered
+        codes, categories = pd.factorize(series)
+    return codes.astype(np.int64), categories
+
+
+def label_strings(labels):
+    """Display labels of codes, whole floats shown as integers"""
+    labels = pd.Index(labels)
+    if pd.api.types.is_float_dtype(labels) and (labels == labels.round()).all():
+        labels = labels.astype(np.int64)
+    return labels.astype(str)
+
+
+def top_remap(counts, labels, n_top, missing=0):
+    """Map codes (missing last) onto the n_top most frequent labels, the others onto a final 'Other'"""
+    top = np.argsort(-counts, kind='stable')[:n_top]
+    top = top[counts[top] > 0]
+    remap = np.full(len(labels) + 1, len(top), dtype=np.int64)
+    remap[top] = np.arange(len(top))
+    kept = label_strings(pd.Index(labels)[top])
+    if missing or counts.sum() > counts[top].sum():
+        kept = kept.append(pd.Index(['Other']))
+    elif len(top):
+        # Nothing folds: the remaining codes never occur, point them at a kept label
+        remap[remap == len(top)] = 0
+    return remap, kept
+
+
+def fold_top(codes, labels, n_top):
+    """Remap codes to the n_top most frequent labels, the rest and missing values folded into 'Other'"""
+    counts = np.bincount(codes[codes >= 0], minlength=len(labels))
+    remap, kept = top_remap(counts, labels, n_top, missing=np.count_nonzero(codes < 0))
+    return remap[codes], kept
+
+
+def top_group_codes(series, n_top):
+    """Codes of the n_top most frequent values of a column, the rest folded into 'Other'"""
+    return fold_top(*column_codes(series), n_top)
+
+
+class FlowCube:
+    """Event counts and byte sums per (src, dst, dst_port, proto), keyed by categorical codes
+
+    Built once per dataset version; flow-diagram selections are slices of its
+    cells instead of scans of the raw rows.
+    """
+
+    DIMENSIONS = ('src', 'dst', 'port', 'proto')
+
+    def __init__(self, df, src_col, dst_col, port_col, proto_col=None, bytes_col=None):
+        self.columns = dict(zip(self.DIMENSIONS, (src_col, dst_col, port_col, proto_col)))
+        self.categories = {}
+        codes = {}
+        for dim, col in self.columns.items():
+            if col is None:
+                codes[dim] = np.zeros(len(df), dtype=np.int64)
+                self.categories[dim] = pd.Index(['all'])
+            else:
+                codes[dim], self.categories[dim] = column_codes(df[col])
+
+        frame = pd.DataFrame(codes)
+        frame['bytes'] = pd.to_numeric(df[bytes_col], errors='coerce').fillna(0).to_numpy() if bytes_col else 0
+        self.cells = frame.groupby(list(self.DIMENSIONS), sort=False).agg(
+            count=('bytes', 'size'), bytes=('bytes', 'sum')).reset_index()
+        self.events = len(df)
+
+    def labels(self, dim, codes):
+        """Turn codes of one dimension back into a categorical of labels"""
+        return pd.Categorical.from_codes(np.asarray(codes), categories=self.categories[dim])
+
+    @cached_property
+    def dst_totals(self):
+        """Events per destination, busiest first"""
+        cells = self.cells[self.cells['dst'] >= 0]
+        totals = np.bincount(cells['dst'], weights=cells['count'], minlength=len(self.categories['dst']))
+        totals = pd.Series(totals.astype(np.int64), index=self.categories['dst'])
+        return totals[totals > 0].sort_values(ascending=False, kind='stable')
+
+    def slice(self, dst=None):
+        """Cells of one destination label, or every cell"""
+        if dst is None:
+            return self.cells
+        try:
+            code = self.categories['dst'].get_loc(dst)
+        except KeyError:
+            return self.cells.iloc[:0]
+        return self.cells[self.cells['dst'] == code]
+
+    def sources(self, cells, subnet_level=None):
+        """Source labels of some cells, rolled up to a subnet level if requested"""
+        src = pd.Series(self.labels('src', cells['src']), index=cells.index, name='src')
+        return apply_subnet_level(src, subnet_level) if subnet_level else src
+
+    def src_totals(self, subnet_level=None):
+        """Events per source at a subnet level, busiest first"""
+        src = self.sources(self.cells, subnet_level)
+        return self.cells['count'].groupby(src, observed=True).sum().sort_values(ascending=False, kind='stable')
+
+    def src_port_counts(self, dst=None, subnet_level=None):
+        """(src, port, count, bytes) table of one destination"""
+        cells = self.slice(dst)
+        src = self.sources(cells, subnet_level)
+        port = pd.Series(self.labels('port', cells['port']), index=cells.index, name='port')
+        return cells.groupby([src, port], observed=True)[['count', 'bytes']].sum().reset_index()
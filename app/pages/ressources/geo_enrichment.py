@@ -0,0 +1,102 @@
+import threading
+import time
+
+import pandas as pd
+import requests
+
+from pages.ressources.components import build_geo_table, location_record
+from pages.ressources.ip_utils import classify_ip, lookup_ip
+
+
+# ip-api.com batch endpoint: 100 IPs per request, 15 requests per minute without a key
+GEO_BATCH_URL = 'http://ip-api.com/batch'
+GEO_BATCH_SIZE = 100
+GEO_BATCH_FIELDS = 'status,message,query,country,countryCode,regionName,city,zip,lat,lon,isp,org'
+GEO_MAX_IPS = 20_000
+GEO_MAX_RETRIES = 3
+
+
+def enrichment_targets(df, ip_cols, max_ips=GEO_MAX_IPS):
+    """Return the distinct public IPs of the IP columns, most frequent first"""
+    if not ip_cols:
+        return []
+    counts = pd.concat([df[col].value_counts() for col in ip_cols])
+    counts = counts[counts > 0]
+    counts.index = counts.index.astype(str)
+    counts = counts.groupby(level=0).sum().sort_values(ascending=False, kind='stable')
+    hi, lo, valid = lookup_ip(counts.index)
+    public = classify_ip(hi, lo)['public'] & valid
+    return counts.index[public][:max_ips].tolist()
+
+
+def lookup_batch(ips, session=requests):
+    """Geolocate one batch of IPs, returns (records or None when throttled, seconds to wait)"""
+    response = session.post(GEO_BATCH_URL, params={'fields': GEO_BATCH_FIELDS}, json=list(ips), timeout=10)
+    # X-Rl is the number of requests left in the window, X-Ttl the seconds until it resets
+    wait = float(response.headers.get('X-Ttl', 60)) if response.headers.get('X-Rl') == '0' else 0.0
+    if response.status_code == 429:
+        return None, max(wait, 1.0)
+    response.raise_for_status()
+    records = [location_record(info['query'], info) for info in response.json() if info.get('status') == 'success']
+    return records, wait
+
+
+class GeoEnrichment:
+    """Geolocate a list of IPs in a background thread, exposing the partial table as it fills"""
+
+    def __init__(self, ips):
+        self.ips = list(ips)
+        self.total = len(self.ips)
+        self.done = 0
+        self.error = None
+        self._table = build_geo_table([])
+        self._chunks = []
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name='geo-enrichment', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    @property
+    def complete(self):
+        return self.done >= self.total or self.error is not None
+
+    @property
+    def progress(self):
+        return self.done / self.total if self.total else 1.0
+
+    def table(self):
+        """Return the geolocation table resolved so far"""
+        with self._lock:
+            if self._chunks:
+                self._table = pd.concat([self._table, *self._chunks], ignore_index=True)
+                self._chunks = []
+            return self._table
+
+    def _run(self):
+        # No Streamlit calls in here: the thread has no script run context
+        session = requests.Session()
+        for start in range(0, self.total, GEO_BATCH_SIZE):
+            batch = self.ips[start:start + GEO_BATCH_SIZE]
+            failures = 0
+            while True:
+                try:
+                    records, wait = lookup_batch(batch, session)
+                except Exception as e:
+                    failures += 1
+                    if failures >= GEO_MAX_RETRIES:
+                        self.error = str(e)
+                        return
+                    time.sleep(2 ** failures)
+                    continue
+                if records is not None:
+                    break
+                time.sleep(wait)
+            if records:
+                chunk = build_geo_table(records)
+                with self._lock:
+                    self._chunks.append(chunk)
+            self.done = min(start + GEO_BATCH_SIZE, self.total)
+            if wait:
+                time.sleep(wait)
@@ -0,0 +1,147 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from pages.ressources.crossfilter import bucket_width
+
+
+HISTOGRAM_BINS = 64
+HISTOGRAM_TIME_BUCKETS = 1024
+HISTOGRAM_SCALES = ('linear', 'log')
+
+
+def histogram_edges(values, bins=HISTOGRAM_BINS):
+    """Fixed-width and log1p-spaced bin edges of a column, None where a scale does not apply"""
+    finite = values[np.isfinite(values)]
+    if len(finite) == 0:
+        return {'linear': None, 'log': None}
+    low, high = float(finite.min()), float(finite.max())
+    if np.all(finite == np.round(finite)):
+        # Integer fields (ports, ttl, lengths) get integer-aligned bins
+        width = max(1, int(np.ceil((high - low + 1) / bins)))
+        linear = low - 0.5 + width * np.arange(int(np.ceil((high - low + 1) / width)) + 1)
+    elif high > low:
+        linear = np.linspace(low, high, bins + 1)
+    else:
+        linear = np.array([low - 0.5, low + 0.5])
+    log = np.expm1(np.linspace(0, np.log1p(high), bins + 1)) if low >= 0 and high > 0 else None
+    return {'linear': linear, 'log': log}
+
+
+def bin_codes(values, edges):
+    """Bin of each value, len(edges) - 1 for missing values"""
+    n_bins = len(edges) - 1
+    codes = np.clip(np.searchsorted(edges, values, side='right') - 1, 0, n_bins - 1)
+    return np.where(np.isfinite(values), codes, n_bins)
+
+
+class HistogramCube:
+    """Counts per (time bucket, bin) of every numeric column, built in a background thread
+
+    Rows are taken in timestamp order so each time bucket is a contiguous run of
+    sorted positions. The histogram of a time window is the sum of its whole
+    buckets plus the exact counts of the few rows in its partial edge buckets.
+    """
+
+    def __init__(self, df, columns, time_order=None, time_sorted=None):
+        self.df = df
+        self.columns = list(columns)
+        self.time_order = time_order
+        self.bucket_starts = None
+        self.step = None
+        if time_order is not None and len(time_sorted):
+            # NaT sorts first as the smallest int64 and gets no bucket
+            first = np.searchsorted(time_sorted, np.iinfo(np.int64).min, side='right')
+            if first < len(time_sorted):
+                start, end = time_sorted[first], time_sorted[-1]
+                self.step = bucket_width(end - start, HISTOGRAM_TIME_BUCKETS)
+                origin = start - start % self.step.value
+                boundaries = origin + self.step.value * np.arange((end - origin) // self.step.value + 2)
+                self.bucket_starts = np.searchsorted(time_sorted, boundaries, side='left')
+                self.time_sorted = time_sorted
+        self._columns = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self.error = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    @property
+    def ready(self):
+        return len(self._columns) == len(self.columns)
+
+    def _run(self):
+        try:
+            for col in self.columns:
+                self.column(col)
+        except Exception as e:
+            self.error = str(e)
+
+    def _values(self, col, rows=None):
+        series = self.df[col]
+        values = series.to_numpy() if series.dtype.kind in 'fiub' else series.to_numpy(dtype=np.float64, na_value=np.nan)
+        values = values if rows is None else values[rows]
+        return values.astype(np.float64, copy=False)
+
+    def column(self, col):
+        """Edges and per-bucket counts of one column for every scale, built on first use"""
+        with self._lock:
+            if col not in self._columns:
+                self._columns[col] = self._build(col)
+            return self._columns[col]
+
+    def _build(self, col):
+        values = self._values(col)
+        built = {}
+        for scale, edges in histogram_edges(values).items():
+            if edges is None:
+                continue
+            n_bins = len(edges) - 1
+            if self.bucket_starts is None:
+                counts = np.bincount(bin_codes(values, edges), minlength=n_bins + 1)[None, :n_bins]
+                built[scale] = (edges, counts, counts[0])
+                continue
+            codes = bin_codes(values[self.time_order], edges)
+            n_buckets = len(self.bucket_starts) - 1
+            bucket = np.repeat(np.arange(n_buckets), np.diff(self.bucket_starts))
+            timed = codes[self.bucket_starts[0]:]
+            counts = np.bincount(bucket * (n_bins + 1) + timed, minlength=n_buckets * (n_bins + 1))
+            counts = counts.reshape(n_buckets, n_bins + 1)[:, :n_bins]
+            # Rows without a timestamp only count in the all-time histogram
+            untimed = np.bincount(codes[:self.bucket_starts[0]], minlength=n_bins + 1)[:n_bins]
+            built[scale] = (edges, counts, counts.sum(axis=0) + untimed)
+        return built
+
+    def scales(self, col):
+        return [scale for scale in HISTOGRAM_SCALES if scale in self.column(col)]
+
+    def histogram(self, col, scale='linear', start=None, end=None):
+        """(edges, counts) of a column over every row, or over start <= timestamp <= end"""
+        edges, counts, total = self.column(col)[scale]
+        if start is None or self.bucket_starts is None:
+            return edges, total
+        lo = np.searchsorted(self.time_sorted, pd.Timestamp(start).value, side='left')
+        hi = np.searchsorted(self.time_sorted, pd.Timestamp(end).value, side='right')
+        first = np.searchsorted(self.bucket_starts, lo, side='left')
+        last = np.searchsorted(self.bucket_starts, hi, side='right') - 1
+        if first >= last:
+            return edges, self._exact(col, edges, lo, hi)
+        result = counts[first:last].sum(axis=0)
+        result += self._exact(col, edges, lo, self.bucket_starts[first])
+        result += self._exact(col, edges, self.bucket_starts[last], hi)
+        return edges, result
+
+    def _exact(self, col, edges, lo, hi):
+        """Counts of the rows at sorted time positions lo:hi"""
+        values = self._values(col, self.time_order[lo:hi])
+        return np.bincount(bin_codes(values, edges), minlength=len(edges))[:len(edges) - 1]
+
+    def histogram_of(self, col, values, scale='linear'):
+        """Counts of arbitrary values of a column on its precomputed edges"""
+        edges = self.column(col)[scale][0]
+        values = pd.to_numeric(pd.Series(values), errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+        return edges, np.bincount(bin_codes(values, edges), minlength=len(edges))[:len(edges) - 1]
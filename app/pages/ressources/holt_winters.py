@@ -0,0 +1,191 @@
+import itertools
+import json
+
+import numpy as np
+import pandas as pd
+
+
+# Smoothing constants tried when fitting, every combination runs in the same pass over the history
+HW_ALPHAS = (0.1, 0.3, 0.5, 0.8)
+HW_BETAS = (0.0, 0.05, 0.2)
+HW_GAMMAS = (0.05, 0.2, 0.5)
+# Seasons tried from the longest, each needing two full cycles of history
+HW_SEASONS_NS = (7 * 86_400 * 10**9, 86_400 * 10**9, 3_600 * 10**9)
+HW_MAX_SEASON = 1_440
+# Effective number of recent one-step errors behind the prediction variance
+HW_ERROR_WINDOW = 30
+
+
+def interval_channel(values, expected, spread, multiplier=2.0):
+    """Channel and anomaly flags of buckets scored against forecasts and their prediction spread"""
+    values = np.asarray(values, dtype=np.float64)
+    with np.errstate(invalid='ignore'):
+        anomaly = np.abs(values - expected) > multiplier * spread
+    return pd.DataFrame({
+        'expected': expected,
+        'upper_band': expected + multiplier * spread,
+        'lower_band': np.maximum(expected - multiplier * spread, 0.0),
+        'anomaly': anomaly,
+    })
+
+
+def season_length(step, n_buckets):
+    """Buckets per season for a bucket width in nanoseconds: week, day or hour, 1 without two cycles of any"""
+    for season in HW_SEASONS_NS:
+        if season % step == 0 and season // step <= HW_MAX_SEASON and n_buckets >= 2 * (season // step) > 2:
+            return int(season // step)
+    return 1
+
+
+class HoltWinters:
+    """Additive triple exponential smoothing, updated one bucket at a time
+
+    Level, trend and seasonal state are arrays over candidate smoothing
+    constants, so fitting runs every candidate in one pass over the history
+    and keeps the one with the smallest one-step squared error; that model
+    then ingests new buckets at constant cost, without refitting. The state
+    serializes to JSON.
+    """
+
+    def __init__(self, season, alpha=0.3, beta=0.05, gamma=0.2):
+        self.season = int(season)
+        self.alpha, self.beta, self.gamma = (np.atleast_1d(np.asarray(p, dtype=np.float64)) for p in (alpha, beta, gamma))
+        if self.season == 1:
+            # Without a season the seasonal term would only duplicate the level
+            self.gamma = np.zeros_like(self.gamma)
+        self.level = self.trend = None
+        self.seasonals = None
+        self.variance = np.zeros(len(self.alpha))
+        self.sse = np.zeros(len(self.alpha))
+        self.errors = 0
+        self.phase = 0
+        self.warmup = []
+        self.last_timestamp = None
+
+    @property
+    def ready(self):
+        return self.level is not None
+
+    def _start(self):
+        """Level, trend and seasonals from the first two cycles"""
+        history = np.asarray(self.warmup, dtype=np.float64)
+        m = self.season
+        first, second = history[:m].mean(), history[m:2 * m].mean()
+        k = len(self.alpha)
+        self.level = np.full(k, second)
+        self.trend = np.full(k, (second - first) / m)
+        self.seasonals = np.tile(history[m:2 * m] - second if m > 1 else np.zeros(1), (k, 1))
+        self.phase = 0
+        self.warmup = []
+
+    def update(self, value, timestamp=None):
+        """Ingest one bucket, returning the forecast it was scored against (NaN while warming up)"""
+        value = float(value)
+        if timestamp is not None:
+            self.last_timestamp = pd.Timestamp(timestamp)
+        if not self.ready:
+            self.warmup.append(value)
+            if len(self.warmup) == 2 * self.season:
+                self._start()
+            return np.full(len(self.alpha), np.nan), np.full(len(self.alpha), np.nan)
+
+        seasonal = self.seasonals[:, self.phase]
+        expected = self.level + self.trend + seasonal
+        error = value - expected
+        spread = np.sqrt(self.variance) if self.errors else np.full(len(self.alpha), np.nan)
+
+        level = self.alpha * (value - seasonal) + (1 - self.alpha) * (self.level + self.trend)
+        self.trend = self.beta * (level - self.level) + (1 - self.beta) * self.trend
+        self.seasonals[:, self.phase] = self.gamma * (value - level) + (1 - self.gamma) * seasonal
+        self.level = level
+        self.phase = (self.phase + 1) % self.season
+
+        self.errors += 1
+        weight = max(1.0 / self.errors, 1.0 / HW_ERROR_WINDOW)
+        self.variance = (1 - weight) * self.variance + weight * error * error
+        self.sse += error * error
+        return expected, spread
+
+    def ingest(self, values, timestamps=None):
+        """Ingest a batch of buckets, returning the (bucket, candidate) forecasts and spreads they were scored against"""
+        timestamps = [None] * len(values) if timestamps is None else list(timestamps)
+        scored = [self.update(value, timestamp) for value, timestamp in zip(values, timestamps)]
+        if not scored:
+            return np.empty((0, len(self.alpha))), np.empty((0, len(self.alpha)))
+        return np.array([forecast for forecast, _ in scored]), np.array([spread for _, spread in scored])
+
+    def score(self, values, timestamps=None, multiplier=2.0):
+        """Ingest a batch of buckets, each scored against its one-step forecast and prediction interval"""
+        expected, spread = self.ingest(values, timestamps)
+        return interval_channel(values, expected[:, 0], spread[:, 0], multiplier)
+
+    def forecast(self, horizon, multiplier=2.0):
+        """Expected value and prediction interval of the next horizon buckets
+
+        The h-step variance of the additive model grows with the smoothing
+        constants: σ²·(1 + Σ_j (α(1 + jβ) + γ·[j is a whole season])²).
+        """
+        steps = np.arange(1, horizon + 1)
+        if not self.ready:
+            nan = np.full(horizon, np.nan)
+            return pd.DataFrame({'expected': nan, 'upper_band': nan, 'lower_band': nan})
+        alpha, beta, gamma = self.alpha[0], self.beta[0], self.gamma[0]
+        expected = self.level[0] + steps * self.trend[0] + self.seasonals[0, (self.phase + steps - 1) % self.season]
+        weights = (alpha * (1 + steps[:-1] * beta) + gamma * (steps[:-1] % self.season == 0)) ** 2
+        spread = np.sqrt(self.variance[0] * (1 + np.concatenate([[0.0], np.cumsum(weights)])))
+        return pd.DataFrame({
+            'expected': expected,
+            'upper_band': expected + multiplier * spread,
+            'lower_band': np.maximum(expected - multiplier * spread, 0.0),
+        })
+
+    @classmethod
+    def fit(cls, values, season, timestamps=None):
+        """Best candidate model on a history, with its state after the last value and its one-step forecasts and spreads"""
+        grid = np.array(list(itertools.product(HW_ALPHAS, HW_BETAS, HW_GAMMAS if season > 1 else (0.0,))))
+        model = cls(season, grid[:, 0], grid[:, 1], grid[:, 2])
+        expected, spread = model.ingest(values, timestamps)
+        best = int(np.argmin(model.sse))
+        return model.select(best), expected[:, best], spread[:, best]
+
+    def select(self, i):
+        """Single model of candidate i"""
+        model = HoltWinters(self.season, self.alpha[i], self.beta[i], self.gamma[i])
+        model.warmup = list(self.warmup)
+        if self.ready:
+            model.level, model.trend = self.level[i:i + 1].copy(), self.trend[i:i + 1].copy()
+            model.seasonals = self.seasonals[i:i + 1].copy()
+        model.variance, model.sse = self.variance[i:i + 1].copy(), self.sse[i:i + 1].copy()
+        model.errors, model.phase, model.last_timestamp = self.errors, self.phase, self.last_timestamp
+        return model
+
+    def to_dict(self):
+        """State of a single model"""
+        return {
+            'season': self.season,
+            'alpha': float(self.alpha[0]), 'beta': float(self.beta[0]), 'gamma': float(self.gamma[0]),
+            'level': None if self.level is None else float(self.level[0]),
+            'trend': None if self.trend is None else float(self.trend[0]),
+            'seasonals': None if self.seasonals is None else self.seasonals[0].tolist(),
+            'variance': float(self.variance[0]), 'sse': float(self.sse[0]),
+            'errors': self.errors, 'phase': self.phase, 'warmup': list(self.warmup),
+            'last_timestamp': None if self.last_timestamp is None else self.last_timestamp.isoformat(),
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        model = cls(state['season'], state['alpha'], state['beta'], state['gamma'])
+        if state['level'] is not None:
+            model.level, model.trend = np.array([state['level']]), np.array([state['trend']])
+            model.seasonals = np.array([state['seasonals']])
+        model.variance, model.sse = np.array([state['variance']]), np.array([state['sse']])
+        model.errors, model.phase, model.warmup = state['errors'], state['phase'], list(state['warmup'])
+        model.last_timestamp = None if state['last_timestamp'] is None else pd.Timestamp(state['last_timestamp'])
+        return model
+
+    def to_json(self):
+        return json.dumps(self.to_dict())
+
+    @classmethod
+    def from_json(cls, text):
+        return cls.from_dict(json.loads(text))
@@ -0,0 +1,497 @@
+import ipaddress
+
+import numpy as np
+import pandas as pd
+
+
+# Classification flags stored as bits of a uint8
+IP_PRIVATE = 1
+IP_LOOPBACK = 2
+IP_MULTICAST = 4
+IP_RESERVED = 8
+IP_LINK_LOCAL = 16
+IP_UNSPECIFIED = 32
+
+IP_CLASS_NAMES = {
+    'private': IP_PRIVATE,
+    'loopback': IP_LOOPBACK,
+    'multicast': IP_MULTICAST,
+    'reserved': IP_RESERVED,
+    'link_local': IP_LINK_LOCAL,
+    'unspecified': IP_UNSPECIFIED,
+}
+
+# Special-purpose IPv4 blocks (same lists as the ipaddress module)
+IPV4_SPECIAL_NETWORKS = [
+    ('0.0.0.0/8', IP_PRIVATE),
+    ('0.0.0.0/32', IP_UNSPECIFIED),
+    ('10.0.0.0/8', IP_PRIVATE),
+    ('127.0.0.0/8', IP_PRIVATE | IP_LOOPBACK),
+    ('169.254.0.0/16', IP_PRIVATE | IP_LINK_LOCAL),
+    ('172.16.0.0/12', IP_PRIVATE),
+    ('192.0.0.0/29', IP_PRIVATE),
+    ('192.0.0.170/31', IP_PRIVATE),
+    ('192.0.2.0/24', IP_PRIVATE),
+    ('192.168.0.0/16', IP_PRIVATE),
+    ('198.18.0.0/15', IP_PRIVATE),
+    ('198.51.100.0/24', IP_PRIVATE),
+    ('203.0.113.0/24', IP_PRIVATE),
+    ('224.0.0.0/4', IP_MULTICAST),
+    ('240.0.0.0/4', IP_PRIVATE | IP_RESERVED),
+    ('255.255.255.255/32', IP_PRIVATE),
+]
+
+# Special-purpose IPv6 blocks, all of them decided by the upper 64 bits
+# (::, ::1 and the IPv4-mapped block are handled separately)
+IPV6_SPECIAL_NETWORKS = [
+    ('::/8', IP_RESERVED),
+    ('100::/8', IP_RESERVED),
+    ('100::/64', IP_PRIVATE),
+    ('200::/7', IP_RESERVED),
+    ('400::/6', IP_RESERVED),
+    ('800::/5', IP_RESERVED),
+    ('1000::/4', IP_RESERVED),
+    ('2001::/23', IP_PRIVATE),
+    ('2001:db8::/32', IP_PRIVATE),
+    ('4000::/3', IP_RESERVED),
+    ('6000::/3', IP_RESERVED),
+    ('8000::/3', IP_RESERVED),
+    ('a000::/3', IP_RESERVED),
+    ('c000::/3', IP_RESERVED),
+    ('e000::/4', IP_RESERVED),
+    ('f000::/5', IP_RESERVED),
+    ('f800::/6', IP_RESERVED),
+    ('fc00::/7', IP_PRIVATE),
+    ('fe00::/9', IP_RESERVED),
+    ('fe80::/10', IP_PRIVATE | IP_LINK_LOCAL),
+    ('ff00::/8', IP_MULTICAST),
+]
+
+# IPv4 addresses live in the IPv4-mapped block ::ffff:0:0/96 of the 128-bit space
+IPV4_MAPPED_PREFIX = np.uint64(0xFFFF << 32)
+UINT64_MAX = np.uint64(0xFFFFFFFFFFFFFFFF)
+
+# Maximum number of distinct strings kept in the parse cache
+IP_CACHE_SIZE = 1_000_000
+
+_IP_CACHE = {}
+
+
+def _ascii_matrix(values, width):
+    """Return strings as a (n, width) uint8 matrix, zero padded"""
+    strs = pd.Series(values, dtype=object).fillna('').astype(str).str.strip()
+    try:
+        raw = strs.to_numpy(dtype=f'S{width}')
+    except UnicodeEncodeError:
+        raw = strs.str.encode('ascii', errors='replace').to_numpy(dtype=f'S{width}')
+    return raw.view(np.uint8).reshape(len(raw), width)
+
+
+def parse_ipv4(values):
+    """Parse dotted IPv4 strings into uint32 with one vectorized pass per character position"""
+    # 15 chars max for "255.255.255.255", the 16th column must stay empty
+    chars = _ascii_matrix(values, 16)
+    n = chars.shape[0]
+    rows = np.arange(n)
+
+    octets = np.zeros((n, 4), dtype=np.uint32)
+    acc = np.zeros(n, dtype=np.uint32)
+    digits = np.zeros(n, dtype=np.int8)
+    leading_zero = np.zeros(n, dtype=bool)
+    part = np.zeros(n, dtype=np.int8)
+    done = np.zeros(n, dtype=bool)
+    valid = chars[:, -1] == 0
+
+    for j in range(chars.shape[1]):
+        c = chars[:, j]
+        is_digit = (c >= 48) & (c <= 57) & ~done
+        is_dot = (c == 46) & ~done
+        is_end = (c == 0) & ~done
+        valid &= is_digit | is_dot | is_end | done
+
+        acc = np.where(is_digit, acc * 10 + (c.astype(np.uint32) - 48), acc)
+        # Like the ipaddress module, an octet may not continue after a leading zero ("01")
+        valid &= ~(is_digit & leading_zero)
+        leading_zero |= is_digit & (digits == 0) & (c == 48)
+        digits += is_digit
+        valid &= digits <= 3
+
+        # A dot or the end of the string closes the current octet
+        commit = is_dot | is_end
+        valid &= ~commit | (digits > 0)
+        valid &= ~is_dot | (part < 3)
+        store = commit & valid
+        octets[rows[store], part[store]] = acc[store]
+
+        part += is_dot
+        acc[commit] = 0
+        digits[commit] = 0
+        leading_zero[commit] = False
+        done |= is_end
+
+    valid &= (part == 3) & (octets <= 255).all(axis=1)
+    ints = (octets[:, 0] << 24) | (octets[:, 1] << 16) | (octets[:, 2] << 8) | octets[:, 3]
+    return np.where(valid, ints, 0).astype(np.uint32), valid
+
+
+def parse_ipv6(values):
+    """Parse IPv6 strings into (hi, lo) uint64 halves with a vectorized pass per character
+
+    Handles "::" compression. Embedded dotted IPv4 tails and zone ids are left
+    invalid here, parse_ip() sends them to the ipaddress module.
+    """
+    # 39 chars max for a full IPv6 address, the 40th column must stay empty
+    chars = _ascii_matrix(values, 40)
+    n = chars.shape[0]
+    rows = np.arange(n)
+
+    groups = np.zeros((n, 8), dtype=np.uint64)
+    acc = np.zeros(n, dtype=np.uint64)
+    digits = np.zeros(n, dtype=np.int8)
+    count = np.zeros(n, dtype=np.int8)
+    gap = np.full(n, -1, dtype=np.int8)
+    prev_colon = np.zeros(n, dtype=bool)
+    done = np.zeros(n, dtype=bool)
+    valid = chars[:, -1] == 0
+    # A leading colon is only allowed as part of a leading "::"
+    valid &= (chars[:, 0] != 58) | (chars[:, 1] == 58)
+
+    for j in range(chars.shape[1]):
+        c = chars[:, j].astype(np.uint64)
+        is_num = (c >= 48) & (c <= 57)
+        is_lower = (c >= 97) & (c <= 102)
+        is_upper = (c >= 65) & (c <= 70)
+        is_hex = (is_num | is_lower | is_upper) & ~done
+        is_colon = (c == 58) & ~done
+        is_end = (c == 0) & ~done
+        valid &= is_hex | is_colon | is_end | done
+
+        nibble = np.where(is_num, c - 48, np.where(is_lower, c - 87, c - 55))
+        acc = np.where(is_hex, (acc << np.uint64(4)) | nibble, acc)
+        digits += is_hex
+        valid &= digits <= 4
+
+        # "::" marks where the run of zero groups goes
+        double = is_colon & prev_colon
+        valid &= ~double | (gap < 0)
+        gap = np.where(double, count, gap)
+        # A trailing single colon is an error, a trailing "::" is fine
+        valid &= ~(is_end & prev_colon & (digits == 0)) | (gap == count)
+
+        commit = (is_colon | is_end) & (digits > 0)
+        store = commit & valid & (count < 8)
+        groups[rows[store], count[store]] = acc[store]
+        count += commit
+        valid &= count <= 8
+
+        prev_colon = is_colon
+        acc[commit] = 0
+        digits[commit] = 0
+        done |= is_end
+
+    compressed = gap >= 0
+    valid &= np.where(compressed, count <= 7, count == 8)
+
+    # Shift the groups written after "::" to the end of the address
+    slots = np.arange(8)[None, :]
+    start = np.where(compressed, gap, 8)[:, None]
+    shift = np.where(compressed, 8 - count, 0)[:, None]
+    source = np.where(slots < start, slots, slots - shift)
+    groups = np.take_along_axis(groups, np.clip(source, 0, 7), axis=1)
+    groups[(slots >= start) & (slots < start + shift)] = 0
+
+    weights = np.array([48, 32, 16, 0], dtype=np.uint64)
+    hi = np.bitwise_or.reduce(groups[:, :4] << weights, axis=1)
+    lo = np.bitwise_or.reduce(groups[:, 4:] << weights, axis=1)
+    zero = np.uint64(0)
+    return np.where(valid, hi, zero), np.where(valid, lo, zero), valid
+
+
+def parse_ip(values):
+    """Parse mixed IPv4/IPv6 strings into (hi, lo, valid), IPv4 stored as ::ffff:a.b.c.d"""
+    values = pd.Series(values, dtype=object).reset_index(drop=True)
+    n = len(values)
+    hi = np.zeros(n, dtype=np.uint64)
+    lo = np.zeros(n, dtype=np.uint64)
+
+    ints, valid = parse_ipv4(values)
+    lo[valid] = IPV4_MAPPED_PREFIX | ints[valid].astype(np.uint64)
+
+    rest = np.flatnonzero(~valid)
+    if len(rest):
+        hi6, lo6, valid6 = parse_ipv6(values.iloc[rest])
+        hi[rest], lo[rest] = hi6, lo6
+        valid[rest] = valid6
+
+    # Rare forms (::ffff:1.2.3.4, fe80::1%eth0) go through the ipaddress module
+    rest = np.flatnonzero(~valid)
+    for i in rest:
+        text = str(values.iat[i]).strip()
+        if ':' not in text:
+            continue
+        try:
+            address = ipaddress.IPv6Address(text.split('%')[0])
+        except ValueError:
+            continue
+        mapped = address.ipv4_mapped
+        packed = int(mapped) | (0xFFFF << 32) if mapped else int(address)
+        hi[i], lo[i], valid[i] = packed >> 64, packed & 0xFFFFFFFFFFFFFFFF, True
+    return hi, lo, valid
+
+
+def is_ipv4(hi, lo):
+    """Return the mask of addresses stored in the IPv4-mapped block"""
+    return (hi == 0) & ((lo >> np.uint64(32)) == np.uint64(0xFFFF))
+
+
+def format_ipv4(ints):
+    """Format uint32 addresses back to dotted strings"""
+    ints = np.asarray(ints, dtype=np.uint32)
+    octets = [((ints >> shift) & 0xFF).astype(str) for shift in (24, 16, 8, 0)]
+    out = octets[0]
+    for octet in octets[1:]:
+        out = np.char.add(np.char.add(out, '.'), octet)
+    return out.astype(object)
+
+
+def format_ip(hi, lo):
+    """Format (hi, lo) addresses back to strings"""
+    hi = np.asarray(hi, dtype=np.uint64)
+    lo = np.asarray(lo, dtype=np.uint64)
+    out = np.empty(len(hi), dtype=object)
+    v4 = is_ipv4(hi, lo)
+    out[v4] = format_ipv4((lo[v4] & np.uint64(0xFFFFFFFF)).astype(np.uint32))
+    out[~v4] = [str(ipaddress.IPv6Address((int(h) << 64) | int(l))) for h, l in zip(hi[~v4], lo[~v4])]
+    return out
+
+
+def lookup_ip(uniques):
+    """Parse distinct strings through the string-to-address cache, returns (hi, lo, valid)"""
+    uniques = [str(u) for u in uniques]
+    missing = [u for u in uniques if u not in _IP_CACHE]
+    if missing:
+        if len(_IP_CACHE) + len(missing) > IP_CACHE_SIZE:
+            _IP_CACHE.clear()
+        hi, lo, valid = parse_ip(missing)
+        # None marks strings that are not IP addresses
+        _IP_CACHE.update(zip(missing, [(h, l) if v else None
+                                       for h, l, v in zip(hi.tolist(), lo.tolist(), valid.tolist())]))
+    entries = [_IP_CACHE[u] for u in uniques]
+    valid = np.fromiter((e is not None for e in entries), dtype=bool, count=len(entries))
+    hi = np.fromiter((e[0] if e else 0 for e in entries), dtype=np.uint64, count=len(entries))
+    lo = np.fromiter((e[1] if e else 0 for e in entries), dtype=np.uint64, count=len(entries))
+    return hi, lo, valid
+
+
+def lookup_ipv4(uniques):
+    """Return (uint32, valid) for distinct strings, only IPv4 addresses are valid"""
+    hi, lo, valid = lookup_ip(uniques)
+    valid &= is_ipv4(hi, lo)
+    return np.where(valid, lo & np.uint64(0xFFFFFFFF), 0).astype(np.uint32), valid
+
+
+def ipv4_to_int(ip):
+    """Convert a single dotted IPv4 string to an int, None if invalid"""
+    ints, valid = lookup_ipv4([ip])
+    return int(ints[0]) if valid[0] else None
+
+
+def prefix_mask(hi, lo, prefix):
+    """Keep the first `prefix` bits of 128-bit addresses (scalar or per-row prefix)"""
+    hi = np.asarray(hi, dtype=np.uint64)
+    lo = np.asarray(lo, dtype=np.uint64)
+    prefix = np.asarray(prefix, dtype=np.int64)
+    hi_bits = np.clip(prefix, 0, 64)
+    lo_bits = np.clip(prefix - 64, 0, 64)
+    # Shifting a uint64 by 64 is undefined, zero-width masks are set explicitly
+    hi_mask = np.where(hi_bits == 0, np.uint64(0),
+                       UINT64_MAX << np.minimum(64 - hi_bits, 63).astype(np.uint64))
+    lo_mask = np.where(lo_bits == 0, np.uint64(0),
+                       UINT64_MAX << np.minimum(64 - lo_bits, 63).astype(np.uint64))
+    return hi & hi_mask, lo & lo_mask
+
+
+def address_order(hi, lo):
+    """Return the indices that sort (hi, lo) addresses"""
+    return np.lexsort((lo, hi))
+
+
+def _network_bounds(cidr):
+    """Return the inclusive (start, end) integer bounds of a CIDR"""
+    network = ipaddress.ip_network(cidr, strict=False)
+    return int(network.network_address), int(network.broadcast_address)
+
+
+def _build_range_table(bounds, dtype):
+    """Flatten overlapping ranges into disjoint sorted segments with OR-ed flags"""
+    cuts = sorted({start for (start, _), _ in bounds} | {end + 1 for (_, end), _ in bounds})
+    starts, ends, flags = [], [], []
+    for seg_start, seg_next in zip(cuts[:-1], cuts[1:]):
+        seg_flag = 0
+        for (start, end), flag in bounds:
+            if start <= seg_start and seg_next - 1 <= end:
+                seg_flag |= flag
+        if seg_flag:
+            starts.append(seg_start)
+            ends.append(seg_next - 1)
+            flags.append(seg_flag)
+    return np.array(starts, dtype=dtype), np.array(ends, dtype=dtype), np.array(flags, dtype=np.uint8)
+
+
+def _range_flags(table, values):
+    """Look up the flags of each value in a range table with a single searchsorted"""
+    starts, ends, flags = table
+    values = np.asarray(values, dtype=starts.dtype)
+    idx = np.maximum(np.searchsorted(starts, values, side='right') - 1, 0)
+    hit = (values >= starts[idx]) & (values <= ends[idx])
+    return np.where(hit, flags[idx], 0).astype(np.uint8)
+
+
+_IPV4_RANGES = _build_range_table(
+    [(_network_bounds(cidr), flag) for cidr, flag in IPV4_SPECIAL_NETWORKS], np.uint32)
+_IPV6_HI_RANGES = _build_range_table(
+    [(tuple(bound >> 64 for bound in _network_bounds(cidr)), flag) for cidr, flag in IPV6_SPECIAL_NETWORKS],
+    np.uint64)
+
+
+def ipv4_flags(ints):
+    """Return the classification bit flags of each IPv4 address"""
+    return _range_flags(_IPV4_RANGES, ints)
+
+
+def ip_flags(hi, lo):
+    """Return the classification bit flags of mixed IPv4/IPv6 addresses"""
+    hi = np.asarray(hi, dtype=np.uint64)
+    lo = np.asarray(lo, dtype=np.uint64)
+    flags = _range_flags(_IPV6_HI_RANGES, hi)
+    v4 = is_ipv4(hi, lo)
+    flags[v4] = ipv4_flags((lo[v4] & np.uint64(0xFFFFFFFF)).astype(np.uint32))
+    flags[(hi == 0) & (lo == 1)] |= IP_PRIVATE | IP_LOOPBACK
+    flags[(hi == 0) & (lo == 0)] |= IP_PRIVATE | IP_UNSPECIFIED
+    return flags
+
+
+def _flag_masks(flags):
+    masks = {name: (flags & bit) > 0 for name, bit in IP_CLASS_NAMES.items()}
+    masks['public'] = flags == 0
+    return masks
+
+
+def classify_ipv4(ints):
+    """Return boolean masks for private, loopback, multicast, reserved... IPv4 addresses"""
+    return _flag_masks(ipv4_flags(ints))
+
+
+def classify_ip(hi, lo):
+    """Return boolean masks for private, loopback, multicast, reserved... addresses"""
+    return _flag_masks(ip_flags(hi, lo))
+
+
+def detect_ip_columns(df):
+    """Return the columns whose name suggests IP addresses"""
+    return [col for col in df.columns if 'ip' in str(col).lower()]
+
+
+def ip_column_values(series):
+    """Return (hi, lo, valid) for every row of an IP column
+
+    Distinct strings are parsed once and mapped back to rows via their codes.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes = series.cat.codes.to_numpy()
+        uniques = series.cat.categories
+    else:
+        codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    hi, lo, valid = lookup_ip(uniques)
+    # Code -1 (missing value) reads the extra invalid slot at the end
+    hi = np.append(hi, np.uint64(0))
+    lo = np.append(lo, np.uint64(0))
+    valid = np.append(valid, False)
+    return hi[codes], lo[codes], valid[codes]
+
+
+def to_ip_category(series):
+    """Convert an IP string column to a categorical sorted by numeric address"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        uniques = pd.Index(series.cat.categories.astype(str))
+    else:
+        uniques = pd.Index(pd.unique(series.dropna().astype(str)))
+    hi, lo, valid = lookup_ip(uniques)
+    # Valid addresses first in numeric order, anything else (hostnames...) after
+    order = np.lexsort((lo, hi, ~valid))
+    categories = uniques[order]
+    return pd.Categorical(series.astype(str).where(series.notna()), categories=categories)
+
+
+def convert_ip_columns(df, min_valid_ratio=0.9):
+    """Store IP columns as compact categoricals, codes ordered like the addresses"""
+    for col in detect_ip_columns(df):
+        series = df[col]
+        if not (pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)
+                or isinstance(series.dtype, pd.CategoricalDtype)):
+            continue
+        sample = series.dropna().astype(str).unique()[:1000]
+        if len(sample) == 0:
+            continue
+        _, _, valid = lookup_ip(sample)
+        if valid.mean() >= min_valid_ratio:
+            df[col] = to_ip_category(series)
+    return df
+
+
+def ip_class_counts(series):
+    """Count rows per address class of an IP column in one vectorized pass"""
+    hi, lo, valid = ip_column_values(series)
+    masks = classify_ip(hi[valid], lo[valid])
+    counts = {name: int(mask.sum()) for name, mask in masks.items()}
+    counts['ipv6'] = int((~is_ipv4(hi[valid], lo[valid])).sum())
+    counts['invalid'] = int((~valid).sum())
+    return counts
+
+
+# Subnet rollup levels: (IPv4 prefix, IPv6 prefix), None keeps single addresses
+SUBNET_LEVELS = {
+    'Address': None,
+    '/24 · /64': (24, 64),
+    '/16 · /48': (16, 48),
+    '/8 · /32': (8, 32),
+}
+
+
+def subnet_rollup(series, v4_prefix, v6_prefix):
+    """Roll an IP column up to its subnets by integer masking of the distinct addresses
+
+    Returns a categorical of CIDR labels ("10.1.2.0/24", "2001:db8:1::/48")
+    ordered by network address. Values that are not IPs are kept as they are.
+    """
+    if not isinstance(series.dtype, pd.CategoricalDtype):
+        series = pd.Series(to_ip_category(series), index=series.index, name=series.name)
+    categories = series.cat.categories
+    hi, lo, valid = lookup_ip(categories)
+    v4 = is_ipv4(hi, lo)
+    net_hi, net_lo = prefix_mask(hi, lo, np.where(v4, 96 + v4_prefix, v6_prefix))
+
+    # Distinct networks in address order, then everything that is not an IP
+    keys = np.stack([net_hi[valid], net_lo[valid]], axis=1)
+    networks, inverse = np.unique(keys, axis=0, return_inverse=True)
+    network_v4 = is_ipv4(networks[:, 0], networks[:, 1])
+    labels = format_ip(networks[:, 0], networks[:, 1]).astype(str)
+    labels = np.char.add(labels, np.where(network_v4, f'/{v4_prefix}', f'/{v6_prefix}')).astype(object)
+
+    others = pd.Index(categories[~valid].astype(str))
+    category_map = np.empty(len(categories), dtype=np.int64)
+    category_map[valid] = inverse.ravel()
+    category_map[~valid] = len(labels) + np.arange(len(others))
+
+    codes = series.cat.codes.to_numpy()
+    rolled = np.where(codes >= 0, category_map[codes], -1)
+    return pd.Series(pd.Categorical.from_codes(rolled, categories=pd.Index(labels).append(others)),
+                     index=series.index, name=series.name)
+
+
+def apply_subnet_level(series, level):
+    """Return the IP column rolled up to one of SUBNET_LEVELS"""
+    prefixes = SUBNET_LEVELS.get(level)
+    if prefixes is None:
+        return series
+    return subnet_rollup(series, *prefixes)
@@ -0,0 +1,310 @@
+import operator
+import re
+
+import numpy as np
+import pandas as pd
+
+from pages.ressources.bitmap_cache import BitmapCache, bitmap_and, bitmap_not, bitmap_or, unpack
+from pages.ressources.flow_cube import column_codes
+from pages.ressources.ip_utils import detect_ip_columns, is_ipv4, lookup_ip
+from pages.ressources.search_index import searchable_columns
+from pages.ressources.threat_intel import IntelMatcher
+
+
+_COMPARATORS = {'>': operator.gt, '>=': operator.ge, '<': operator.lt, '<=': operator.le}
+
+_TOKEN = re.compile(r'\s*(?:(?P<op>>=|<=|>|<|:)|(?P<paren>[()\[\]])|"(?P<quoted>(?:[^"\\]|\\.)*)"|(?P<word>[^\s()\[\]"<>=:]+))')
+# Values after ':' or a comparator may hold ':' themselves (IPv6, times)
+_VALUE = re.compile(r'\s*(?:"(?P<quoted>(?:[^"\\]|\\.)*)"|(?P<word>[^\s()\[\]"]+))')
+
+
+class QueryError(ValueError):
+    """Raised for queries that cannot be parsed or evaluated"""
+
+
+def tokenize(query):
+    """Split a query into (kind, text) tokens"""
+    tokens = []
+    pos = 0
+    query = query.rstrip()
+    while pos < len(query):
+        after_op = tokens and tokens[-1][0] == 'op'
+        match = _VALUE.match(query, pos) if after_op and query[pos:].lstrip()[:1] not in ('(', '[') else None
+        match = match or _TOKEN.match(query, pos)
+        if not match or match.end() == pos:
+            raise QueryError(f"Unexpected character at position {pos}: {query[pos:pos + 10]!r}")
+        kind = match.lastgroup
+        text = match.group(kind)
+        if kind == 'quoted':
+            text = re.sub(r'\\(.)', r'\1', text)
+        tokens.append((kind, text))
+        pos = match.end()
+    return tokens
+
+
+class _Parser:
+    """Recursive-descent parser producing hashable tuple nodes
+
+    ('and', a, b), ('or', a, b), ('not', a), ('match', field, value, wildcard),
+    ('compare', field, op, value), ('range', field, low, high), ('text', value, wildcard)
+    """
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.pos = 0
+
+    def peek(self, offset=0):
+        index = self.pos + offset
+        return self.tokens[index] if index < len(self.tokens) else (None, None)
+
+    def next(self):
+        token = self.peek()
+        self.pos += 1
+        return token
+
+    def keyword(self, name):
+        kind, text = self.peek()
+        return kind == 'word' and text.upper() == name
+
+    def expect(self, kind, text=None):
+        token = self.next()
+        if token[0] != kind or (text is not None and token[1] != text):
+            raise QueryError(f"Expected {text or kind} but found {token[1] or 'end of query'}")
+        return token
+
+    def parse(self):
+        if not self.tokens:
+            raise QueryError("Empty query")
+        node = self.parse_or()
+        if self.pos < len(self.tokens):
+            raise QueryError(f"Unexpected {self.peek()[1]!r}")
+        return node
+
+    def parse_or(self, field=None):
+        node = self.parse_and(field)
+        while self.keyword('OR'):
+            self.next()
+            node = ('or', node, self.parse_and(field))
+        return node
+
+    def parse_and(self, field=None):
+        node = self.parse_not(field)
+        while True:
+            if self.keyword('AND'):
+                self.next()
+            elif self.peek()[0] is None or self.peek() == ('paren', ')') or self.keyword('OR'):
+                return node
+            # Adjacent clauses are implicitly ANDed, left-associative so appended clauses reuse the prefix
+            node = ('and', node, self.parse_not(field))
+
+    def parse_not(self, field=None):
+        if self.keyword('NOT'):
+            self.next()
+            return ('not', self.parse_not(field))
+        return self.parse_primary(field)
+
+    def parse_primary(self, field=None):
+        kind, text = self.peek()
+        if (kind, text) == ('paren', '('):
+            self.next()
+            node = self.parse_or(field)
+            self.expect('paren', ')')
+            return node
+        if field is None and kind == 'word' and self.peek(1)[0] == 'op':
+            self.next()
+            op = self.next()[1]
+            if op == ':':
+                return self.parse_field_value(text)
+            return ('compare', text, op, self.value()[0])
+        if field is not None and (kind, text) == ('paren', '['):
+            return self.parse_range(field)
+        value, wildcard = self.value()
+        return ('match', field, value, wildcard) if field is not None else ('text', value, wildcard)
+
+    def parse_field_value(self, field):
+        kind, text = self.peek()
+        if (kind, text) == ('paren', '('):
+            self.next()
+            node = self.parse_or(field)
+            self.expect('paren', ')')
+            return node
+        if (kind, text) == ('paren', '['):
+            return self.parse_range(field)
+        value, wildcard = self.value()
+        return ('match', field, value, wildcard)
+
+    def parse_range(self, field):
+        self.expect('paren', '[')
+        low = self.value()[0]
+        if not self.keyword('TO'):
+            raise QueryError("Ranges are written [low TO high]")
+        self.next()
+        high = self.value()[0]
+        self.expect('paren', ']')
+        return ('range', field, low, high)
+
+    def value(self):
+        """Return (text, wildcard) of the next value token; quoted values are literal"""
+        kind, text = self.next()
+        if kind not in ('word', 'quoted'):
+            raise QueryError(f"Expected a value but found {text or 'end of query'}")
+        return text, kind == 'word' and ('*' in text or '?' in text)
+
+
+def parse_query(query):
+    """Parse a Kibana-style query into a tuple expression tree"""
+    return _Parser(tokenize(query)).parse()
+
+
+def _wildcard_regex(value):
+    return '^' + re.escape(value).replace(r'\*', '.*').replace(r'\?', '.') + '$'
+
+
+class QueryEngine:
+    """Evaluate parsed queries as vectorized masks over one dataframe
+
+    Every node is materialized once as a packed bitmap in a BitmapCache, so a
+    refined query only evaluates its new clauses. The bitmaps are also keyed
+    by version, so engines over different states of one dataset never share them.
+    """
+
+    def __init__(self, df, bitmaps=None, version=None):
+        self.df = df
+        self.version = version
+        self.ip_columns = set(detect_ip_columns(df))
+        self.text_columns = searchable_columns(df)
+        self.bitmaps = bitmaps if bitmaps is not None else BitmapCache(len(df))
+        self._codes = {}
+
+    def bitmap(self, query):
+        """Packed row bitmap of a query string or parsed node"""
+        node = parse_query(query) if isinstance(query, str) else query
+        return self._evaluate(node)
+
+    def mask(self, query):
+        """Boolean row mask of a query string or parsed node"""
+        return unpack(self.bitmap(query), len(self.df))
+
+    def filter(self, query):
+        """Rows of the dataframe matching a query"""
+        return self.bitmaps.view(self.df, self.bitmap(query))
+
+    def _evaluate(self, node):
+        return self.bitmaps.get(('query', self.version, node), lambda: self._compute(node))
+
+    def _compute(self, node):
+        kind = node[0]
+        if kind == 'and':
+            return bitmap_and(self._evaluate(node[1]), self._evaluate(node[2]))
+        if kind == 'or':
+            return bitmap_or(self._evaluate(node[1]), self._evaluate(node[2]))
+        if kind == 'not':
+            return bitmap_not(self._evaluate(node[1]), len(self.df))
+        if kind == 'text':
+            mask = np.zeros(len(self.df), dtype=bool)
+            for col in self.text_columns:
+                mask |= self._text_match(col, node[1], node[2], substring=True)
+            return mask
+        return self._evaluate_field(node)
+
+    def _column(self, field):
+        if field in self.df.columns:
+            return field
+        lowered = {str(col).lower(): col for col in self.df.columns}
+        if field.lower() not in lowered:
+            raise QueryError(f"Unknown field '{field}'")
+        return lowered[field.lower()]
+
+    def _on_values(self, col, test):
+        """Evaluate a test on the distinct values of a column and spread it to the rows"""
+        if col not in self._codes:
+            self._codes[col] = column_codes(self.df[col])
+        codes, values = self._codes[col]
+        hits = np.append(np.asarray(test(values), dtype=bool), False)
+        return hits[codes]
+
+    def _text_match(self, col, value, wildcard, substring=False):
+        if wildcard:
+            pattern = _wildcard_regex(f'*{value}*' if substring else value)
+            return self._on_values(col, lambda v: pd.Index(v).astype(str).str.match(pattern, case=False))
+        value = value.lower()
+        if substring:
+            return self._on_values(col, lambda v: pd.Index(v).astype(str).str.lower().str.contains(value, regex=False))
+        return self._on_values(col, lambda v: pd.Index(v).astype(str).str.lower() == value)
+
+    def _scalar(self, series, value):
+        """Convert a query value to the type of a column"""
+        try:
+            if pd.api.types.is_datetime64_any_dtype(series):
+                stamp = pd.Timestamp(value)
+                tz = getattr(series.dtype, 'tz', None)
+                if tz is not None and stamp.tzinfo is None:
+                    stamp = stamp.tz_localize(tz)
+                return stamp
+            if pd.api.types.is_bool_dtype(series):
+                return value.lower() in ('true', '1', 'yes')
+            if pd.api.types.is_numeric_dtype(series):
+                return float(value)
+        except (ValueError, TypeError):
+            raise QueryError(f"'{value}' is not a valid value for field '{series.name}'")
+        return value
+
+    def _ordered(self, col, op, bound):
+        """Test of the distinct values of an untyped column against one bound
+
+        IP columns compare by 128-bit address within the family of the bound,
+        other columns (or bounds that are not addresses) as strings.
+        """
+        if col in self.ip_columns:
+            bound_hi, bound_lo, bound_valid = lookup_ip([bound])
+            if bound_valid[0]:
+                bound_v4 = is_ipv4(bound_hi, bound_lo)[0]
+
+                def compare(values):
+                    hi, lo, valid = lookup_ip(pd.Index(values).astype(str))
+                    order = np.where(hi != bound_hi[0], np.where(hi > bound_hi[0], 1, -1),
+                                     np.where(lo != bound_lo[0], np.where(lo > bound_lo[0], 1, -1), 0))
+                    return op(order, 0) & valid & (is_ipv4(hi, lo) == bound_v4)
+                return compare
+        return lambda values: op(pd.Index(values).astype(str), bound)
+
+    def _evaluate_field(self, node):
+        kind, field = node[0], node[1]
+        col = self._column(field)
+        series = self.df[col]
+        typed = not (pd.api.types.is_object_dtype(series) or isinstance(series.dtype, pd.CategoricalDtype)
+                     or pd.api.types.is_string_dtype(series))
+
+        if kind == 'match':
+            value, wildcard = node[2], node[3]
+            if wildcard and value == '*':
+                return series.notna().to_numpy()
+            if col in self.ip_columns and not wildcard:
+                # Addresses and CIDRs are matched as 128-bit ranges on the distinct addresses
+                matcher = IntelMatcher(field, [value])
+                if matcher.entries:
+                    def in_network(values):
+                        hi, lo, valid = lookup_ip(pd.Index(values).astype(str))
+                        return matcher.match(hi, lo) & valid
+                    return self._on_values(col, in_network)
+            if typed and not wildcard:
+                return (series == self._scalar(series, value)).to_numpy()
+            return self._text_match(col, value, wildcard)
+
+        if kind == 'compare':
+            op, value = _COMPARATORS[node[2]], node[3]
+            if typed:
+                return op(series, self._scalar(series, value)).fillna(False).to_numpy(dtype=bool)
+            return self._on_values(col, self._ordered(col, op, value))
+
+        # Inclusive range, '*' leaves a side open
+        low, high = node[2], node[3]
+        mask = np.ones(len(series), dtype=bool)
+        for bound, op in ((low, operator.ge), (high, operator.le)):
+            if bound == '*':
+                continue
+            if typed:
+                mask &= op(series, self._scalar(series, bound)).fillna(False).to_numpy(dtype=bool)
+            else:
+                mask &= self._on_values(col, self._ordered(col, op, bound))
+        return mask
@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+MAD_SCALE = 1.4826
+# Values gathered at once from the strided views, bounding the copy sorted in each block
+ROBUST_BLOCK_CELLS = 1 << 22
+
+
+def _kth_deviation(rows, median, below, k):
+    """k-th smallest |value - median| of each sorted row, by binary search over its two sorted halves
+
+    Left of the median the distances grow leftwards, right of it rightwards.
+    The k-th smallest takes some count a from the left half and k + 1 - a
+    from the right, a is found for every row at once in log(width) steps.
+    """
+    n_rows, width = rows.shape
+    index = np.arange(n_rows)
+
+    def left(j):
+        # j-th smallest distance left of the median, +inf past the half and -inf before it
+        valid = (j >= 0) & (j < below)
+        return np.where(valid, median - rows[index, np.clip(below - 1 - j, 0, width - 1)], np.where(j < 0, -np.inf, np.inf))
+
+    def right(j):
+        valid = (j >= 0) & (j < width - below)
+        return np.where(valid, rows[index, np.clip(below + j, 0, width - 1)] - median, np.where(j < 0, -np.inf, np.inf))
+
+    lo = np.maximum(0, k + 1 - (width - below))
+    hi = np.minimum(k + 1, below)
+    while np.any(lo < hi):
+        mid = (lo + hi) // 2
+        more = (lo < hi) & (left(mid) < right(k - mid))
+        lo = np.where(more, mid + 1, lo)
+        hi = np.where(more | (lo >= hi), hi, mid)
+    return np.maximum(left(lo - 1), right(k - lo))
+
+
+def rolling_median_mad(values, window):
+    """Median and MAD of the `window` values before each position, NaN until a window is available
+
+    The trailing windows are strided views of the series, sorted block by
+    block: the median is read from the middle of each sorted row and the MAD
+    selected from it, exactly, for any window size.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    median = np.full(n, np.nan)
+    mad = np.full(n, np.nan)
+    if n <= window:
+        return median, mad
+
+    # windows[i] holds values[i:i + window], the history of position i + window
+    windows = sliding_window_view(values[:-1], window)
+    step = max(1, ROBUST_BLOCK_CELLS // window)
+    low, high = (window - 1) // 2, window // 2
+    for lo in range(0, len(windows), step):
+        rows = np.sort(windows[lo:lo + step], axis=1)
+        block_median = (rows[:, low] + rows[:, high]) / 2
+        below = (rows < block_median[:, None]).sum(axis=1)
+        block_mad = _kth_deviation(rows, block_median, below, low)
+        if high != low:
+            block_mad = (block_mad + _kth_deviation(rows, block_median, below, high)) / 2
+        median[window + lo:window + lo + len(rows)] = block_median
+        mad[window + lo:window + lo + len(rows)] = block_mad
+    return median, mad
+
+
+def robust_channel(values, window, multiplier=3.0):
+    """Expected count, channel, robust z-score and anomaly flag of each bucket against its trailing window
+
+    A spike never enters the window that scores it, and a few spikes in the
+    history move neither the median nor the MAD.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    median, mad = rolling_median_mad(values, window)
+    # Counts are at least Poisson-noisy, also where the window never varied
+    spread = np.maximum(mad * MAD_SCALE, np.sqrt(np.maximum(median, 1.0)))
+    with np.errstate(invalid='ignore'):
+        score = (values - median) / spread
+        anomaly = np.abs(score) > multiplier
+    return pd.DataFrame({
+        'expected': median,
+        'upper_band': median + multiplier * spread,
+        'lower_band': np.maximum(median - multiplier * spread, 0.0),
+        'score': score,
+        'anomaly': anomaly,
+    })
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+
+from pages.ressources.flow_cube import column_codes, label_strings
+
+
+# Dimensions an anomalous bucket is broken down by, when present
+EXPLAIN_COLUMNS = ('dst_port', 'proto', 'rule', 'interface_in')
+# Buckets before a flagged one forming its baseline, and contributors listed
+EXPLAIN_BASELINE = 10
+EXPLAIN_TOP = 15
+
+
+class ContributionCube:
+    """Counts per (time bucket, value) of several dimensions, kept as one sparse bucket × code matrix each
+
+    Buckets use the same epoch-aligned widths as the detection series. Each
+    matrix stores its non-zero cells sorted by bucket, so a bucket or a run of
+    baseline buckets is a contiguous slice summed by one bincount.
+    """
+
+    def __init__(self, times, dimensions, step):
+        times = pd.Series(times)
+        if times.dt.tz is not None:
+            times = times.dt.tz_localize(None)
+        values = times.to_numpy(dtype='datetime64[ns]').view(np.int64)
+        timed = ~pd.isna(times).to_numpy()
+        self.step = int(step)
+        low = values[timed].min() if timed.any() else 0
+        self.origin = low - low % self.step
+        buckets = np.where(timed, (values - self.origin) // self.step, -1)
+        self.n_buckets = int(buckets.max()) + 1 if timed.any() else 0
+        self.totals = np.bincount(buckets[timed], minlength=self.n_buckets)
+
+        self.dimensions = {}
+        for name, series in dimensions.items():
+            codes, labels = column_codes(series)
+            keep = timed & (codes >= 0)
+            n_codes = max(len(labels), 1)
+            cells, counts = np.unique(buckets[keep] * n_codes + codes[keep], return_counts=True)
+            offsets = np.searchsorted(cells // n_codes, np.arange(self.n_buckets + 1), side='left')
+            self.dimensions[name] = (cells % n_codes, counts, offsets, label_strings(labels))
+
+    def bucket_of(self, timestamp):
+        timestamp = pd.Timestamp(timestamp)
+        if timestamp.tzinfo is not None:
+            timestamp = timestamp.tz_localize(None)
+        return int((timestamp.value - self.origin) // self.step)
+
+    def _counts(self, name, lo, hi):
+        codes, counts, offsets, labels = self.dimensions[name]
+        return np.bincount(codes[offsets[lo]:offsets[hi]], weights=counts[offsets[lo]:offsets[hi]], minlength=len(labels))
+
+    def explain(self, timestamp, baseline=EXPLAIN_BASELINE, top=EXPLAIN_TOP):
+        """Values whose count in a bucket departs most from their mean over the previous buckets
+
+        Contributors of every dimension are ranked together by excess events,
+        or by missing events when the bucket is below its baseline.
+        """
+        bucket = self.bucket_of(timestamp)
+        columns = ['dimension', 'value', 'count', 'expected', 'excess', 'share']
+        if not 0 <= bucket < self.n_buckets:
+            return pd.DataFrame(columns=columns)
+        lo = max(0, bucket - baseline)
+        width = max(bucket - lo, 1)
+        total_excess = self.totals[bucket] - self.totals[lo:bucket].sum() / width
+        direction = 1 if total_excess >= 0 else -1
+
+        frames = []
+        for name, (_, _, _, labels) in self.dimensions.items():
+            current = self._counts(name, bucket, bucket + 1)
+            expected = self._counts(name, lo, bucket) / width
+            excess = current - expected
+            changed = np.flatnonzero(excess * direction > 0)
+            changed = changed[np.argsort(-excess[changed] * direction, kind='stable')[:top]]
+            frames.append(pd.DataFrame({
+                'dimension': name,
+                'value': np.asarray(labels)[changed],
+                'count': current[changed].astype(np.int64),
+                'expected': expected[changed],
+                'excess': excess[changed],
+            }))
+        ranked = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns[:-1])
+        ranked['share'] = ranked['excess'] / total_excess * 100 if total_excess else np.nan
+        order = np.argsort(-ranked['excess'].to_numpy(dtype=np.float64) * direction, kind='stable')
+        return ranked.iloc[order[:top]].reset_index(drop=True)[columns]
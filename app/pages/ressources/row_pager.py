@@ -0,0 +1,109 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from pages.ressources.flow_cube import column_codes
+
+
+# Sorted prefixes up to this many rows come from a partial sort, deeper pages use the full argsort
+TOPK_ROWS = 10_000
+SELECTION_CACHE_ENTRIES = 8
+
+
+def sort_keys(series):
+    """Dense ascending ranks of a column, missing values ranked last"""
+    codes, categories = column_codes(series)
+    if not isinstance(series.dtype, pd.CategoricalDtype) and not categories.is_monotonic_increasing:
+        # Mixed types could not be ordered, rank their text instead
+        codes, categories = column_codes(series.astype(str))
+    return np.where(codes < 0, len(categories), codes), len(categories)
+
+
+class RowPager:
+    """Sorted pages of row selections of one dataframe, addressed by row positions
+
+    Sort keys and full argsorts are computed once per column; the ordering of a
+    selection is cached under its key so page flips only slice row ids and
+    gather the rows of one page.
+    """
+
+    def __init__(self, df, max_selections=SELECTION_CACHE_ENTRIES):
+        self.df = df
+        self.max_selections = max_selections
+        self._keys = {}
+        self._orders = {}
+        self._selections = OrderedDict()
+        self._lock = threading.Lock()
+
+    def keys(self, col, ascending=True):
+        """Sort keys of a column in one direction, missing values staying last"""
+        if col not in self._keys:
+            self._keys[col] = sort_keys(self.df[col])
+        ranks, n_values = self._keys[col]
+        return ranks if ascending else np.where(ranks < n_values, n_values - 1 - ranks, ranks)
+
+    def order(self, col, ascending=True):
+        """Row positions of the whole frame sorted on a column (stable)"""
+        if (col, ascending) not in self._orders:
+            self._orders[col, ascending] = np.argsort(self.keys(col, ascending), kind='stable')
+        return self._orders[col, ascending]
+
+    def _cached(self, key, compute):
+        with self._lock:
+            if key in self._selections:
+                self._selections.move_to_end(key)
+                return self._selections[key]
+        value = compute()
+        with self._lock:
+            self._selections[key] = value
+            while len(self._selections) > self.max_selections:
+                self._selections.popitem(last=False)
+        return value
+
+    def rows(self, selection, compute):
+        """Sorted row positions of a selection, cached under its key"""
+        return self._cached(('rows', selection), compute)
+
+    def _top_rows(self, rows, col, ascending, k):
+        """First k rows of a selection in sort order, by partial sort"""
+        # Ties are broken by position so the prefix matches the full stable sort
+        keys = self.keys(col, ascending)[rows].astype(np.int64) * len(rows) + np.arange(len(rows))
+        top = np.argpartition(keys, k - 1)[:k] if k < len(rows) else np.arange(len(rows))
+        return rows[top[np.argsort(keys[top])]]
+
+    def _sorted_rows(self, rows, col, ascending):
+        """Whole selection in sort order, filtered out of the cached full argsort"""
+        order = self.order(col, ascending)
+        if len(rows) == len(self.df):
+            return order
+        member = np.zeros(len(self.df), dtype=bool)
+        member[rows] = True
+        return order[member[order]]
+
+    def page(self, selection, rows, start, stop, sort_col=None, ascending=True):
+        """Row positions start:stop of a selection, sorted on a column if given
+
+        `rows` are the sorted positions of the selection, None meaning every row.
+        """
+        n_rows = len(self.df) if rows is None else len(rows)
+        stop = min(stop, n_rows)
+        if start >= stop:
+            return np.empty(0, dtype=np.int64)
+        if sort_col is None:
+            return np.arange(start, stop) if rows is None else rows[start:stop]
+
+        rows = np.arange(n_rows) if rows is None else rows
+        if stop <= TOPK_ROWS:
+            ordered = self._cached(('top', selection, sort_col, ascending),
+                                   lambda: self._top_rows(rows, sort_col, ascending, min(TOPK_ROWS, n_rows)))
+        else:
+            ordered = self._cached(('sorted', selection, sort_col, ascending),
+                                   lambda: self._sorted_rows(rows, sort_col, ascending))
+        return ordered[start:stop]
+
+    def take(self, positions, columns=None):
+        """Materialize only some rows, and optionally some columns"""
+        frame = self.df.take(positions)
+        return frame if columns is None else frame[columns]
@@ -0,0 +1,143 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from pages.ressources.flow_cube import column_codes
+
+
+# Values are indexed on their first SEARCH_WIDTH UTF-8 bytes, longer ones are always verified
+SEARCH_NGRAM = 3
+SEARCH_WIDTH = 64
+SEARCH_CHUNK = 65536
+SEARCH_MODES = {'Contains': 'contains', 'Starts with': 'prefix'}
+
+
+def searchable_columns(df):
+    """Return the text, categorical and IP columns of a dataframe"""
+    return df.select_dtypes(include=['object', 'category', 'string']).columns.tolist()
+
+
+def _ngram_keys(matrix):
+    """Pack each run of SEARCH_NGRAM bytes of a byte matrix into one integer"""
+    keys = np.zeros((matrix.shape[0], matrix.shape[1] - SEARCH_NGRAM + 1), dtype=np.uint32)
+    for offset in range(SEARCH_NGRAM):
+        keys = (keys << 8) | matrix[:, offset:offset + keys.shape[1]]
+    return keys
+
+
+def _ngram_pairs(encoded, lengths, first_id):
+    """Return (n-gram << 32 | value id) for a block of UTF-8 encoded values"""
+    width = int(min(SEARCH_WIDTH, max(lengths.max(initial=0), SEARCH_NGRAM)))
+    matrix = np.frombuffer(np.array(encoded.tolist(), dtype=f'S{width}').tobytes(), dtype=np.uint8)
+    keys = _ngram_keys(matrix.reshape(len(encoded), width).astype(np.uint32))
+    present = np.arange(keys.shape[1]) <= (np.minimum(lengths, width) - SEARCH_NGRAM)[:, None]
+    value_ids = np.broadcast_to(np.arange(first_id, first_id + len(encoded), dtype=np.int64)[:, None], keys.shape)
+    return (keys[present].astype(np.int64) << 32) | value_ids[present]
+
+
+def _ranges(starts, ends):
+    """Concatenate the integer ranges [start, end) without a Python loop"""
+    lengths = ends - starts
+    shifts = np.repeat(starts - np.concatenate([[0], np.cumsum(lengths)[:-1]]), lengths)
+    return shifts + np.arange(lengths.sum())
+
+
+class ColumnIndex:
+    """N-gram postings over the distinct values of a column and row postings per value"""
+
+    def __init__(self, series):
+        codes, values = column_codes(series)
+        self.values = pd.Index(values).astype(str).str.lower().to_numpy(dtype=object)
+        n_values = len(self.values)
+
+        # Row postings: rows sorted by value code, missing values (-1) first
+        row_dtype = np.int32 if len(codes) < 2 ** 31 else np.int64
+        self.row_order = np.argsort(codes, kind='stable').astype(row_dtype)
+        counts = np.bincount(codes[codes >= 0], minlength=n_values)
+        self.row_offsets = np.concatenate([[0], np.cumsum(counts)]) + np.count_nonzero(codes < 0)
+
+        # Prefix lookups: binary search in the sorted distinct values
+        self.sorted_order = np.argsort(self.values, kind='stable')
+        self.sorted_values = self.values[self.sorted_order]
+
+        # N-gram postings: value ids sorted by packed n-gram
+        encoded = pd.Series(self.values, dtype=object).str.encode('utf-8')
+        lengths = encoded.str.len().to_numpy()
+        pairs = np.unique(np.concatenate([np.empty(0, dtype=np.int64)] + [
+            _ngram_pairs(encoded.iloc[start:start + SEARCH_CHUNK], lengths[start:start + SEARCH_CHUNK], start)
+            for start in range(0, n_values, SEARCH_CHUNK)
+        ]))
+        self.gram_keys, gram_starts = np.unique(pairs >> 32, return_index=True)
+        self.gram_offsets = np.append(gram_starts, len(pairs))
+        self.gram_values = pairs & 0xFFFFFFFF
+        self.long_values = np.flatnonzero(lengths > SEARCH_WIDTH)
+
+    def _candidates(self, term):
+        """Value ids holding every n-gram of the term"""
+        raw = term.encode('utf-8')
+        if len(raw) < SEARCH_NGRAM:
+            return np.arange(len(self.values))
+        matrix = np.frombuffer(raw, dtype=np.uint8)[None, :].astype(np.uint32)
+        candidates = None
+        for key in np.unique(_ngram_keys(matrix)):
+            i = np.searchsorted(self.gram_keys, key)
+            if i == len(self.gram_keys) or self.gram_keys[i] != key:
+                candidates = np.empty(0, dtype=np.int64)
+                break
+            posting = self.gram_values[self.gram_offsets[i]:self.gram_offsets[i + 1]]
+            candidates = posting if candidates is None else np.intersect1d(candidates, posting, assume_unique=True)
+        return np.union1d(candidates, self.long_values)
+
+    def match_values(self, term, mode='contains'):
+        """Ids of the distinct values matching a case-insensitive substring or prefix"""
+        term = term.lower()
+        if mode == 'prefix':
+            lo = np.searchsorted(self.sorted_values, term, side='left')
+            hi = np.searchsorted(self.sorted_values, term + '\U0010ffff', side='left')
+            return np.sort(self.sorted_order[lo:hi])
+        candidates = self._candidates(term)
+        # N-grams only narrow the candidates, the substring test confirms them
+        hits = pd.Series(self.values[candidates], dtype=object).str.contains(term, regex=False).to_numpy()
+        return candidates[hits]
+
+    def rows(self, value_ids):
+        """Row positions holding any of the given values"""
+        return self.row_order[_ranges(self.row_offsets[value_ids], self.row_offsets[value_ids + 1])]
+
+
+class SearchIndex:
+    """Inverted index over the text and IP columns of a dataset, built in a background thread"""
+
+    def __init__(self, df):
+        self.columns = searchable_columns(df)
+        self.n_rows = len(df)
+        self.column_indexes = {}
+        self.error = None
+        self._frame = df[self.columns]
+        self._thread = threading.Thread(target=self._run, name='search-index', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    @property
+    def ready(self):
+        return len(self.column_indexes) == len(self.columns) or self.error is not None
+
+    def _run(self):
+        try:
+            for col in self.columns:
+                self.column_indexes[col] = ColumnIndex(self._frame[col])
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            self._frame = None
+
+    def search(self, term, columns, mode='contains'):
+        """Sorted row positions where any of the (indexed) columns matches the term"""
+        hit = np.zeros(self.n_rows, dtype=bool)
+        for col in columns:
+            column_index = self.column_indexes[col]
+            hit[column_index.rows(column_index.match_values(term, mode))] = True
+        return np.flatnonzero(hit)
@@ -0,0 +1,110 @@
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+from pages.ressources.activity_cube import week_slots
+
+
+# Persisted profiles, one .npz per file contents, timestamp column, bucket width and season
+BASELINE_DIR = os.environ.get(
+    "OOPSISE_BASELINE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "data", "baselines")
+)
+_MINUTE_NS = 60 * 10**9
+_DAY_NS = 1440 * _MINUTE_NS
+# Seasons of the profile: number of slots and slot of int64 nanosecond timestamps
+SEASONS = {
+    'Hour of week': (7 * 24, lambda values: week_slots(values) // 4),
+    'Minute of day': (1440, lambda values: (values % _DAY_NS) // _MINUTE_NS),
+}
+# Scales a median absolute deviation to a normal standard deviation
+MAD_SCALE = 1.4826
+
+
+def content_digest(data):
+    """Hash of a file's bytes, identifying its persisted profiles across sessions"""
+    return hashlib.sha1(data).hexdigest()
+
+
+def _group_medians(slots, values, n_slots):
+    """Median of values per slot (NaN for empty slots), from one lexsort"""
+    order = np.lexsort((values, slots))
+    slots, values = slots[order], values[order]
+    starts = np.searchsorted(slots, np.arange(n_slots), side='left')
+    sizes = np.bincount(slots, minlength=n_slots)
+    medians = np.full(n_slots, np.nan)
+    filled = sizes > 0
+    lo = starts[filled] + (sizes[filled] - 1) // 2
+    hi = starts[filled] + sizes[filled] // 2
+    medians[filled] = (values[lo] + values[hi]) / 2
+    return medians, sizes
+
+
+def _timestamp_values(times):
+    times = pd.to_datetime(pd.Series(times))
+    if times.dt.tz is not None:
+        times = times.dt.tz_localize(None)
+    return times.to_numpy(dtype='datetime64[ns]').view(np.int64)
+
+
+class SeasonalProfile:
+    """Median and MAD of bucket counts per slot of a season (hour of week, minute of day)
+
+    Fitting is one sort of the history; scoring a window is a slot lookup and
+    a subtraction. Slots without history fall back to the profile of all
+    buckets.
+    """
+
+    def __init__(self, season, median, mad, history):
+        self.season = season
+        self.median = median
+        self.mad = mad
+        self.history = history
+
+    @classmethod
+    def fit(cls, times, counts, season='Hour of week'):
+        n_slots, slot_of = SEASONS[season]
+        counts = np.asarray(counts, dtype=np.float64)
+        slots = slot_of(_timestamp_values(times))
+        median, history = _group_medians(slots, counts, n_slots)
+        mad, _ = _group_medians(slots, np.abs(counts - median[slots]), n_slots)
+
+        empty = history == 0
+        if empty.any() and len(counts):
+            overall = np.median(counts)
+            median[empty] = overall
+            mad[empty] = np.median(np.abs(counts - overall))
+        return cls(season, median, mad, history)
+
+    def score(self, times, counts, multiplier=3.0):
+        """Expected count, channel, robust z-score and anomaly flag of each bucket"""
+        counts = np.asarray(counts, dtype=np.float64)
+        slots = SEASONS[self.season][1](_timestamp_values(times))
+        expected = self.median[slots]
+        # A slot whose history never varied still has Poisson noise
+        spread = np.maximum(self.mad[slots] * MAD_SCALE, np.sqrt(np.maximum(expected, 1.0)))
+        score = (counts - expected) / spread
+        return pd.DataFrame({
+            'expected': expected,
+            'upper_band': expected + multiplier * spread,
+            'lower_band': np.maximum(expected - multiplier * spread, 0.0),
+            'score': score,
+            'anomaly': np.abs(score) > multiplier,
+        })
+
+    @staticmethod
+    def path(key):
+        """File of the profile persisted for a key (file contents digest, column, bucket width, season)"""
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()[:20]
+        return os.path.join(BASELINE_DIR, f"{digest}.npz")
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        np.savez(path, season=self.season, median=self.median, mad=self.mad, history=self.history)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(str(data['season']), data['median'], data['mad'], data['history'])
@@ -0,0 +1,106 @@
+import json
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+
+class EmaChannelDetector:
+    """EMA with a rolling standard-deviation channel, updated one bucket at a time
+
+    Matches ewm(span, adjust=False) and rolling(window).std() of a whole
+    series, but keeps only the EMA, the last `window` values and their
+    Welford mean / sum of squares, so every update costs O(1). The state
+    serializes to JSON to resume on a live feed after a restart.
+    """
+
+    def __init__(self, span, std_multiplier=2.0, window=None):
+        self.span = int(span)
+        self.window = int(window or span)
+        self.std_multiplier = float(std_multiplier)
+        self.alpha = 2.0 / (self.span + 1)
+        self.ema = None
+        self.values = deque(maxlen=self.window)
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.updates = 0
+        self.last_timestamp = None
+
+    def _slide(self, value):
+        """Welford update of the window mean and sum of squares, dropping the oldest value when full"""
+        if len(self.values) == self.window:
+            old = self.values[0]
+            n = len(self.values) - 1
+            if n:
+                delta = old - self.mean
+                self.mean -= delta / n
+                self.m2 -= delta * (old - self.mean)
+            else:
+                self.mean, self.m2 = 0.0, 0.0
+        self.values.append(value)
+        n = len(self.values)
+        delta = value - self.mean
+        self.mean += delta / n
+        self.m2 = max(self.m2 + delta * (value - self.mean), 0.0)
+
+    @property
+    def std(self):
+        """Sample standard deviation of the window, NaN until it is full"""
+        if len(self.values) < max(self.window, 2):
+            return np.nan
+        return float(np.sqrt(self.m2 / (self.window - 1)))
+
+    def update(self, value, timestamp=None):
+        """Ingest one bucket, returning its EMA, channel and anomaly flag"""
+        value = float(value)
+        self.ema = value if self.ema is None else self.alpha * value + (1 - self.alpha) * self.ema
+        self._slide(value)
+        self.updates += 1
+        if timestamp is not None:
+            self.last_timestamp = pd.Timestamp(timestamp)
+
+        std = self.std
+        upper = self.ema + std * self.std_multiplier
+        lower = max(self.ema - std * self.std_multiplier, 0.0) if not np.isnan(std) else np.nan
+        return {'count': value, 'ema': self.ema, 'upper_band': upper, 'lower_band': lower,
+                'anomaly': bool(value > upper or value < lower)}
+
+    def update_many(self, values, timestamps=None):
+        """Ingest a batch of buckets, one row per bucket"""
+        timestamps = [None] * len(values) if timestamps is None else list(timestamps)
+        rows = [self.update(value, timestamp) for value, timestamp in zip(values, timestamps)]
+        frame = pd.DataFrame(rows, columns=['count', 'ema', 'upper_band', 'lower_band', 'anomaly'])
+        if any(timestamp is not None for timestamp in timestamps):
+            frame.insert(0, 'timestamp', pd.to_datetime(timestamps))
+        return frame
+
+    def to_dict(self):
+        return {
+            'span': self.span,
+            'window': self.window,
+            'std_multiplier': self.std_multiplier,
+            'ema': self.ema,
+            'values': list(self.values),
+            'mean': self.mean,
+            'm2': self.m2,
+            'updates': self.updates,
+            'last_timestamp': None if self.last_timestamp is None else self.last_timestamp.isoformat(),
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        detector = cls(state['span'], state['std_multiplier'], state['window'])
+        detector.ema = state['ema']
+        detector.values.extend(state['values'])
+        detector.mean = state['mean']
+        detector.m2 = state['m2']
+        detector.updates = state['updates']
+        detector.last_timestamp = None if state['last_timestamp'] is None else pd.Timestamp(state['last_timestamp'])
+        return detector
+
+    def to_json(self):
+        return json.dumps(self.to_dict())
+
+    @classmethod
+    def from_json(cls, text):
+        return cls.from_dict(json.loads(text))
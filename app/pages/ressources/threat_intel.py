@@ -0,0 +1,182 @@
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+
+from pages.ressources.ip_utils import UINT64_MAX, is_ipv4, lookup_ip, parse_ip, prefix_mask
+
+
+# Local threat-intel feeds: one CIDR or address per line, '#' and ';' start comments
+INTEL_DIR = os.environ.get(
+    "OOPSISE_INTEL_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "data", "intel")
+)
+INTEL_EXTENSIONS = ("*.txt", "*.netset", "*.ipset", "*.csv", "*.list")
+
+
+def parse_cidrs(entries):
+    """Parse CIDR strings into inclusive 128-bit (start_hi, start_lo, end_hi, end_lo) arrays"""
+    entries = pd.Series(entries, dtype=object).dropna().astype(str).str.strip()
+    parts = entries.str.split('/', n=1, expand=True).reindex(columns=[0, 1]).astype(object)
+    hi, lo, valid = parse_ip(parts[0])
+
+    # No '/' means a single address, anything after a '/' must be a plain decimal prefix;
+    # IPv4 prefixes are shifted into the mapped block
+    v4 = is_ipv4(hi, lo)
+    has_prefix = parts[1].notna().to_numpy()
+    digits = parts[1].fillna('').str.fullmatch(r'[0-9]{1,3}').to_numpy(dtype=bool)
+    prefix = np.where(digits, pd.to_numeric(parts[1].where(digits), errors='coerce'), np.where(v4, 32, 128))
+    valid &= (digits | ~has_prefix) & (prefix >= 0) & (prefix <= np.where(v4, 32, 128))
+    prefix = np.where(v4, prefix + 96, prefix).astype(np.int64)
+
+    start_hi, start_lo = prefix_mask(hi, lo, prefix)
+    mask_hi, mask_lo = prefix_mask(np.full(len(hi), UINT64_MAX), np.full(len(lo), UINT64_MAX), prefix)
+    end_hi, end_lo = start_hi | ~mask_hi, start_lo | ~mask_lo
+    return start_hi[valid], start_lo[valid], end_hi[valid], end_lo[valid]
+
+
+def read_intel_file(path):
+    """Read the first token of each non-comment line of a feed file"""
+    with open(path, encoding="utf-8", errors="replace") as handle:
+        lines = pd.Series(handle.read().splitlines(), dtype=object)
+    lines = lines.str.split(r'[#;]', n=1, regex=True).str[0].str.strip()
+    lines = lines[lines != '']
+    # CSV feeds carry the network in their first column
+    return lines.str.split(r'[\s,]', n=1, regex=True).str[0]
+
+
+def _merge_intervals(starts, ends):
+    """Sort and merge overlapping or adjacent 1-D intervals"""
+    if len(starts) == 0:
+        return starts, ends
+    order = np.argsort(starts, kind='stable')
+    starts, ends = starts[order], ends[order]
+    reach = np.maximum.accumulate(ends)
+    # A new block starts when an interval begins after everything before it (+1 for adjacency)
+    new_block = np.ones(len(starts), dtype=bool)
+    new_block[1:] = starts[1:] > reach[:-1] + 1
+    block = np.cumsum(new_block) - 1
+    merged_starts = starts[new_block]
+    merged_ends = np.zeros(len(merged_starts), dtype=ends.dtype)
+    np.maximum.at(merged_ends, block, ends)
+    return merged_starts, merged_ends
+
+
+def _split_128(values):
+    """Split Python ints into (hi, lo) uint64 arrays"""
+    return (np.array([v >> 64 for v in values], dtype=np.uint64),
+            np.array([v & 0xFFFFFFFFFFFFFFFF for v in values], dtype=np.uint64))
+
+
+class IntelMatcher:
+    """Merged, sorted interval arrays for one threat-intel feed"""
+
+    def __init__(self, name, cidrs):
+        self.name = name
+        start_hi, start_lo, end_hi, end_lo = parse_cidrs(cidrs)
+        self.entries = len(start_hi)
+
+        # IPv4 ranges fit in the low half of the mapped block: plain uint64 intervals
+        v4 = is_ipv4(start_hi, start_lo)
+        self.v4_starts, self.v4_ends = _merge_intervals(start_lo[v4], end_lo[v4])
+
+        # IPv6 ranges are merged on Python ints, feeds rarely hold many of them
+        starts = np.array([(int(h) << 64) | int(l) for h, l in zip(start_hi[~v4], start_lo[~v4])], dtype=object)
+        ends = np.array([(int(h) << 64) | int(l) for h, l in zip(end_hi[~v4], end_lo[~v4])], dtype=object)
+        starts, ends = _merge_intervals(starts, ends)
+        self.v6_start_hi, self.v6_start_lo = _split_128(starts)
+        self.v6_end_hi, self.v6_end_lo = _split_128(ends)
+
+    @classmethod
+    def from_file(cls, path, name=None):
+        return cls(name or os.path.splitext(os.path.basename(path))[0], read_intel_file(path))
+
+    @property
+    def ranges(self):
+        return len(self.v4_starts) + len(self.v6_start_hi)
+
+    def match(self, hi, lo):
+        """Return the mask of addresses inside any range of the feed"""
+        hi = np.asarray(hi, dtype=np.uint64)
+        lo = np.asarray(lo, dtype=np.uint64)
+        hits = np.zeros(len(hi), dtype=bool)
+
+        v4 = is_ipv4(hi, lo)
+        all_v4 = v4.all()
+        if len(self.v4_starts):
+            query = lo if all_v4 else lo[v4]
+            idx = np.searchsorted(self.v4_starts, query, side='right') - 1
+            inside = (idx >= 0) & (query <= self.v4_ends[np.maximum(idx, 0)])
+            if all_v4:
+                return inside
+            hits[v4] = inside
+
+        if len(self.v6_start_hi) and not all_v4:
+            q_hi, q_lo = hi[~v4], lo[~v4]
+            # 128-bit searchsorted: sort queries together with the range starts,
+            # the running count of starts gives the candidate range of each query
+            n_ranges = len(self.v6_start_hi)
+            all_hi = np.concatenate([self.v6_start_hi, q_hi])
+            all_lo = np.concatenate([self.v6_start_lo, q_lo])
+            is_start = np.concatenate([np.ones(n_ranges, dtype=np.int8), np.zeros(len(q_hi), dtype=np.int8)])
+            order = np.lexsort((-is_start, all_lo, all_hi))
+            seen = np.cumsum(is_start[order])
+            idx = np.empty(len(all_hi), dtype=np.int64)
+            idx[order] = seen - 1
+            idx = idx[n_ranges:]
+            safe = np.maximum(idx, 0)
+            end_hi, end_lo = self.v6_end_hi[safe], self.v6_end_lo[safe]
+            inside = (q_hi < end_hi) | ((q_hi == end_hi) & (q_lo <= end_lo))
+            hits[~v4] = (idx >= 0) & inside
+        return hits
+
+
+def list_intel_files(directory=INTEL_DIR):
+    """Return the feed files found in the intel directory"""
+    files = []
+    for pattern in INTEL_EXTENSIONS:
+        files.extend(glob.glob(os.path.join(directory, pattern)))
+    return sorted(files)
+
+
+def intel_signature(directory=INTEL_DIR):
+    """Return a cache key that changes when a feed file is added, removed or edited"""
+    return tuple((path, os.path.getmtime(path), os.path.getsize(path)) for path in list_intel_files(directory))
+
+
+def feed_names(paths):
+    """Feed name of each file: its stem, or its full file name when another feed shares the stem"""
+    stems = [os.path.splitext(os.path.basename(path))[0] for path in paths]
+    return [stem if stems.count(stem) == 1 else os.path.basename(path) for path, stem in zip(paths, stems)]
+
+
+def load_intel_matchers(directory=INTEL_DIR):
+    """Build one matcher per feed file"""
+    paths = list_intel_files(directory)
+    return [IntelMatcher.from_file(path, name) for path, name in zip(paths, feed_names(paths))]
+
+
+def tag_intel_hits(df, matchers, ip_col='src_ip'):
+    """Add intel_hit / intel_feed columns, matching only the distinct addresses of ip_col"""
+    if not matchers or ip_col not in df.columns:
+        return df
+    series = df[ip_col]
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes = series.cat.codes.to_numpy()
+        uniques = series.cat.categories
+    else:
+        codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    hi, lo, valid = lookup_ip(uniques)
+
+    # First matching feed wins, -1 means no hit
+    feed = np.full(len(uniques) + 1, -1, dtype=np.int16)
+    for i, matcher in enumerate(matchers):
+        hits = matcher.match(hi, lo) & valid
+        feed[:-1][(feed[:-1] < 0) & hits] = i
+    row_feed = feed[codes]
+
+    df['intel_hit'] = row_feed >= 0
+    df['intel_feed'] = pd.Categorical.from_codes(row_feed, categories=[m.name for m in matchers])
+    return df
+
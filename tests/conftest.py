@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The dashboard imports its helpers as pages.ressources.*, relative to app/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app'))
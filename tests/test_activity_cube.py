@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+from pages.ressources.activity_cube import ActivityCube
+
+
+def frame(n=30_000, seed=0):
+    rng = np.random.default_rng(seed)
+    times = pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 21 * 86_400, n), unit='s')
+    df = pd.DataFrame({'timestamp': times, 'proto': rng.choice(['TCP', 'UDP', 'ICMP'], n)})
+    df.loc[::29, 'timestamp'] = pd.NaT
+    return df
+
+
+def cube_of(df, groups=None):
+    values = df['timestamp'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+    order = np.argsort(values, kind='stable')
+    return ActivityCube(order, values[order], groups)
+
+
+def reference(df, slots_per_day=24):
+    """7 x slots_per_day counts by weekday and time of day"""
+    times = df['timestamp'].dropna()
+    slot = times.dt.hour * slots_per_day // 24 + (times.dt.minute // (1440 // slots_per_day) if slots_per_day > 24 else 0)
+    matrix = np.zeros((7, slots_per_day), dtype=np.int64)
+    np.add.at(matrix, (times.dt.dayofweek.to_numpy(), slot.to_numpy()), 1)
+    return matrix
+
+
+def test_window_matches_weekday_hour_counts():
+    df = frame()
+    cube = cube_of(df)
+    assert (ActivityCube.heatmap(cube.window()[0], 24) == reference(df)).all()
+    assert (ActivityCube.heatmap(cube.window()[0], 96) == reference(df, 96)).all()
+    start, end = pd.Timestamp('2024-01-03 07:31:10'), pd.Timestamp('2024-01-15 22:02:00')
+    rows = df[(df['timestamp'] >= start) & (df['timestamp'] <= end)]
+    assert (ActivityCube.heatmap(cube.window(start, end)[0], 24) == reference(rows)).all()
+
+
+def test_groups_and_selections():
+    df = frame()
+    cube = cube_of(df, df['proto'])
+    counts = cube.selection(np.flatnonzero(df['proto'] != 'ICMP'))
+    for i, group in enumerate(cube.groups):
+        expected = reference(df[df['proto'] == group]) if group != 'ICMP' else np.zeros((7, 24))
+        assert (ActivityCube.heatmap(counts[i], 24) == expected).all()
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pages.ressources.bitmap_cache import (
+    BitmapCache, bitmap_and, bitmap_count, bitmap_not, bitmap_or, pack, rows_to_bitmap, unpack,
+)
+
+
+@pytest.mark.parametrize('n_rows', [1, 7, 8, 9, 1001])
+def test_bitmap_operations_match_boolean_masks(n_rows):
+    rng = np.random.default_rng(n_rows)
+    a, b = rng.random(n_rows) < 0.5, rng.random(n_rows) < 0.3
+    assert (unpack(pack(a), n_rows) == a).all()
+    assert (unpack(bitmap_and(pack(a), pack(b)), n_rows) == (a & b)).all()
+    assert (unpack(bitmap_or(pack(a), pack(b)), n_rows) == (a | b)).all()
+    assert (unpack(bitmap_not(pack(a), n_rows), n_rows) == ~a).all()
+    # The padding bits stay clear, so counts only see real rows
+    assert bitmap_count(bitmap_not(pack(a), n_rows)) == (~a).sum()
+    assert (unpack(rows_to_bitmap(np.flatnonzero(b), n_rows), n_rows) == b).all()
+
+
+def test_cache_computes_once_and_evicts_least_recently_used():
+    cache = BitmapCache(64, max_bytes=16)
+    calls = []
+
+    def compute(i):
+        calls.append(i)
+        return np.arange(64) % (i + 2) == 0
+
+    for key in (0, 1, 0, 2):
+        cache.get(key, lambda key=key: compute(key))
+    assert calls == [0, 1, 2]
+    # 8 bytes per bitmap: key 1 was the least recently used
+    cache.get(1, lambda: compute(1))
+    assert calls == [0, 1, 2, 1]
+    assert cache.nbytes <= 16
+
+
+def test_view_gathers_the_rows():
+    df = pd.DataFrame({'x': np.arange(20)}, index=np.arange(20) * 10)
+    cache = BitmapCache(len(df))
+    bits = cache.get('even', lambda: df['x'].to_numpy() % 2 == 0)
+    pd.testing.assert_frame_equal(cache.view(df, bits), df[df['x'] % 2 == 0])
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pages.ressources.bucket_series import BucketSeries
+
+
+def times(seed=0):
+    rng = np.random.default_rng(seed)
+    stamps = pd.Timestamp('2024-01-01 00:03:17') + pd.to_timedelta(rng.integers(0, 2 * 86_400, 20_000), unit='s')
+    return pd.Series(stamps).where(rng.random(20_000) > 0.01)
+
+
+@pytest.mark.parametrize('tz', [None, 'Europe/Paris'])
+def test_every_width_matches_floor_counts(tz):
+    series = times()
+    if tz:
+        series = series.dt.tz_localize('UTC').dt.tz_convert(tz)
+    buckets = BucketSeries(series)
+    naive = series.dt.tz_localize(None) if tz else series
+    for freq in buckets.freqs:
+        counts = buckets.at(freq)
+        expected = naive.dropna().dt.floor(freq).value_counts()
+        assert counts.sum() == naive.notna().sum()
+        assert counts[counts > 0].to_dict() == expected.to_dict()
+        # Every bucket of the span is present, empty ones included
+        assert (np.diff(counts.index.asi8) == pd.Timedelta(freq).value).all()
+
+
+def test_finest_width_respects_the_point_budget():
+    buckets = BucketSeries(times(), max_points=500)
+    assert len(buckets.counts) <= 500
+    assert len(buckets.at(buckets.auto_freq(50))) <= 50
+
+
+def test_bucket_budget_counts_epoch_aligned_buckets():
+    # 199.9 s apart but straddling 201 one-second boundaries
+    series = pd.Series(pd.to_datetime(['2024-01-01 00:00:00.5', '2024-01-01 00:03:20.4']))
+    buckets = BucketSeries(series, max_points=200)
+    assert len(buckets.counts) <= 200
+    freq = buckets.auto_freq(200)
+    assert freq != '1s'
+    assert len(buckets.at(freq)) <= 200
+    assert buckets.n_buckets('1s') == 201 and len(BucketSeries(series, max_points=201).at('1s')) == 201
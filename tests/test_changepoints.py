@@ -0,0 +1,82 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from pages.ressources.changepoints import binary_segmentation, change_points, cusum, noise_scale, pelt, segments_table
+
+
+def penalized_cost(values, points, penalty):
+    """Gaussian mean-shift cost of a segmentation of the noise-scaled series, plus a penalty per change"""
+    z = np.asarray(values, dtype=np.float64) / noise_scale(values)
+    bounds = [0, *points, len(z)]
+    return sum(((z[a:b] - z[a:b].mean()) ** 2).sum() for a, b in zip(bounds[:-1], bounds[1:])) + penalty * len(points)
+
+
+def brute_force(values, penalty, min_size):
+    """Cheapest segmentation over every admissible set of change points"""
+    n = len(values)
+    best = (penalized_cost(values, [], penalty), [])
+    positions = range(min_size, n - min_size + 1)
+    for k in range(1, n // min_size):
+        for points in itertools.combinations(positions, k):
+            if all(b - a >= min_size for a, b in zip((0, *points), (*points, n))):
+                best = min(best, (penalized_cost(values, list(points), penalty), list(points)))
+    return best
+
+
+@pytest.mark.parametrize('seed', range(6))
+def test_pelt_is_optimal_on_small_series(seed):
+    rng = np.random.default_rng(seed)
+    values = np.concatenate([rng.normal(level, 1.0, size) for level, size in
+                             zip(rng.choice([0, 3, 6], 4), rng.integers(3, 7, 4))])[:20]
+    penalty = 2 * np.log(len(values))
+    cost, _ = brute_force(values, penalty, 3)
+    points = pelt(values, penalty, min_size=3)
+    assert penalized_cost(values, points, penalty) == pytest.approx(cost, rel=1e-9)
+
+
+def test_pelt_finds_level_shifts():
+    rng = np.random.default_rng(0)
+    values = np.concatenate([rng.normal(20, 3, 300), rng.normal(80, 3, 200), rng.normal(30, 3, 300)])
+    assert pelt(values) == pytest.approx([300, 500], abs=2)
+    assert binary_segmentation(values) == pytest.approx([300, 500], abs=2)
+
+
+def test_binary_segmentation_is_never_better_than_pelt():
+    rng = np.random.default_rng(1)
+    values = np.repeat(rng.normal(0, 3, 12), 40) + rng.normal(0, 1, 480)
+    penalty = 2 * np.log(len(values))
+    exact = penalized_cost(values, pelt(values), penalty)
+    assert penalized_cost(values, binary_segmentation(values), penalty) >= exact - 1e-9
+
+
+def test_change_points_falls_back_on_long_series(monkeypatch):
+    import pages.ressources.changepoints as changepoints
+    monkeypatch.setattr(changepoints, 'PELT_MAX_POINTS', 50)
+    values = np.r_[np.zeros(60), np.full(60, 10.0)] + np.random.default_rng(2).normal(0, 1, 120)
+    assert change_points(values, 'PELT') == binary_segmentation(values)
+
+
+def test_cusum_matches_its_recursion_until_the_first_alarm():
+    rng = np.random.default_rng(3)
+    values = np.r_[rng.poisson(50, 400), rng.poisson(90, 100)].astype(float)
+    alarms = cusum(values)
+    assert alarms and alarms[0][2] == 1 and 400 <= alarms[0][0] < 420
+    # Reference loop S_t = max(0, S_t-1 + z_t - drift) on the first regime's level
+    sigma = max(noise_scale(values), np.sqrt(np.median(values[:64])))
+    s, first = 0.0, None
+    for t, value in enumerate(values):
+        s = max(0.0, s + (value - np.median(values[:64])) / sigma - 0.5)
+        if s > 8.0:
+            first = t
+            break
+    assert alarms[0][0] == first
+
+
+def test_segments_table_means():
+    values = np.r_[np.full(5, 1.0), np.full(5, 3.0)]
+    table = segments_table(np.arange(10), values, [5])
+    assert table['mean'].tolist() == [1.0, 3.0]
+    assert table['buckets'].tolist() == [5, 5]
+    assert table['change'].iloc[1] == pytest.approx(200.0)
@@ -0,0 +1,124 @@
+import numpy as np
+import pandas as pd
+
+from pages.ressources import components
+from pages.ressources.components import (GEO_COLUMNS, aggregate_flows, aggregate_geo, build_geo_table, hex_bin,
+                                         join_flow_geo, locate_ips, location_record)
+
+
+def record(ip, city, lat, lon):
+    return location_record(ip, {'city': city, 'country': 'Nowhere', 'lat': lat, 'lon': lon})
+
+
+def test_geo_table_keeps_one_located_row_per_ip():
+    locations = [record('8.8.8.8', 'Mountain View', 37.4, -122.1), record('8.8.8.8', 'Elsewhere', 1.0, 1.0),
+                 record('1.1.1.1', 'Sydney', None, 151.2), record('9.9.9.9', 'Zurich', '47.4', '8.5')]
+    geo = build_geo_table(locations)
+    assert list(geo.columns) == GEO_COLUMNS
+    assert geo['ip'].tolist() == ['8.8.8.8', '9.9.9.9']
+    assert geo['city'].tolist() == ['Mountain View', 'Zurich']
+    assert geo['latitude'].dtype == float and geo['longitude'].tolist() == [-122.1, 8.5]
+    assert build_geo_table([]).empty
+
+
+def test_flow_join_matches_a_per_flow_lookup():
+    src_geo = build_geo_table([record('8.8.8.8', 'A', 1.0, 2.0), record('1.1.1.1', 'B', 3.0, 4.0)])
+    dst_geo = build_geo_table([record('9.9.9.9', 'C', 5.0, 6.0), record('8.8.8.8', 'D', 7.0, 8.0)])
+    pair_counts = pd.DataFrame({'src_ip': ['8.8.8.8', '1.1.1.1', '8.8.8.8', '4.4.4.4', '1.1.1.1'],
+                                'dst_ip': ['9.9.9.9', '8.8.8.8', '8.8.8.8', '9.9.9.9', '5.5.5.5'],
+                                'count': [3, 7, 1, 9, 2]})
+    flows = join_flow_geo(pair_counts, src_geo, dst_geo)
+
+    src = src_geo.set_index('ip').to_dict('index')
+    dst = dst_geo.set_index('ip').to_dict('index')
+    expected = [(row.src_ip, row.dst_ip, row.count, src[row.src_ip]['latitude'], src[row.src_ip]['city'],
+                 dst[row.dst_ip]['longitude'], dst[row.dst_ip]['city'])
+                for row in pair_counts.itertuples() if row.src_ip in src and row.dst_ip in dst]
+    got = list(zip(flows['src_ip'], flows['dst_ip'], flows['count'], flows['src_lat'], flows['src_city'],
+                   flows['dst_lon'], flows['dst_city']))
+    assert sorted(got) == sorted(expected)
+    assert flows['count'].tolist() == [7, 3, 1]
+
+
+def test_locate_ips_keeps_the_lookups_that_answer(monkeypatch):
+    def fake_location(ip):
+        if ip == 'bad':
+            raise ValueError('unresolvable')
+        return None if ip.startswith('10.') else record(ip, 'X', 1.0, 1.0)
+
+    monkeypatch.setattr(components, 'get_ip_location', fake_location)
+    locations = locate_ips(['8.8.8.8', '10.0.0.1', 'bad', '1.1.1.1'], 'source')
+    assert [location['ip'] for location in locations] == ['8.8.8.8', '1.1.1.1']
+
+
+def hex_center(q, r, size):
+    """Lon/lat of the centre of an axial cell, the inverse of hex_bin's projection"""
+    return size * np.sqrt(3) * (q + r / 2), size * 1.5 * r
+
+
+def test_hex_bin_snaps_points_to_the_nearest_cell_centre():
+    rng = np.random.default_rng(3)
+    lon, lat = rng.uniform(-180, 180, 2000), rng.uniform(-80, 80, 2000)
+    q, r = hex_bin(lon, lat, size=2.0)
+    center_lon, center_lat = hex_center(q, r, 2.0)
+    distance = np.hypot(lon - center_lon, lat - center_lat)
+    # No neighbouring cell centre is closer than the assigned one
+    for dq, dr in [(1, 0), (-1, 0), (0, 1), (0, -1), (1, -1), (-1, 1)]:
+        other_lon, other_lat = hex_center(q + dq, r + dr, 2.0)
+        assert (distance <= np.hypot(lon - other_lon, lat - other_lat) + 1e-9).all()
+    assert (hex_bin(center_lon, center_lat, size=2.0)[0] == q).all()
+
+
+def sample_geo():
+    return pd.DataFrame({
+        'ip': ['1.1.1.1', '2.2.2.2', '3.3.3.3', '4.4.4.4', '5.5.5.5', '6.6.6.6'],
+        'city': ['Paris', 'Paris', None, 'Lyon', None, 'Berlin'],
+        'country': ['France', 'France', 'France', 'France', None, 'Germany'],
+        'latitude': [48.85, 48.86, 46.0, 45.76, 0.0, 52.52],
+        'longitude': [2.35, 2.34, 2.0, 4.84, 0.0, 13.40],
+        'events': [5, 7, 1, 3, 2, 4],
+    })
+
+
+def test_city_bins_match_a_groupby_and_label_unknown_places():
+    geo = sample_geo()
+    bins, bin_ids = aggregate_geo(geo, 'City')
+    keyed = geo.fillna({'city': 'Unknown', 'country': 'Unknown'})
+    expected = keyed.groupby(['country', 'city']).agg(ips=('ip', 'size'), events=('events', 'sum'),
+                                                      latitude=('latitude', 'mean'))
+    got = bins.set_index(['country', 'city']).sort_index()
+    assert got['ips'].tolist() == expected['ips'].tolist()
+    assert got['events'].tolist() == expected['events'].tolist()
+    assert np.allclose(got['latitude'], expected['latitude'])
+    # Every row points to the bin of its own place
+    row_bins = bins.loc[bin_ids]
+    assert (row_bins['city'].to_numpy() == keyed['city'].to_numpy()).all()
+    assert set(bins['label']) == {'Paris, France', 'Unknown, France', 'Lyon, France', 'Unknown, Unknown', 'Berlin, Germany'}
+    assert bins['events'].is_monotonic_decreasing
+
+
+def test_hex_bins_match_a_groupby_on_cells():
+    geo = sample_geo()
+    bins, bin_ids = aggregate_geo(geo, 'Hex grid')
+    q, r = hex_bin(geo['longitude'].to_numpy(), geo['latitude'].to_numpy())
+    expected = geo.assign(q=q, r=r).groupby(['q', 'r'])['events'].agg(['size', 'sum'])
+    assert sorted(zip(bins['ips'], bins['events'])) == sorted(zip(expected['size'], expected['sum']))
+    # Rows share a bin exactly when they share a cell
+    assert len(set(zip(q, r))) == len(set(bin_ids))
+    assert all(len({(q[i], r[i]) for i in np.flatnonzero(bin_ids == b)}) == 1 for b in set(bin_ids))
+    assert bins['label'].str.endswith(' area').all()
+    assert 'None' not in ' '.join(bins['label'])
+
+
+def test_flows_between_bins_sum_the_per_ip_counts():
+    geo = sample_geo()
+    flows = pd.DataFrame({'src_ip': ['1.1.1.1', '2.2.2.2', '4.4.4.4', '6.6.6.6', '1.1.1.1'],
+                          'dst_ip': ['6.6.6.6', '6.6.6.6', '1.1.1.1', '3.3.3.3', '4.4.4.4'],
+                          'count': [10, 5, 2, 1, 4]})
+    bins, bin_ids = aggregate_geo(geo, 'City')
+    pairs = aggregate_flows(flows, geo, bin_ids, bins, geo, bin_ids, bins)
+
+    place = dict(zip(geo['ip'], bins.loc[bin_ids, 'label']))
+    expected = flows.assign(src=flows['src_ip'].map(place), dst=flows['dst_ip'].map(place)).groupby(['src', 'dst'])['count'].sum()
+    assert dict(zip(zip(pairs['src_ip'], pairs['dst_ip']), pairs['count'])) == expected.to_dict()
+    assert pairs['count'].is_monotonic_decreasing
@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+
+from pages.ressources.crossfilter import Crossfilter, build_crossfilter, time_bucket_codes
+
+
+def frame(n=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'timestamp': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 3600, n), unit='s'),
+        'src_ip': rng.choice(['10.0.0.1', '10.0.1.7', '192.168.0.2', '8.8.8.8'], n),
+        'proto': rng.choice(['TCP', 'UDP', 'ICMP', None], n),
+        'dst_port': rng.choice([22, 53, 80, 443], n),
+    })
+    return df
+
+
+def reference_groups(df, cf, filters, name):
+    """Counts per value of name over the rows passing every other dimension's filter"""
+    keep = np.ones(len(df), dtype=bool)
+    for other, values in filters.items():
+        if other != name:
+            keep &= np.isin(cf.codes[other], values)
+    return np.bincount(cf.codes[name][keep], minlength=len(cf.labels[name]) + 1)[:-1]
+
+
+def test_group_counts_follow_the_other_filters():
+    df = frame()
+    cf = build_crossfilter(df, 'timestamp', 'src_ip', None)
+    assert cf.names == ['time', 'src', 'proto', 'dst_port']
+    rng = np.random.default_rng(1)
+    filters = {}
+    for _ in range(30):
+        name = cf.names[rng.integers(len(cf.names))]
+        if rng.random() < 0.2:
+            cf.filter(name, None)
+            filters.pop(name, None)
+        else:
+            values = np.flatnonzero(rng.random(len(cf.labels[name])) < 0.6)
+            cf.filter(name, values)
+            filters[name] = values
+        for dim in cf.names:
+            assert (cf.group(dim).to_numpy() == reference_groups(df, cf, filters, dim)).all()
+        expected = np.ones(len(df), dtype=bool)
+        for dim, values in filters.items():
+            expected &= np.isin(cf.codes[dim], values)
+        assert (cf.mask() == expected).all()
+        assert cf.passing == expected.sum()
+
+
+def test_labels_match_pandas_groupby():
+    df = frame()
+    cf = build_crossfilter(df, 'timestamp', 'src_ip', None)
+    cf.filter_labels('proto', ['TCP'])
+    expected = df[df['proto'] == 'TCP'].groupby('dst_port').size()
+    assert cf.group('dst_port').to_dict() == {str(k): v for k, v in expected.items()}
+    # The filtered dimension keeps its own counts
+    assert cf.group('proto').to_dict() == df['proto'].value_counts().to_dict()
+
+
+def test_time_buckets_match_floor():
+    times = frame()['timestamp']
+    codes, labels, step = time_bucket_codes(times, target=50)
+    assert len(labels) <= 50
+    assert (labels[codes] == times.dt.floor(step)).all()
+
+
+def test_filter_between_keeps_overlapping_buckets():
+    df = frame()
+    cf = build_crossfilter(df, 'timestamp', None, None)
+    step = cf.labels['time'][1] - cf.labels['time'][0]
+    start, end = pd.Timestamp('2024-01-01 00:10:30'), pd.Timestamp('2024-01-01 00:20:00')
+    cf.filter_between('time', start, end)
+    expected = (df['timestamp'] >= start.floor(step)) & (df['timestamp'] < end.floor(step) + step)
+    assert (cf.mask() == expected.to_numpy()).all()
+
+
+def test_missing_values_never_match_a_filter():
+    cf = Crossfilter({'a': (np.array([0, 1, -1, 1]), pd.Index(['x', 'y']))})
+    cf.filter('a', [0, 1])
+    assert cf.mask().tolist() == [True, True, False, True]
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import pages.ressources.crosstab as crosstab
+from pages.ressources.crosstab import CrosstabEngine
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(0)
+    n = 3000
+    return pd.DataFrame({
+        'proto': rng.choice(['TCP', 'UDP', 'ICMP'], n, p=[0.6, 0.3, 0.1]),
+        # Zipf-like ports so the top values are unambiguous
+        'dst_port': rng.choice(np.arange(40), n, p=np.r_[0.5 ** np.arange(1, 40), 0.5 ** 39]),
+        'len': rng.integers(40, 1500, n).astype(float),
+    })
+
+
+def test_unfolded_crosstab_matches_pandas(frame):
+    counts, sums = CrosstabEngine(frame).crosstab('proto', 'dst_port', top=(10, 100), value_col='len')
+    expected = pd.crosstab(frame['proto'], frame['dst_port'].astype(str))
+    expected_sums = pd.crosstab(frame['proto'], frame['dst_port'].astype(str), values=frame['len'], aggfunc='sum')
+    assert 'Other' not in counts.columns and 'Other' not in counts.index
+    pd.testing.assert_frame_equal(counts.loc[expected.index, expected.columns], expected, check_names=False, check_dtype=False)
+    pd.testing.assert_frame_equal(sums.loc[expected.index, expected.columns], expected_sums.fillna(0.0), check_names=False)
+
+
+@pytest.mark.parametrize('dense', [True, False])
+def test_folded_crosstab_keeps_top_values(frame, dense, monkeypatch):
+    if not dense:
+        monkeypatch.setattr(crosstab, 'CROSSTAB_DENSE_CELLS', 0)
+    rows = np.flatnonzero(frame['len'] > 500)
+    counts, _ = CrosstabEngine(frame).crosstab('proto', 'dst_port', rows=rows, top=(2, 5))
+    selection = frame.iloc[rows]
+    top_protos = selection['proto'].value_counts().index[:2]
+    top_ports = selection['dst_port'].value_counts().index[:5].astype(str)
+    assert list(counts.index) == list(top_protos) + ['Other']
+    assert list(counts.columns) == list(top_ports) + ['Other']
+    assert counts.to_numpy().sum() == len(rows)
+    for proto in top_protos:
+        for port in top_ports:
+            assert counts.loc[proto, port] == ((selection['proto'] == proto) & (selection['dst_port'].astype(str) == port)).sum()
+
+
+def test_empty_selection(frame):
+    counts, sums = CrosstabEngine(frame).crosstab('proto', 'dst_port', rows=np.array([], dtype=np.int64), value_col='len')
+    assert counts.empty and sums.empty
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pages.ressources.entity_detector import ema_std, rank_entities, time_buckets
+
+
+def test_ema_std_matches_pandas_per_row():
+    rng = np.random.default_rng(0)
+    counts = rng.poisson(rng.uniform(0, 1e4, (20, 1)), (20, 300)).astype(float)
+    ema, std = ema_std(counts, 7)
+    for row, row_ema, row_std in zip(counts, ema, std):
+        series = pd.Series(row)
+        np.testing.assert_allclose(row_ema, series.ewm(span=7, adjust=False).mean(), rtol=1e-12)
+        np.testing.assert_allclose(row_std, series.rolling(7).std(), rtol=1e-6, atol=1e-6)
+
+
+def test_time_buckets_match_floor():
+    times = pd.Series(pd.to_datetime(['2024-01-01 00:00:59', '2024-01-01 00:03:00', None, '2024-01-01 00:01:00']))
+    buckets, starts = time_buckets(times.to_numpy(dtype='datetime64[ns]').view(np.int64), pd.Timedelta('1min').value)
+    assert buckets.tolist() == [0, 3, -1, 1]
+    assert list(starts) == list(pd.date_range('2024-01-01', periods=4, freq='min'))
+
+
+def events(seed=0):
+    rng = np.random.default_rng(seed)
+    n_entities, n_buckets = 300, 120
+    codes = rng.integers(0, n_entities, 60_000)
+    buckets = rng.integers(0, n_buckets, 60_000)
+    # A few entities burst in one bucket
+    bursts = rng.choice(n_entities, 5, replace=False)
+    codes = np.concatenate([codes, np.repeat(bursts, 400), [-1, 3]])
+    buckets = np.concatenate([buckets, np.repeat(rng.integers(10, n_buckets, 5), 400), [4, -1]])
+    labels = np.array([f'e{i}' for i in range(n_entities)])
+    return codes, labels, buckets, pd.date_range('2024-01-01', periods=n_buckets, freq='min'), bursts
+
+
+def naive_scores(codes, labels, buckets, n_buckets, span, multiplier):
+    """Per-entity pandas reference: each bucket against the channel of the buckets before it"""
+    keep = (codes >= 0) & (buckets >= 0)
+    frame = pd.DataFrame({'entity': codes[keep], 'bucket': buckets[keep]})
+    result = {}
+    for entity, group in frame.groupby('entity'):
+        series = pd.Series(np.bincount(group['bucket'], minlength=n_buckets).astype(float))
+        expected = series.ewm(span=span, adjust=False).mean().shift()
+        spread = np.maximum(series.rolling(span).std().shift(), np.sqrt(expected.clip(lower=1.0)))
+        score = (series - expected) / spread
+        flagged = score.abs() > multiplier
+        if flagged.any():
+            excess = (series - expected - multiplier * spread).where(flagged & (score > 0), 0.0).sum()
+            result[labels[entity]] = (int(flagged.sum()), excess)
+    return result
+
+
+@pytest.mark.parametrize('block_cells', [1 << 21, 1000, 1])
+def test_rank_entities_matches_per_entity_pandas(block_cells):
+    codes, labels, buckets, bucket_times, bursts = events()
+    ranked = rank_entities(codes, labels, buckets, bucket_times, 5, 3.0, top=len(labels), block_cells=block_cells)
+    expected = naive_scores(codes, labels, buckets, len(bucket_times), 5, 3.0)
+    assert set(ranked['entity']) == set(expected)
+    for row in ranked.itertuples():
+        anomalies, excess = expected[row.entity]
+        assert row.anomalies == anomalies
+        assert row.excess == pytest.approx(excess, rel=1e-6, abs=1e-6)
+    assert set(ranked['entity'].head(5)) == set(labels[bursts])
+    assert (np.diff(ranked['excess'].to_numpy()) <= 0).all()
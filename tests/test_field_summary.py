@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pages.ressources.field_summary import FieldSummaries, summarize_columns
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(0)
+    n = 20_000
+    df = pd.DataFrame({
+        'len': rng.integers(40, 1500, n).astype(float),
+        'ttl': pd.array(rng.integers(1, 255, n), dtype='Int64'),
+        'score': rng.normal(1e6, 5, n),
+        'empty': np.full(n, np.nan),
+    })
+    df.loc[::7, 'len'] = np.nan
+    df.loc[::11, 'ttl'] = pd.NA
+    return df
+
+
+@pytest.mark.parametrize('block_rows', [65_536, 1000])
+def test_moments_match_pandas(frame, block_rows):
+    rows = np.flatnonzero(np.arange(len(frame)) % 3 != 0)
+    summary = summarize_columns(frame, frame.columns, rows, block_rows=block_rows)
+    selection = frame.iloc[rows].astype(float)
+    assert summary['count'].tolist() == selection.count().tolist()
+    assert summary['nulls'].tolist() == selection.isna().sum().tolist()
+    for field in ('min', 'max', 'mean', 'std'):
+        np.testing.assert_allclose(summary[field], getattr(selection, field)(), rtol=1e-9)
+    # Quartiles come from a sketch, they are close but not exact
+    for field, q in (('p25', 0.25), ('median', 0.5), ('p75', 0.75)):
+        expected = selection[['len', 'ttl']].quantile(q)
+        assert (abs(summary.loc[['len', 'ttl'], field] - expected) <= 0.01 * (selection[['len', 'ttl']].max() - selection[['len', 'ttl']].min())).all()
+
+
+def test_cached_columns_are_reused(frame, monkeypatch):
+    summaries = FieldSummaries(frame)
+    first = summaries.get('all', ['len'])
+    calls = []
+    import pages.ressources.field_summary as field_summary
+    original = field_summary.summarize_columns
+    monkeypatch.setattr(field_summary, 'summarize_columns', lambda df, cols, rows=None: calls.append(cols) or original(df, cols, rows))
+    both = summaries.get('all', ['len', 'ttl'])
+    assert calls == [['ttl']]
+    pd.testing.assert_series_equal(both.loc['len'], first.loc['len'])
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pages.ressources.flow_cube import FlowCube, fold_top
+
+
+@pytest.fixture
+def flows():
+    rng = np.random.default_rng(0)
+    n = 5000
+    return pd.DataFrame({
+        'src_ip': rng.choice(['10.0.0.1', '10.0.0.2', '10.0.1.9', '192.168.4.4', None], n),
+        'dst_ip': rng.choice(['8.8.8.8', '1.1.1.1', '10.0.0.254'], n),
+        'dst_port': rng.choice([22, 53, 443], n),
+        'proto': rng.choice(['TCP', 'UDP'], n),
+        'len': rng.integers(40, 1500, n),
+    })
+
+
+def test_cube_totals_match_groupby(flows):
+    cube = FlowCube(flows, 'src_ip', 'dst_ip', 'dst_port', 'proto', 'len')
+    assert cube.cells['count'].sum() == len(flows)
+    assert cube.cells['bytes'].sum() == flows['len'].sum()
+    assert cube.dst_totals.to_dict() == flows['dst_ip'].value_counts().to_dict()
+    assert cube.src_totals().to_dict() == flows['src_ip'].value_counts().to_dict()
+
+
+def test_src_port_counts_match_groupby(flows):
+    cube = FlowCube(flows, 'src_ip', 'dst_ip', 'dst_port', 'proto', 'len')
+    table = cube.src_port_counts('8.8.8.8').set_index(['src', 'port']).sort_index()
+    expected = (flows[flows['dst_ip'] == '8.8.8.8'].groupby(['src_ip', 'dst_port'])['len']
+                .agg(['size', 'sum']).sort_index())
+    assert table['count'].tolist() == expected['size'].tolist()
+    assert table['bytes'].tolist() == expected['sum'].tolist()
+    assert cube.src_port_counts('0.0.0.0').empty
+
+
+def test_subnet_rollup_of_sources(flows):
+    cube = FlowCube(flows, 'src_ip', 'dst_ip', 'dst_port')
+    totals = cube.src_totals('/24 · /64')
+    assert totals.to_dict() == {'10.0.0.0/24': flows['src_ip'].isin(['10.0.0.1', '10.0.0.2']).sum(),
+                                '192.168.4.0/24': (flows['src_ip'] == '192.168.4.4').sum(),
+                                '10.0.1.0/24': (flows['src_ip'] == '10.0.1.9').sum()}
+
+
+def test_fold_top_keeps_the_most_frequent():
+    codes = np.array([0, 0, 0, 1, 1, 2, -1])
+    folded, kept = fold_top(codes, pd.Index(['a', 'b', 'c']), 2)
+    assert list(kept) == ['a', 'b', 'Other']
+    assert folded.tolist() == [0, 0, 0, 1, 1, 2, 2]
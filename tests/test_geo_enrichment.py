@@ -0,0 +1,41 @@
+import pandas as pd
+
+from pages.ressources.geo_enrichment import enrichment_targets, lookup_batch
+
+
+def test_targets_are_public_addresses_most_frequent_first():
+    df = pd.DataFrame({
+        'src_ip': ['8.8.8.8', '8.8.8.8', '10.0.0.1', '1.1.1.1', 'host', None],
+        'dst_ip': ['1.1.1.1', '1.1.1.1', '127.0.0.1', '9.9.9.9', '2001:4860::8888', '::1'],
+    })
+    assert enrichment_targets(df, ['src_ip', 'dst_ip']) == ['1.1.1.1', '8.8.8.8', '2001:4860::8888', '9.9.9.9']
+    assert enrichment_targets(df, ['src_ip', 'dst_ip'], max_ips=1) == ['1.1.1.1']
+    assert enrichment_targets(df, []) == []
+
+
+class FakeResponse:
+    def __init__(self, status_code, payload, headers):
+        self.status_code, self.payload, self.headers = status_code, payload, headers
+
+    def json(self):
+        return self.payload
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeSession:
+    def __init__(self, response):
+        self.response = response
+
+    def post(self, *args, **kwargs):
+        return self.response
+
+
+def test_lookup_batch_keeps_successes_and_honours_throttling():
+    payload = [{'status': 'success', 'query': '8.8.8.8', 'city': 'Mountain View', 'lat': 37.4, 'lon': -122.1},
+               {'status': 'fail', 'query': '10.0.0.1', 'message': 'private range'}]
+    records, wait = lookup_batch(['8.8.8.8', '10.0.0.1'], FakeSession(FakeResponse(200, payload, {'X-Rl': '0', 'X-Ttl': '12'})))
+    assert [r['ip'] for r in records] == ['8.8.8.8'] and wait == 12.0
+    records, wait = lookup_batch(['8.8.8.8'], FakeSession(FakeResponse(429, [], {})))
+    assert records is None and wait >= 1.0
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pages.ressources.histogram_cube import HistogramCube, bin_codes
+
+
+def frame(n=20_000, seed=0):
+    rng = np.random.default_rng(seed)
+    times = pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 7 * 86_400, n), unit='s')
+    df = pd.DataFrame({'timestamp': times, 'len': rng.integers(40, 1500, n), 'ratio': rng.exponential(2.0, n)})
+    df.loc[::13, 'timestamp'] = pd.NaT
+    df.loc[::9, 'ratio'] = np.nan
+    return df
+
+
+def cube_of(df):
+    values = df['timestamp'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+    order = np.argsort(values, kind='stable')
+    return HistogramCube(df, ['len', 'ratio'], order, values[order])
+
+
+def reference(df, col, edges):
+    values = df[col].to_numpy(dtype=np.float64)
+    return np.bincount(bin_codes(values, edges), minlength=len(edges))[:-1]
+
+
+@pytest.mark.parametrize('col', ['len', 'ratio'])
+@pytest.mark.parametrize('scale', ['linear', 'log'])
+def test_window_histograms_match_the_rows(col, scale):
+    df = frame()
+    cube = cube_of(df)
+    edges, total = cube.histogram(col, scale)
+    assert (total == reference(df, col, edges)).all()
+    assert total.sum() == df[col].notna().sum()
+    for start, end in (('2024-01-02 03:17:05', '2024-01-05 18:00:59'), ('2024-01-03 10:00', '2024-01-03 10:05')):
+        _, counts = cube.histogram(col, scale, start, end)
+        rows = df[(df['timestamp'] >= start) & (df['timestamp'] <= end)]
+        assert (counts == reference(rows, col, edges)).all()
+
+
+def test_integer_fields_get_integer_aligned_bins():
+    edges, _ = cube_of(frame()).histogram('len')
+    assert (edges % 1 == 0.5).all()
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pages.ressources.holt_winters import HoltWinters, season_length
+
+
+def seasonal_counts(n=24 * 14, season=24, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(n)
+    return 100 + 0.05 * t + 30 * np.sin(2 * np.pi * t / season) + rng.normal(0, 3, n)
+
+
+def reference(values, season, alpha, beta, gamma):
+    """Plain additive Holt-Winters recursion, one-step forecasts from the third cycle on"""
+    first, second = values[:season].mean(), values[season:2 * season].mean()
+    level, trend = second, (second - first) / season
+    seasonals = list(values[season:2 * season] - second) if season > 1 else [0.0]
+    forecasts = [np.nan] * (2 * season)
+    for i, value in enumerate(values[2 * season:]):
+        phase = i % season
+        forecasts.append(level + trend + seasonals[phase])
+        new_level = alpha * (value - seasonals[phase]) + (1 - alpha) * (level + trend)
+        trend = beta * (new_level - level) + (1 - beta) * trend
+        seasonals[phase] = gamma * (value - new_level) + (1 - gamma) * seasonals[phase]
+        level = new_level
+    return np.array(forecasts)
+
+
+@pytest.mark.parametrize('season', [1, 24])
+def test_forecasts_match_the_recursion(season):
+    values = seasonal_counts()
+    expected, _ = HoltWinters(season, 0.3, 0.05, 0.2).ingest(values)
+    np.testing.assert_allclose(expected[:, 0], reference(values, season, 0.3, 0.05, 0.2 if season > 1 else 0.0))
+
+
+def test_incremental_updates_match_a_refit():
+    values = seasonal_counts()
+    model, fitted, _ = HoltWinters.fit(values[:200], 24)
+    params = model.alpha[0], model.beta[0], model.gamma[0]
+    # Resuming from JSON and ingesting the rest equals running the same constants over the whole history
+    resumed = HoltWinters.from_json(model.to_json())
+    later, later_spread = resumed.ingest(values[200:])
+    refit = HoltWinters(24, *params)
+    whole, whole_spread = refit.ingest(values)
+    np.testing.assert_allclose(np.r_[fitted, later[:, 0]], whole[:, 0])
+    np.testing.assert_allclose(later_spread[:, 0], whole_spread[200:, 0])
+    pd.testing.assert_frame_equal(resumed.forecast(48), refit.forecast(48))
+
+
+def test_fit_keeps_the_candidate_with_the_smallest_error():
+    values = seasonal_counts()
+    model, _, _ = HoltWinters.fit(values, 24)
+    best = model.sse[0]
+    for alpha in (0.1, 0.8):
+        for gamma in (0.05, 0.5):
+            single = HoltWinters(24, alpha, 0.0, gamma)
+            single.ingest(values)
+            assert single.sse[0] >= best - 1e-6
+
+
+def test_forecast_follows_the_season():
+    values = seasonal_counts()
+    model, _, _ = HoltWinters.fit(values, 24)
+    forecast = model.forecast(24)
+    truth = 100 + 0.05 * np.arange(len(values), len(values) + 24) + 30 * np.sin(2 * np.pi * np.arange(len(values), len(values) + 24) / 24)
+    assert np.abs(forecast['expected'] - truth).max() < 10
+    width = forecast['upper_band'] - forecast['lower_band']
+    assert (np.diff(width) >= -1e-9).all()
+
+
+def test_season_length():
+    minute, hour = 60 * 10**9, 3600 * 10**9
+    assert season_length(hour, 24 * 14) == 24 * 7
+    assert season_length(hour, 24 * 3) == 24
+    assert season_length(minute, 200) == 60
+    assert season_length(hour, 30) == 1
@@ -0,0 +1,92 @@
+import ipaddress
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pages.ressources.ip_utils import (
+    classify_ip, format_ip, ip_class_counts, parse_ip, parse_ipv4, subnet_rollup, to_ip_category,
+)
+
+
+def reference(text):
+    """(hi, lo) of an address as the ipaddress module reads it, None when it is rejected"""
+    try:
+        address = ipaddress.ip_address(text)
+    except ValueError:
+        return None
+    if address.version == 4:
+        packed = int(address) | (0xFFFF << 32)
+    else:
+        mapped = address.ipv4_mapped
+        packed = int(mapped) | (0xFFFF << 32) if mapped else int(address)
+    return packed >> 64, packed & 0xFFFFFFFFFFFFFFFF
+
+
+EDGE_CASES = [
+    '0.0.0.0', '255.255.255.255', '256.1.1.1', '1.2.3', '1.2.3.4.5', '1..2.3', '.1.2.3', '1.2.3.',
+    '01.2.3.4', '1.02.3.4', '1.2.3.00', '0.10.0.100', '1.2.3.4 ', ' 10.0.0.1', '1.2.3.4a', '',
+    '::', '::1', '1::', '2001:db8::1', '2001:DB8:0:0:0:0:0:1', '1:2:3:4:5:6:7:8', '1:2:3:4:5:6:7:8:9',
+    '1::2::3', ':1::2', '1:2:3:4:5:6:7:', '12345::1', 'fe80::1', '::ffff:1.2.3.4', 'g::1', 'localhost',
+]
+
+
+def random_addresses(n, seed=0):
+    rng = np.random.default_rng(seed)
+    v4 = ['.'.join(str(o) for o in row) for row in rng.integers(0, 256, size=(n, 4))]
+    v6 = [str(ipaddress.IPv6Address(int(a) << 64 | int(b)))
+          for a, b in rng.integers(0, 2**63, size=(n, 2), dtype=np.int64)]
+    return v4 + v6
+
+
+@pytest.mark.parametrize('values', [EDGE_CASES, random_addresses(500)])
+def test_parse_ip_matches_ipaddress(values):
+    hi, lo, valid = parse_ip(values)
+    for text, h, l, v in zip(values, hi.tolist(), lo.tolist(), valid.tolist()):
+        expected = reference(text.strip())
+        assert v == (expected is not None), text
+        if v:
+            assert (h, l) == expected, text
+
+
+def test_parse_ipv4_rejects_leading_zeros():
+    _, valid = parse_ipv4(['01.2.3.4', '1.2.3.04', '1.2.3.0', '0.0.0.0', '10.100.0.1'])
+    assert valid.tolist() == [False, False, True, True, True]
+
+
+def test_format_ip_round_trips():
+    values = random_addresses(200, seed=1)
+    hi, lo, _ = parse_ip(values)
+    assert list(format_ip(hi, lo)) == values
+
+
+def test_classification_matches_ipaddress():
+    values = random_addresses(300, seed=2) + ['10.1.2.3', '127.0.0.1', '169.254.1.1', '224.0.0.1',
+                                              '240.0.0.1', '::1', '::', 'fe80::1', 'fc00::1', 'ff02::1']
+    hi, lo, _ = parse_ip(values)
+    masks = classify_ip(hi, lo)
+    for i, text in enumerate(values):
+        address = ipaddress.ip_address(text)
+        for name in ('private', 'loopback', 'multicast', 'reserved', 'link_local', 'unspecified'):
+            assert masks[name][i] == getattr(address, f'is_{name}'), (text, name)
+
+
+def test_ip_category_is_ordered_by_address():
+    values = ['10.0.0.100', '10.0.0.3', 'host', '9.9.9.9', '2001:db8::1', None, '10.0.0.20']
+    categories = list(to_ip_category(pd.Series(values)).categories)
+    assert categories == ['9.9.9.9', '10.0.0.3', '10.0.0.20', '10.0.0.100', '2001:db8::1', 'host']
+
+
+def test_ip_class_counts_matches_rows():
+    series = pd.Series(['10.0.0.1', '10.0.0.1', '8.8.8.8', '::1', 'nope', None])
+    counts = ip_class_counts(series)
+    assert counts['private'] == 3 and counts['public'] == 1 and counts['loopback'] == 1
+    assert counts['ipv6'] == 1 and counts['invalid'] == 2
+
+
+def test_subnet_rollup_matches_ip_network():
+    values = pd.Series(random_addresses(300, seed=3))
+    rolled = subnet_rollup(values, 16, 48)
+    for text, label in zip(values, rolled.astype(str)):
+        prefix = 16 if '.' in text else 48
+        assert label == str(ipaddress.ip_network(f'{text}/{prefix}', strict=False))
@@ -0,0 +1,87 @@
+import ipaddress
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pages.ressources.ip_utils import convert_ip_columns
+from pages.ressources.query_language import QueryEngine, QueryError, parse_query
+
+
+ADDRESSES = ['10.0.0.2', '10.0.0.3', '10.0.0.100', '10.0.0.255', '10.0.1.0', '9.9.9.9', '192.168.0.1',
+             '2001:db8::1', '2001:db8::ff', '::1']
+
+
+@pytest.fixture(params=['object', 'category'])
+def flows(request):
+    rng = np.random.default_rng(0)
+    n = 400
+    df = pd.DataFrame({
+        'timestamp': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 86_400, n), unit='s'),
+        'src_ip': rng.choice(ADDRESSES, n),
+        'dst_port': rng.choice([22, 53, 80, 443, 8080], n),
+        'action': rng.choice(['PERMIT', 'DENY', 'DROP'], n),
+        'bytes': rng.integers(0, 10_000, n).astype(float),
+    })
+    return convert_ip_columns(df) if request.param == 'category' else df
+
+
+def addresses(series):
+    return series.astype(str).map(ipaddress.ip_address)
+
+
+def test_ip_range_is_numeric(flows):
+    engine = QueryEngine(flows)
+    low, high = ipaddress.ip_address('10.0.0.2'), ipaddress.ip_address('10.0.0.255')
+    expected = addresses(flows['src_ip']).map(lambda a: a.version == 4 and low <= a <= high)
+    assert (engine.mask('src_ip:[10.0.0.2 TO 10.0.0.255]') == expected.to_numpy()).all()
+    assert set(flows.loc[expected, 'src_ip'].astype(str)) == {'10.0.0.2', '10.0.0.3', '10.0.0.100', '10.0.0.255'}
+
+
+@pytest.mark.parametrize('query, bound, check', [
+    ('src_ip>10.0.0.50', '10.0.0.50', lambda a, b: a > b),
+    ('src_ip>=10.0.0.3', '10.0.0.3', lambda a, b: a >= b),
+    ('src_ip<10.0.0.100', '10.0.0.100', lambda a, b: a < b),
+    ('src_ip<=2001:db8::1', '2001:db8::1', lambda a, b: a <= b),
+])
+def test_ip_comparison_stays_in_the_address_family(flows, query, bound, check):
+    bound = ipaddress.ip_address(bound)
+    expected = addresses(flows['src_ip']).map(lambda a: a.version == bound.version and check(a, bound))
+    assert (QueryEngine(flows).mask(query) == expected.to_numpy()).all()
+
+
+def test_open_ip_range(flows):
+    expected = addresses(flows['src_ip']).map(lambda a: a.version == 4 and a <= ipaddress.ip_address('10.0.0.3'))
+    assert (QueryEngine(flows).mask('src_ip:[* TO 10.0.0.3]') == expected.to_numpy()).all()
+
+
+def test_cidr_match(flows):
+    network = ipaddress.ip_network('10.0.0.0/24')
+    expected = addresses(flows['src_ip']).map(lambda a: a in network)
+    assert (QueryEngine(flows).mask('src_ip:10.0.0.0/24') == expected.to_numpy()).all()
+
+
+@pytest.mark.parametrize('query, reference', [
+    ('dst_port:[80 TO 443]', lambda df: df['dst_port'].between(80, 443)),
+    ('bytes>5000 AND NOT action:DENY', lambda df: (df['bytes'] > 5000) & (df['action'] != 'DENY')),
+    ('dst_port:(22 OR 53) action:drop', lambda df: df['dst_port'].isin([22, 53]) & (df['action'] == 'DROP')),
+    ('timestamp>="2024-01-01 12:00"', lambda df: df['timestamp'] >= pd.Timestamp('2024-01-01 12:00')),
+    ('action:PER*', lambda df: df['action'] == 'PERMIT'),
+    ('deny', lambda df: df['action'] == 'DENY'),
+])
+def test_queries_match_pandas(flows, query, reference):
+    assert (QueryEngine(flows).mask(query) == reference(flows).to_numpy()).all()
+
+
+def test_filter_returns_matching_rows(flows):
+    rows = QueryEngine(flows).filter('dst_port:443')
+    pd.testing.assert_frame_equal(rows.reset_index(drop=True), flows[flows['dst_port'] == 443].reset_index(drop=True))
+
+
+def test_parse_errors():
+    with pytest.raises(QueryError):
+        parse_query('dst_port:[80 443]')
+    with pytest.raises(QueryError):
+        parse_query('(action:DENY')
+    with pytest.raises(QueryError):
+        QueryEngine(pd.DataFrame({'a': [1]})).mask('missing:1')
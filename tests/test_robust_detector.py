@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import pages.ressources.robust_detector as robust_detector
+from pages.ressources.robust_detector import robust_channel, rolling_median_mad
+
+
+def reference(values, window):
+    """Median and MAD of the window before each position with pandas rolling.apply"""
+    series = pd.Series(values)
+    median = series.rolling(window).median().shift()
+    mad = series.rolling(window).apply(lambda w: np.median(np.abs(w - np.median(w))), raw=True).shift()
+    return median.to_numpy(), mad.to_numpy()
+
+
+@pytest.mark.parametrize('window', [2, 3, 4, 15, 30, 128, 129, 200, 240])
+@pytest.mark.parametrize('lam', [0.5, 40.0])
+def test_matches_rolling_apply(window, lam):
+    # Low rates give many ties, high rates few
+    values = np.random.default_rng(window).poisson(lam, 700).astype(float)
+    median, mad = rolling_median_mad(values, window)
+    expected_median, expected_mad = reference(values, window)
+    np.testing.assert_array_equal(median, expected_median)
+    np.testing.assert_array_equal(mad, expected_mad)
+
+
+def test_blocks_do_not_change_the_result(monkeypatch):
+    values = np.random.default_rng(0).normal(size=500)
+    whole = rolling_median_mad(values, 31)
+    monkeypatch.setattr(robust_detector, 'ROBUST_BLOCK_CELLS', 100)
+    blocked = rolling_median_mad(values, 31)
+    np.testing.assert_array_equal(whole[0], blocked[0])
+    np.testing.assert_array_equal(whole[1], blocked[1])
+
+
+def test_short_series_has_no_window():
+    median, mad = rolling_median_mad([1.0, 2.0, 3.0], 3)
+    assert np.isnan(median).all() and np.isnan(mad).all()
+
+
+def test_spikes_are_flagged_without_moving_the_baseline():
+    values = np.random.default_rng(1).poisson(100, 400).astype(float)
+    values[[150, 152, 300]] = 600
+    channel = robust_channel(values, 30, multiplier=4.0)
+    flagged = set(np.flatnonzero(channel['anomaly']))
+    assert {150, 152, 300} <= flagged and len(flagged) <= 6
+    assert abs(channel['expected'].iloc[153] - 100) < 5
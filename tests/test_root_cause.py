@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pages.ressources.root_cause import ContributionCube
+
+
+@pytest.fixture
+def flows():
+    rng = np.random.default_rng(0)
+    n = 20_000
+    df = pd.DataFrame({
+        'timestamp': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 3600, n), unit='s'),
+        'dst_port': rng.choice([22, 53, 80, 443], n),
+        'proto': rng.choice(['TCP', 'UDP'], n),
+    })
+    burst = pd.DataFrame({'timestamp': pd.Timestamp('2024-01-01 00:30:10'), 'dst_port': 3389, 'proto': 'TCP'}, index=range(500))
+    return pd.concat([df, burst], ignore_index=True)
+
+
+def test_explain_matches_pandas_counts(flows):
+    cube = ContributionCube(flows['timestamp'], {c: flows[c] for c in ('dst_port', 'proto')}, pd.Timedelta('1min').value)
+    explanation = cube.explain('2024-01-01 00:30:00', top=100)
+    bucket = flows['timestamp'].dt.floor('1min')
+    current = flows[bucket == pd.Timestamp('2024-01-01 00:30')]
+    history = flows[(bucket >= pd.Timestamp('2024-01-01 00:20')) & (bucket < pd.Timestamp('2024-01-01 00:30'))]
+    assert set(explanation.iloc[:2]['value']) == {'3389', 'TCP'}
+    for row in explanation.itertuples():
+        count = (current[row.dimension].astype(str) == row.value).sum()
+        expected = (history[row.dimension].astype(str) == row.value).sum() / 10
+        assert row.count == count
+        assert row.expected == pytest.approx(expected)
+        assert row.excess == pytest.approx(count - expected)
+    assert (explanation['excess'] > 0).all()
+    assert explanation['excess'].is_monotonic_decreasing
+
+
+def test_buckets_outside_the_data_explain_nothing(flows):
+    cube = ContributionCube(flows['timestamp'], {'proto': flows['proto']}, pd.Timedelta('1min').value)
+    assert cube.explain('2023-12-31').empty
+    assert cube.explain('2024-02-01').empty
@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import pages.ressources.row_pager as row_pager
+from pages.ressources.row_pager import RowPager
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(0)
+    n = 3000
+    df = pd.DataFrame({
+        'port': rng.integers(0, 50, n).astype(float),
+        'action': rng.choice(['DROP', 'ACCEPT', 'REJECT'], n),
+        'src_ip': pd.Categorical(rng.choice(['10.0.0.2', '10.0.0.10', '9.9.9.9'], n),
+                                 categories=['9.9.9.9', '10.0.0.2', '10.0.0.10']),
+    })
+    df.loc[::17, 'port'] = np.nan
+    return df
+
+
+@pytest.mark.parametrize('col', ['port', 'action', 'src_ip'])
+@pytest.mark.parametrize('ascending', [True, False])
+@pytest.mark.parametrize('topk', [10_000, 50])
+def test_pages_match_sort_values(frame, col, ascending, topk, monkeypatch):
+    monkeypatch.setattr(row_pager, 'TOPK_ROWS', topk)
+    rows = np.flatnonzero(frame['port'].fillna(0).to_numpy() % 3 != 0)
+    expected = frame.iloc[rows].sort_values(col, ascending=ascending, kind='stable', na_position='last').index.to_numpy()
+    pager = RowPager(frame)
+    pages = [pager.page('sel', rows, start, start + 100, col, ascending) for start in range(0, len(rows), 100)]
+    assert np.concatenate(pages).tolist() == expected.tolist()
+
+
+def test_unsorted_pages_slice_the_selection(frame):
+    pager = RowPager(frame)
+    assert pager.page('all', None, 10, 20).tolist() == list(range(10, 20))
+    assert pager.page('all', None, len(frame), len(frame) + 5).tolist() == []
+    pd.testing.assert_frame_equal(pager.take(np.array([3, 1]), ['action']), frame[['action']].iloc[[3, 1]])
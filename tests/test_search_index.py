@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pages.ressources.search_index import SEARCH_WIDTH, SearchIndex
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(0)
+    words = ['alpha', 'Beta', 'gamma-ray', 'délta', 'ALPHABET', 'x', '', 'ab', 'y' * (SEARCH_WIDTH + 10) + 'tail']
+    df = pd.DataFrame({
+        'action': rng.choice(words, 500).astype(object),
+        'src_ip': pd.Categorical(rng.choice(['10.0.0.1', '10.0.0.12', '192.168.1.1'], 500)),
+        'port': rng.integers(0, 100, 500),
+    })
+    df.loc[::37, 'action'] = None
+    return df
+
+
+def build(df):
+    index = SearchIndex(df).start()
+    index._thread.join()
+    assert index.ready and index.error is None
+    return index
+
+
+@pytest.mark.parametrize('term', ['alpha', 'ALP', 'ta', 'a', 'ray', 'élt', 'tail', 'zzz', '10.0.0.1', '.1'])
+def test_contains_matches_pandas(frame, term):
+    index = build(frame)
+    columns = ['action', 'src_ip']
+    expected = np.zeros(len(frame), dtype=bool)
+    for col in columns:
+        expected |= frame[col].astype(str).str.lower().str.contains(term.lower(), regex=False) & frame[col].notna()
+    assert index.search(term, columns).tolist() == np.flatnonzero(expected).tolist()
+
+
+@pytest.mark.parametrize('term', ['al', 'Be', '10.0.0.1', 'y', ''])
+def test_prefix_matches_pandas(frame, term):
+    index = build(frame)
+    expected = frame['action'].str.lower().str.startswith(term.lower(), na=False).to_numpy(dtype=bool)
+    assert index.search(term, ['action'], mode='prefix').tolist() == np.flatnonzero(expected).tolist()
+
+
+def test_only_text_columns_are_indexed(frame):
+    assert build(frame).columns == ['action', 'src_ip']
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pages.ressources.seasonal_baseline import SeasonalProfile, content_digest
+
+
+def history(seed=0):
+    rng = np.random.default_rng(seed)
+    times = pd.date_range('2024-01-01', periods=24 * 7 * 3 * 4, freq='15min')
+    counts = rng.poisson(20 + 30 * (times.hour >= 9), len(times)).astype(float)
+    return times, counts
+
+
+@pytest.mark.parametrize('season, slot', [
+    ('Hour of week', lambda t: t.dayofweek * 24 + t.hour),
+    ('Minute of day', lambda t: t.hour * 60 + t.minute),
+])
+def test_profile_matches_groupby(season, slot):
+    times, counts = history()
+    profile = SeasonalProfile.fit(times, counts, season)
+    frame = pd.DataFrame({'slot': slot(times), 'count': counts})
+    medians = frame.groupby('slot')['count'].median()
+    frame['deviation'] = (frame['count'] - frame['slot'].map(medians)).abs()
+    mads = frame.groupby('slot')['deviation'].median()
+    np.testing.assert_allclose(profile.median[medians.index], medians)
+    np.testing.assert_allclose(profile.mad[mads.index], mads)
+    # Slots never seen fall back to the whole history
+    empty = np.setdiff1d(np.arange(len(profile.median)), medians.index)
+    assert (profile.median[empty] == np.median(counts)).all()
+
+
+def test_score_flags_a_burst_in_its_slot():
+    times, counts = history()
+    profile = SeasonalProfile.fit(times, counts)
+    probe = counts[-96:].copy()
+    probe[40] += 200
+    scored = profile.score(times[-96:], probe)
+    assert scored['anomaly'].to_numpy()[40]
+    assert scored['anomaly'].sum() < 5
+
+
+def test_profile_round_trips_through_npz(tmp_path):
+    times, counts = history()
+    profile = SeasonalProfile.fit(times, counts, 'Minute of day')
+    path = str(tmp_path / 'profile.npz')
+    profile.save(path)
+    loaded = SeasonalProfile.load(path)
+    assert loaded.season == 'Minute of day'
+    pd.testing.assert_frame_equal(loaded.score(times, counts), profile.score(times, counts))
+
+
+def test_path_depends_only_on_the_key():
+    assert SeasonalProfile.path(('f', 'ts', '1h', 'Hour of week')) == SeasonalProfile.path(('f', 'ts', '1h', 'Hour of week'))
+    assert SeasonalProfile.path(('f', 'ts', '1h', 'Hour of week')) != SeasonalProfile.path(('g', 'ts', '1h', 'Hour of week'))
+
+
+def test_profiles_of_different_contents_never_share_a_file():
+    same_name_and_size = [b'ts,count\n1,2\n', b'ts,count\n3,4\n']
+    digests = [content_digest(data) for data in same_name_and_size]
+    assert digests[0] != digests[1]
+    assert SeasonalProfile.path((digests[0], 'ts', '1h', 'Hour of week')) != SeasonalProfile.path((digests[1], 'ts', '1h', 'Hour of week'))
@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pages.ressources.streaming_detector import EmaChannelDetector
+
+
+def counts(n=3000, seed=0):
+    rng = np.random.default_rng(seed)
+    values = rng.poisson(50, n).astype(float)
+    values[rng.integers(0, n, 20)] *= 6
+    # Large level shifts stress the sliding sum of squares
+    values[n // 2:] += 1e6
+    return values
+
+
+@pytest.mark.parametrize('span, window', [(5, None), (20, None), (10, 50), (1, 2)])
+def test_channel_matches_pandas(span, window):
+    values = counts()
+    detector = EmaChannelDetector(span, std_multiplier=2.0, window=window)
+    channel = detector.update_many(values)
+    series = pd.Series(values)
+    ema = series.ewm(span=span, adjust=False).mean()
+    std = series.rolling(window or span).std()
+    np.testing.assert_allclose(channel['ema'], ema, rtol=1e-9)
+    np.testing.assert_allclose(channel['upper_band'], ema + 2 * std, rtol=1e-6, atol=1e-6)
+    expected_anomaly = (series > ema + 2 * std) | (series < (ema - 2 * std).clip(lower=0))
+    assert (channel['anomaly'] == expected_anomaly).all()
+
+
+def test_state_round_trips_through_json():
+    values = counts(500)
+    whole = EmaChannelDetector(10).update_many(values)
+    detector = EmaChannelDetector(10)
+    first = detector.update_many(values[:200], pd.date_range('2024-01-01', periods=200, freq='min'))
+    resumed = EmaChannelDetector.from_json(detector.to_json())
+    assert resumed.last_timestamp == pd.Timestamp('2024-01-01 03:19')
+    rest = resumed.update_many(values[200:])
+    pd.testing.assert_frame_equal(pd.concat([first.drop(columns='timestamp'), rest], ignore_index=True), whole)
@@ -0,0 +1,71 @@
+import ipaddress
+
+import numpy as np
+import pandas as pd
+
+from pages.ressources.ip_utils import parse_ip
+from pages.ressources.threat_intel import IntelMatcher, load_intel_matchers, parse_cidrs, tag_intel_hits
+
+
+FEED = [
+    '10.0.0.0/24', '10.0.0.128/25', '10.0.1.0/24', '192.168.5.7', '8.8.8.0/30',
+    '2001:db8::/48', '2001:db8:0:ffff::/64', 'fe80::1', 'not-a-network', '300.1.1.1/8',
+]
+
+
+def naive_match(addresses, cidrs):
+    networks = []
+    for cidr in cidrs:
+        try:
+            networks.append(ipaddress.ip_network(cidr, strict=False))
+        except ValueError:
+            pass
+    return np.array([any(ipaddress.ip_address(a) in net for net in networks if net.version == ipaddress.ip_address(a).version)
+                     for a in addresses])
+
+
+def test_matcher_agrees_with_ip_network():
+    rng = np.random.default_rng(0)
+    addresses = ['10.0.0.0', '10.0.0.255', '10.0.1.255', '10.0.2.0', '192.168.5.7', '192.168.5.8',
+                 '8.8.8.3', '8.8.8.4', '2001:db8::1', '2001:db8:1::', '2001:db8:0:ffff::5', 'fe80::1', 'fe80::2']
+    addresses += [f'10.0.{a}.{b}' for a, b in rng.integers(0, 3, size=(100, 2)) * [1, 100]]
+    matcher = IntelMatcher('feed', FEED)
+    hi, lo, _ = parse_ip(addresses)
+    assert matcher.match(hi, lo).tolist() == naive_match(addresses, FEED).tolist()
+    # Nested and adjacent networks are merged: 10.0.0.0/23 and 2001:db8::/48 are one range each
+    assert matcher.entries == 8
+    assert matcher.ranges == 5
+
+
+def test_malformed_prefixes_are_rejected_not_widened_to_hosts():
+    entries = ['10.0.0.0/abc', '10.0.0.0/', '10.0.0.0/24.5', '10.0.0.0/-1', '10.0.0.0/33', '10.0.0.0/ 8',
+               '2001:db8::/129', '2001:db8::/x', '10.0.0.0/0x8', '10.0.0.0/8', '10.0.0.1', '2001:db8::/32']
+    start_hi, start_lo, end_hi, end_lo = parse_cidrs(entries)
+    valid = []
+    for entry in entries:
+        try:
+            valid.append(ipaddress.ip_network(entry, strict=False))
+        except ValueError:
+            pass
+    assert len(start_hi) == len(valid) == 3
+    assert [int(s) - int(e) for s, e in zip(start_lo[:2], end_lo[:2])] == [-(2 ** 24 - 1), 0]
+    assert len(parse_cidrs([])[0]) == 0
+
+
+def test_first_matching_feed_tags_the_row():
+    df = pd.DataFrame({'src_ip': ['10.0.0.5', '10.0.0.5', '172.16.0.1', '1.1.1.1', None]})
+    matchers = [IntelMatcher('corporate', ['10.0.0.0/8', '172.16.0.0/12']), IntelMatcher('tor', ['10.0.0.5'])]
+    tagged = tag_intel_hits(df, matchers)
+    assert tagged['intel_hit'].tolist() == [True, True, True, False, False]
+    assert tagged['intel_feed'].astype(object).where(tagged['intel_hit']).tolist()[:3] == ['corporate'] * 3
+
+
+def test_feeds_sharing_a_stem_keep_distinct_names(tmp_path):
+    (tmp_path / 'blocklist.txt').write_text('10.0.0.0/8\n')
+    (tmp_path / 'blocklist.csv').write_text('192.168.0.0/16,scanner\n')
+    (tmp_path / 'tor.netset').write_text('# exit nodes\n1.2.3.4\n')
+    matchers = load_intel_matchers(str(tmp_path))
+    assert [m.name for m in matchers] == ['blocklist.csv', 'blocklist.txt', 'tor']
+
+    df = tag_intel_hits(pd.DataFrame({'src_ip': ['10.1.1.1', '192.168.1.1', '1.2.3.4']}), matchers)
+    assert df['intel_feed'].tolist() == ['blocklist.txt', 'blocklist.csv', 'tor']